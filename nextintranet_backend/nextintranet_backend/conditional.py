@@ -0,0 +1,112 @@
+"""
+Per-object versions for conditional GET (ETag / Last-Modified).
+
+A version is a random token plus the time it was set, stored in the shared
+cache under a key for one object (`version_key(Component, pk)`) or for a whole
+model (`version_key(Warehouse)`, used by tree endpoints). Signal receivers bump
+the versions after commit; views combine the versions their response depends
+on into a strong ETag and answer matching requests with 304 before
+serialising anything. A version missing from the cache is simply created
+again, which can only cause an extra 200, never a stale 304. Only bumped
+versions are kept without expiry; versions created on read (possibly for
+ids taken from the request that do not exist) expire after
+VERSION_KEY_TIMEOUT seconds.
+"""
+import hashlib
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+
+def version_key(model, pk=None):
+    label = model._meta.label_lower
+    return f'version:{label}' if pk is None else f'version:{label}:{pk}'
+
+
+def _new_version():
+    return (uuid.uuid4().hex, int(timezone.now().timestamp()))
+
+
+def bump_versions(*keys, using=None):
+    """Give the keys a new version once the current transaction commits."""
+    keys = [key for key in keys if key]
+    if keys:
+        transaction.on_commit(lambda: cache.set_many({key: _new_version() for key in keys}, timeout=None), using=using)
+
+
+def get_versions(keys):
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            # add() nepřepíše verzi, kterou mezitím uložil jiný proces; založená čtením časem vyprší
+            version = _new_version()
+            cache.add(key, version, timeout=settings.VERSION_KEY_TIMEOUT)
+            versions[key] = cache.get(key) or version
+    return [versions[key] for key in keys]
+
+
+def versions_etag(keys):
+    """Strong ETag and Last-Modified (epoch seconds) combining the versions of `keys`."""
+    versions = get_versions(list(keys))
+    etag = '"%s"' % hashlib.sha1('|'.join(token for token, _ in versions).encode()).hexdigest()
+    return etag, max(modified for _, modified in versions)
+
+
+def conditional_response(request, keys, build):
+    """
+    Return 304 when the client's ETag or Last-Modified still matches the
+    versions of `keys`, otherwise call `build()` and add validators to it.
+    Responses marked no-store (e.g. with expiring signed URLs) get none, so
+    the client never revalidates into a stale copy.
+    """
+    etag, last_modified = versions_etag(keys)
+
+    not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if not_modified is not None:
+        return not_modified
+
+    response = build()
+    if response.status_code == 200 and 'no-store' not in response.get('Cache-Control', ''):
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+    return response
+
+
+def cached_representation(namespace, keys, build, timeout=3600, wait=5.0):
+    """
+    Return `build()` cached under the current versions of `keys`.
+
+    A bumped version changes the cache key, so stale entries are never read
+    and just expire. On a miss only one process builds the value; the others
+    poll for it up to `wait` seconds and then build it themselves.
+    """
+    etag, _ = versions_etag(keys)
+    digest = etag.strip('"')
+    key = f'{namespace}:{keys[0]}:{digest}'
+    data = cache.get(key)
+    if data is not None:
+        return data
+
+    lock = f'{key}:lock'
+    acquired = cache.add(lock, 1, timeout=int(wait) + 5)
+    if not acquired:
+        deadline = time.monotonic() + wait
+        while time.monotonic() < deadline:
+            time.sleep(0.05)
+            data = cache.get(key)
+            if data is not None:
+                return data
+
+    try:
+        data = build()
+        cache.set(key, data, timeout)
+    finally:
+        if acquired:
+            cache.delete(lock)
+    return data
@@ -0,0 +1,140 @@
+import base64
+import json
+from functools import cached_property
+from operator import attrgetter
+
+from django.core.paginator import Paginator as DjangoPaginator
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class EstimatedCountPaginator(DjangoPaginator):
+    """
+    Paginator that takes the row count of an unfiltered queryset from the
+    PostgreSQL planner statistics (pg_class.reltuples) instead of COUNT(*).
+    Filtered querysets and tables that were never analysed are counted exactly.
+    """
+
+    @cached_property
+    def count(self):
+        query = getattr(self.object_list, 'query', None)
+        if query is not None and not query.where and connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [query.model._meta.db_table])
+                row = cursor.fetchone()
+            if row and row[0] >= 0:
+                self.estimated = True
+                return row[0]
+        self.estimated = False
+        return super().count
+
+
+class KeysetPageNumberPagination(PageNumberPagination):
+    """
+    Page-number pagination with two opt-in extras for large lists.
+
+    `?pagination=cursor` switches to keyset pagination on (first ordering
+    field, id): each response carries a `next` link with an opaque `cursor`
+    and no page is ever located by OFFSET or counted. `?count=estimate` takes
+    the total of an unfiltered page-number list from planner statistics; the
+    response then has an `X-Total-Count-Estimated` header.
+
+    Without these parameters the responses are unchanged.
+    """
+    cursor_query_param = 'cursor'
+    cursor_page_size = 100
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.cursor_mode = (
+            request.query_params.get('pagination') == 'cursor'
+            or self.cursor_query_param in request.query_params
+        )
+        if self.cursor_mode:
+            return self.paginate_cursor(queryset, request)
+
+        self.estimate_count = request.query_params.get('count') == 'estimate'
+        if self.estimate_count:
+            self.django_paginator_class = EstimatedCountPaginator
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_mode:
+            return Response({
+                'next': self.get_next_cursor_link(),
+                'previous': None,
+                'results': data,
+            })
+        response = super().get_paginated_response(data)
+        return self.mark_estimate(response)
+
+    def mark_estimate(self, response):
+        if getattr(self.page.paginator, 'estimated', False):
+            response['X-Total-Count-Estimated'] = 'true'
+        return response
+
+    # Keyset
+
+    def paginate_cursor(self, queryset, request):
+        page_size = self.get_page_size(request) or self.cursor_page_size
+        field, descending = self.keyset_field(queryset)
+        self.keyset = (field, descending)
+        id_order = '-id' if descending else 'id'
+        if field == 'id':
+            queryset = queryset.order_by(id_order)
+        else:
+            queryset = queryset.order_by(f'-{field}' if descending else field, id_order)
+
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            value, last_id = self.decode_cursor(cursor)
+            lookup = 'lt' if descending else 'gt'
+            if field == 'id':
+                queryset = queryset.filter(**{f'id__{lookup}': last_id})
+            else:
+                queryset = queryset.filter(
+                    Q(**{f'{field}__{lookup}': value}) | Q(**{field: value, f'id__{lookup}': last_id})
+                )
+
+        # O jeden řádek víc, abychom poznali, jestli existuje další stránka
+        rows = list(queryset[:page_size + 1])
+        self.has_next = len(rows) > page_size
+        page = rows[:page_size]
+        self.last_row = page[-1] if page else None
+        return page
+
+    def keyset_field(self, queryset):
+        ordering = list(queryset.query.order_by) or list(queryset.model._meta.ordering)
+        first = ordering[0] if ordering else 'id'
+        if not isinstance(first, str):
+            return 'id', False
+        descending = first.startswith('-')
+        field = first.lstrip('-')
+        if field == 'pk':
+            field = 'id'
+        return field, descending
+
+    def get_next_cursor_link(self):
+        if not self.has_next or self.last_row is None:
+            return None
+        field, _ = self.keyset
+        value = attrgetter(field.replace('__', '.'))(self.last_row)
+        url = remove_query_param(self.request.build_absolute_uri(), self.page_query_param)
+        url = remove_query_param(url, 'pagination')
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(value, self.last_row.pk))
+
+    def encode_cursor(self, value, pk):
+        payload = json.dumps([value, pk], cls=DjangoJSONEncoder)
+        return base64.urlsafe_b64encode(payload.encode()).decode()
+
+    def decode_cursor(self, cursor):
+        try:
+            value, pk = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        except (ValueError, TypeError):
+            raise NotFound('Invalid cursor.')
+        return value, pk
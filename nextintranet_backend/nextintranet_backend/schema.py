@@ -55,7 +55,7 @@ class ComponentType(DjangoObjectType):
     class Meta:
         """Meta information for the ComponentType."""
         model = Component
-        fields = "__all__"
+        exclude = ("search_vector",)
         #fields = ['id', 'name', 'description', 'category', 'suppliers', 'tags', 'packets', 'parameters', 'created_at', 'unitType', 'unitPrice', 'sellingPrice']
         interfaces = (relay.Node,)
 
@@ -274,14 +274,14 @@ class PacketType(DjangoObjectType):
     class Meta:
         """Meta information for the PacketType."""
         model = Packet
-        fields = "__all__"
+        exclude = ("search_vector",)
 
 class WarehouseType(DjangoObjectType):
     """GraphQL type for the Warehouse model."""
     class Meta:
         """Meta information for the WarehouseType."""
         model = Warehouse
-        fields = "__all__"
+        exclude = ("search_vector",)
 
 class SupplierType(DjangoObjectType):
     """GraphQL type for the Supplier model."""
@@ -323,7 +323,7 @@ class PurchaseType(DjangoObjectType):
     class Meta:
         """Meta information for the PurchaseType."""
         model = Purchase
-        fields = "__all__"
+        exclude = ("search_vector",)
 
 class PurchaseItemType(DjangoObjectType):
     """GraphQL type for the PurchaseItem model."""
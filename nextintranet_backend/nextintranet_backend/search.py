@@ -0,0 +1,116 @@
+"""
+Full-text and fuzzy (pg_trgm) search (PostgreSQL).
+
+Searchable models define `search_document()`, an expression that builds the
+tsvector from their own and related columns, and a GIN index on
+`search_vector`. Text is passed through unaccent, so "odpor" also finds
+"odpór". Signal receivers refresh the column with one UPDATE per change (see
+refresh_search_vectors), so a search is a single index scan with no joins.
+
+Fuzzy search tolerates typos in names and part numbers ("STM32F10C8" finds
+"STM32F103C8"). It uses the pg_trgm `<%` operator on plain columns with
+gin_trgm_ops indexes, and the similarity threshold is set per transaction
+with trigram_threshold().
+"""
+import re
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector, TrigramWordSimilarity
+from django.db import connection, models, transaction
+from django.db.models.functions import Coalesce, Greatest
+
+# PostgreSQL nemá český slovník, pro názvy a symboly stačí 'simple' bez stemmingu
+SEARCH_CONFIG = 'simple'
+
+
+class Unaccent(models.Func):
+    function = 'unaccent'
+    output_field = models.TextField()
+
+
+def weighted(*parts):
+    """tsvector from (expression or field name, weight) pairs, weights 'A' to 'D'."""
+    vector = None
+    for expression, weight in parts:
+        if isinstance(expression, str):
+            expression = models.F(expression)
+        part = SearchVector(Unaccent(expression), weight=weight, config=SEARCH_CONFIG)
+        vector = part if vector is None else vector + part
+    return vector
+
+
+def refresh_search_vectors(queryset):
+    """Recompute search_vector of the selected rows in a single UPDATE."""
+    return queryset.order_by().update(search_vector=queryset.model.search_document())
+
+
+def search_query(text):
+    """
+    Prefix query matching every word of `text` ("stm32 smd" -> stm32:* & smd:*),
+    or None when `text` has no words. Words are reduced to letters and digits,
+    so user input can never inject tsquery operators.
+    """
+    terms = re.findall(r'[^\W_]+', text or '')
+    if not terms:
+        return None
+    raw = ' & '.join(f'{term}:*' for term in terms)
+    return SearchQuery(Unaccent(models.Value(raw)), search_type='raw', config=SEARCH_CONFIG)
+
+
+def search(queryset, text, *ordering):
+    """
+    Rows of `queryset` matching `text`, annotated with `rank` (ts_rank) and
+    ordered by it, then by `ordering`.
+    """
+    query = search_query(text)
+    if query is None:
+        return queryset.none()
+    return queryset.filter(search_vector=query).annotate(
+        rank=SearchRank(models.F('search_vector'), query),
+    ).order_by('-rank', *ordering)
+
+
+def parse_threshold(value):
+    """Similarity threshold from a request parameter, clamped to 0.1-1; default from settings."""
+    try:
+        threshold = float(value)
+    except (TypeError, ValueError):
+        return settings.SEARCH_TRIGRAM_THRESHOLD
+    return max(0.1, min(threshold, 1.0))
+
+
+@contextmanager
+def trigram_threshold(threshold):
+    """
+    Run the block in a transaction where the `<%` operator (and so the GIN
+    trigram index) uses `threshold`. Querysets must be evaluated inside.
+    """
+    with transaction.atomic(), connection.cursor() as cursor:
+        # set_config(..., true) platí jen do konce transakce
+        cursor.execute("SELECT set_config('pg_trgm.word_similarity_threshold', %s, true)", [str(threshold)])
+        yield
+
+
+def fuzzy(queryset, text, fields, *ordering, related=()):
+    """
+    Rows of `queryset` where `text` is similar to a word sequence in one of
+    `fields`, or in `field` of a related model given as (model, field, link)
+    in `related`, where `link` is the foreign key pointing to the row.
+    Annotated with `similarity`, the best word similarity, and ordered by it,
+    then by `ordering`.
+    """
+    match = models.Q()
+    similarities = []
+    for field in fields:
+        match |= models.Q(**{f'{field}__trigram_word_similar': text})
+        similarities.append(TrigramWordSimilarity(text, field))
+    for model, field, link in related:
+        # Poddotaz místo joinu, aby se řádky nenásobily počtem souvisejících záznamů
+        match |= models.Q(pk__in=model.objects.filter(**{f'{field}__trigram_word_similar': text}).values(link))
+        best = model.objects.filter(**{link: models.OuterRef('pk')}).annotate(
+            similarity=TrigramWordSimilarity(text, field),
+        ).order_by('-similarity').values('similarity')[:1]
+        similarities.append(Coalesce(models.Subquery(best), models.Value(0.0)))
+    similarity = Greatest(*similarities) if len(similarities) > 1 else similarities[0]
+    return queryset.filter(match).annotate(similarity=similarity).order_by('-similarity', *ordering)
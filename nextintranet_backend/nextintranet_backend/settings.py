@@ -66,8 +66,22 @@ AWS_S3_ENDPOINT_URL = S3_ENDPOINT_URL
 AWS_S3_PUBLIC_ENDPOINT_URL = S3_PUBLIC_ENDPOINT_URL
 AWS_S3_REGION_NAME = S3_REGION_NAME
 AWS_S3_ADDRESSING_STYLE = S3_ADDRESSING_STYLE
+# Platnost podepsaných URL (s); v Redisu je cachujeme o něco kratší dobu
+S3_SIGNED_URL_EXPIRE = int(os.getenv('S3_SIGNED_URL_EXPIRE', '3600'))
+AWS_QUERYSTRING_EXPIRE = S3_SIGNED_URL_EXPIRE
 AWS_DEFAULT_ACL = None
 
+# Přepočet FIFO packetů ve workeru (manage.py process_packet_queue) místo v requestu
+WAREHOUSE_DEFERRED_RECALCULATION = os.getenv('WAREHOUSE_DEFERRED_RECALCULATION', '').lower() in ('1', 'true', 'yes')
+
+# Jak dlouho (s) drží Redis serializovaný detail součástky; neplatnost řeší verze ze signálů
+COMPONENT_DETAIL_CACHE_TIMEOUT = int(os.getenv('COMPONENT_DETAIL_CACHE_TIMEOUT', '3600'))
+# Platnost verzí (ETag) založených při čtení; verze změněných objektů nevyprší
+VERSION_KEY_TIMEOUT = int(os.getenv('VERSION_KEY_TIMEOUT', '86400'))
+
+# Výchozí práh podobnosti (word_similarity, 0–1) pro fuzzy hledání přes pg_trgm
+SEARCH_TRIGRAM_THRESHOLD = float(os.getenv('SEARCH_TRIGRAM_THRESHOLD', '0.5'))
+
 if S3_ENDPOINT_URL and S3_STORAGE_BUCKET_NAME:
     STORAGES = {
         'default': {
@@ -86,6 +100,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'colorfield',
     'channels',
     'mptt',
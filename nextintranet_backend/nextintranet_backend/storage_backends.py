@@ -1,16 +1,47 @@
+import hashlib
+from functools import lru_cache
+from urllib.parse import urlparse
+
 from django.conf import settings
+from django.core.cache import cache
 from storages.backends.s3boto3 import S3Boto3Storage
 
 
+@lru_cache(maxsize=None)
+def public_endpoints():
+    """(public endpoint, internal endpoint, bucket) from settings, resolved once per process."""
+    public_endpoint = getattr(settings, 'S3_PUBLIC_ENDPOINT_URL', None)
+    internal_endpoint = getattr(settings, 'S3_ENDPOINT_URL', None)
+    bucket = getattr(settings, 'S3_STORAGE_BUCKET_NAME', None)
+    if not public_endpoint:
+        public_endpoint = getattr(settings, 'AWS_S3_PUBLIC_ENDPOINT_URL', None)
+    if not internal_endpoint:
+        internal_endpoint = getattr(settings, 'AWS_S3_ENDPOINT_URL', None)
+    if not bucket:
+        bucket = getattr(settings, 'AWS_STORAGE_BUCKET_NAME', None)
+    return public_endpoint, internal_endpoint, bucket
+
+
+def public_url(url):
+    """Rewrite a URL on the internal S3 endpoint (or a bare /documents/ path) to the public endpoint."""
+    if not url:
+        return None
+    public_endpoint, internal_endpoint, bucket = public_endpoints()
+
+    if public_endpoint and internal_endpoint and url.startswith(internal_endpoint):
+        return public_endpoint.rstrip('/') + url[len(internal_endpoint):]
+
+    path = urlparse(url).path or ''
+    if public_endpoint and bucket and path.startswith('/documents/'):
+        return f"{public_endpoint.rstrip('/')}/{bucket}{path}"
+
+    return url
+
+
 class BasePublicEndpointS3Storage(S3Boto3Storage):
     def url(self, name, parameters=None, expire=None):
         url = super().url(name, parameters=parameters, expire=expire)
-        public_endpoint = getattr(settings, 'S3_PUBLIC_ENDPOINT_URL', None)
-        internal_endpoint = getattr(settings, 'S3_ENDPOINT_URL', None)
-        if not public_endpoint:
-            public_endpoint = getattr(settings, 'AWS_S3_PUBLIC_ENDPOINT_URL', None)
-        if not internal_endpoint:
-            internal_endpoint = getattr(settings, 'AWS_S3_ENDPOINT_URL', None)
+        public_endpoint, internal_endpoint, _ = public_endpoints()
         if public_endpoint and internal_endpoint and url.startswith(internal_endpoint):
             return public_endpoint + url[len(internal_endpoint):]
         return url
@@ -22,3 +53,52 @@ class PublicS3Boto3Storage(BasePublicEndpointS3Storage):
 
 class SignedS3Boto3Storage(BasePublicEndpointS3Storage):
     querystring_auth = True
+
+
+SIGNED_URL_MARGIN = 60
+
+
+def signing_available():
+    # Podepisovat umí jen S3 úložiště, lokální FileSystemStorage vrací obyčejné URL
+    _, internal_endpoint, bucket = public_endpoints()
+    return bool(internal_endpoint and bucket)
+
+
+@lru_cache(maxsize=None)
+def signed_storage():
+    return SignedS3Boto3Storage()
+
+
+def _signed_url_key(name):
+    return 'signed-url:' + hashlib.sha1(name.encode()).hexdigest()
+
+
+def signed_urls(names):
+    """
+    Presigned URLs for the storage names, as {name: url}.
+
+    URLs are shared through the cache for SIGNED_URL_MARGIN seconds less than
+    their validity (at most half of it for short validities), so a cached URL
+    never expires in the client's hands right away. Missing ones are signed
+    locally and stored in one set_many().
+    """
+    names = list(dict.fromkeys(name for name in names if name))
+    if not names:
+        return {}
+    keys = {name: _signed_url_key(name) for name in names}
+    cached = cache.get_many(list(keys.values()))
+    urls = {name: cached[key] for name, key in keys.items() if key in cached}
+
+    missing = [name for name in names if name not in urls]
+    if missing:
+        storage = signed_storage()
+        signed = {name: storage.url(name) for name in missing}
+        expire = storage.querystring_expire
+        timeout = max(expire - SIGNED_URL_MARGIN, expire // 2)
+        cache.set_many({keys[name]: url for name, url in signed.items()}, timeout=timeout)
+        urls.update(signed)
+    return urls
+
+
+def signed_url(name):
+    return signed_urls([name]).get(name)
@@ -2,17 +2,20 @@ import logging
 import re
 import time
 import uuid
+from contextlib import nullcontext
 from urllib.parse import parse_qs, urlparse
 
-from django.db.models import Q
+from django.db import connection, models
+from django.db.models.functions import Cast, RowNumber
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
 from nextintranet_backend.permissions import LEVEL_ORDER
+from nextintranet_backend.search import fuzzy, parse_threshold, search, trigram_threshold
 from nextintranet_production.models import Production
-from nextintranet_warehouse.models.component import Component, Identifier, Packet
+from nextintranet_warehouse.models.component import Component, Identifier, Packet, SupplierRelation
 from nextintranet_warehouse.models.purchase import Purchase
 from nextintranet_warehouse.models.warehouse import Warehouse
 
@@ -25,6 +28,13 @@ class SearchApiView(APIView):
     DEFAULT_LIMIT = 6
     DEFAULT_PAGE = 1
     DEFAULT_SOURCES = ['components', 'locations', 'packets', 'purchases', 'productions']
+    SOURCE_SEARCH = {
+        'components': 'search_components',
+        'locations': 'search_locations',
+        'packets': 'search_packets',
+        'purchases': 'search_purchases',
+        'productions': 'search_productions',
+    }
     CONTEXT_DEFAULTS = {
         'store': ['components'],
         'purchases': ['purchases'],
@@ -75,49 +85,55 @@ class SearchApiView(APIView):
         sources, ignored_sources = self.resolve_sources(source_tokens, source_param, context)
         limit = self.parse_limit(self.get_first_param(request, ['limit']))
         page = self.parse_page(self.get_first_param(request, ['page']))
-        max_results = limit * page
+        # mode=fuzzy toleruje překlepy (pg_trgm), výchozí je fulltext
+        self.fuzzy = (self.get_first_param(request, ['mode']) or '').lower() == 'fuzzy'
+        threshold = parse_threshold(self.get_first_param(request, ['threshold'])) if self.fuzzy else None
 
         warehouse_access = self.has_area_access(request.user, 'warehouse', 'guest')
 
-        results = []
+        direct = []
         seen = set()
 
         identifier_payload = self.parse_identifier_payload(query)
         direct_results = self.resolve_identifier_payload(identifier_payload, sources, warehouse_access)
-        self.add_results(results, direct_results, seen)
+        self.add_results(direct, direct_results, seen)
 
         identifier_match = self.resolve_identifier_match(query, sources, warehouse_access)
-        self.add_results(results, identifier_match, seen)
-
-        if 'components' in sources and warehouse_access:
-            self.add_results(results, self.search_components(query, max_results), seen)
-
-        if 'locations' in sources and warehouse_access:
-            self.add_results(results, self.search_locations(query, max_results), seen)
-
-        if 'packets' in sources and warehouse_access:
-            self.add_results(results, self.search_packets(query, max_results), seen)
+        self.add_results(direct, identifier_match, seen)
 
-        if 'purchases' in sources and warehouse_access:
-            self.add_results(results, self.search_purchases(query, max_results), seen)
-
-        if 'productions' in sources:
-            self.add_results(results, self.search_productions(query, max_results), seen)
+        # Přímé shody stojí na začátku výsledků, z řazených zdrojů je vynecháme
+        querysets = []
+        for source in sources:
+            if source not in self.SOURCE_SEARCH or (source != 'productions' and not warehouse_access):
+                continue
+            queryset = getattr(self, self.SOURCE_SEARCH[source])(query)
+            excluded = [item['id'] for item in direct if item['source'] == source]
+            querysets.append((source, queryset.exclude(pk__in=excluded) if excluded else queryset))
 
-        total_count = len(results)
-        total_pages = max(1, (total_count + limit - 1) // limit)
         start = (page - 1) * limit
-        end = start + limit
+        results = direct[start:start + limit]
+        offset = max(0, start - len(direct))
+        with trigram_threshold(threshold) if self.fuzzy else nullcontext():
+            page_rows, source_counts = self.ranked_page(querysets, offset, limit - len(results))
+        results.extend(self.build_page(page_rows))
+
+        for item in direct:
+            source_counts[item['source']] = source_counts.get(item['source'], 0) + 1
+        total_count = sum(source_counts.values())
+        total_pages = max(1, (total_count + limit - 1) // limit)
         response = {
             'query': query,
             'context': (context or '').lower() if context else None,
             'sources': sources,
             'ignored_sources': ignored_sources,
+            'mode': 'fuzzy' if self.fuzzy else 'fulltext',
+            'threshold': threshold,
             'page': page,
             'page_size': limit,
             'total_count': total_count,
             'total_pages': total_pages,
-            'results': results[start:end],
+            'source_counts': source_counts,
+            'results': results,
         }
 
         duration_ms = int((time.perf_counter() - start_time) * 1000)
@@ -126,7 +142,7 @@ class SearchApiView(APIView):
             query,
             response['context'],
             ','.join(sources),
-            len(results),
+            total_count,
             getattr(request.user, 'id', None),
             duration_ms,
         )
@@ -281,85 +297,108 @@ class SearchApiView(APIView):
             results.append(item)
             seen.add(key)
 
-    def search_components(self, query, limit):
-        parsed_id = self.parse_uuid(query)
-        queryset = Component.objects.select_related('category')
-
-        if parsed_id:
-            queryset = queryset.filter(id=parsed_id)
-        else:
-            queryset = queryset.filter(
-                Q(name__icontains=query) |
-                Q(description__icontains=query) |
-                Q(id__icontains=query) |
-                Q(suppliers__symbol__icontains=query) |
-                Q(suppliers__supplier__name__icontains=query)
-            ).distinct()
-
-        return [self.build_component_result(item) for item in queryset.order_by('name')[:limit]]
-
-    def search_locations(self, query, limit):
-        parsed_id = self.parse_uuid(query)
-        queryset = Warehouse.objects.all()
-
-        if parsed_id:
-            queryset = queryset.filter(id=parsed_id)
-        else:
-            queryset = queryset.filter(
-                Q(name__icontains=query) |
-                Q(location__icontains=query) |
-                Q(description__icontains=query) |
-                Q(id__icontains=query)
-            )
-
-        return [self.build_location_result(item) for item in queryset.order_by('name')[:limit]]
-
-    def search_packets(self, query, limit):
+    def ranked_page(self, querysets, offset, limit):
+        """
+        One page of the union of the per-source querysets, ranked by `score`,
+        and the number of matches of every source, from a single query.
+
+        Each source is numbered in its own order by a window function, the
+        union is ordered by (score, source, position) and sliced in SQL, and
+        the counts are grouped from the same CTE. The cost depends on the
+        number of matches, not on the page number.
+        """
+        if not querysets:
+            return [], {}
+
+        parts = []
+        params = []
+        for index, (source, queryset) in enumerate(querysets):
+            ordering = list(queryset.query.order_by) or ['pk']
+            rows = queryset.order_by().annotate(
+                search_key=Cast('pk', models.TextField()),
+                search_score=Cast('score', models.FloatField()),
+                search_position=models.Window(RowNumber(), order_by=ordering),
+            ).values_list('search_key', 'search_score', 'search_position')
+            sql, part_params = rows.query.sql_with_params()
+            parts.append(f'SELECT {index} AS source_index, * FROM ({sql}) AS source_{index}')
+            params.extend(part_params)
+
+        sql = (
+            f'WITH ranked AS ({" UNION ALL ".join(parts)}) '
+            '(SELECT source_index, search_key, search_score, search_position, NULL::bigint FROM ranked '
+            'ORDER BY search_score DESC, source_index, search_position LIMIT %s OFFSET %s) '
+            'UNION ALL '
+            '(SELECT source_index, NULL, NULL, NULL, count(*) FROM ranked GROUP BY source_index)'
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params + [max(limit, 0), offset])
+            rows = cursor.fetchall()
+
+        source_counts = {source: 0 for source, _ in querysets}
+        page = []
+        for source_index, key, score, position, count in rows:
+            source = querysets[source_index][0]
+            if count is not None:
+                source_counts[source] = count
+            else:
+                page.append((-score, source_index, position, source, key))
+        # Pořadí UNION ALL není zaručené, stránku seřadíme znovu
+        page.sort()
+        return [(source, key) for _, _, _, source, key in page], source_counts
+
+    def build_page(self, page_rows):
+        """Result dicts for (source, id) rows, loading each source's objects with one query."""
+        keys = {}
+        for source, key in page_rows:
+            keys.setdefault(source, []).append(key)
+        objects = {}
+        for source, ids in keys.items():
+            queryset, builder = self.result_queryset(source)
+            for obj in queryset.filter(pk__in=ids):
+                objects[(source, str(obj.pk))] = builder(obj)
+        return [objects[row] for row in page_rows if row in objects]
+
+    def result_queryset(self, source):
+        return {
+            'components': (Component.objects.select_related('category'), self.build_component_result),
+            'locations': (Warehouse.objects.all(), self.build_location_result),
+            'packets': (Packet.objects.select_related('component', 'location'), self.build_packet_result),
+            'purchases': (Purchase.objects.select_related('supplier'), self.build_purchase_result),
+            'productions': (Production.objects.select_related('folder'), self.build_production_result),
+        }[source]
+
+    def text_search(self, queryset, query, ordering, fuzzy_fields, related=()):
+        """
+        Full-text match scored by ts_rank, or with mode=fuzzy a trigram match
+        of `fuzzy_fields` scored by similarity, as `score`.
+        """
+        if self.fuzzy:
+            queryset = fuzzy(queryset, query, fuzzy_fields, ordering, related=related)
+            return queryset.annotate(score=models.F('similarity'))
+        queryset = search(queryset, query, ordering)
+        return queryset.annotate(score=models.F('rank'))
+
+    def match(self, queryset, query, ordering, fuzzy_fields, related=()):
         parsed_id = self.parse_uuid(query)
-        queryset = Packet.objects.select_related('component', 'location')
-
         if parsed_id:
-            queryset = queryset.filter(id=parsed_id)
-        else:
-            queryset = queryset.filter(
-                Q(component__name__icontains=query) |
-                Q(location__name__icontains=query) |
-                Q(description__icontains=query) |
-                Q(id__icontains=query)
-            )
+            return queryset.filter(id=parsed_id).annotate(score=models.Value(1.0, output_field=models.FloatField()))
+        return self.text_search(queryset, query, ordering, fuzzy_fields, related)
 
-        return [self.build_packet_result(item) for item in queryset.order_by('date_added')[:limit]]
+    def search_components(self, query):
+        # Fulltext přes search_vector, ve fuzzy režimu trigramy názvu a symbolů dodavatelů
+        return self.match(Component.objects.all(), query, 'name', ['name'], related=[(SupplierRelation, 'symbol', 'component')])
 
-    def search_productions(self, query, limit):
-        parsed_id = self.parse_uuid(query)
-        queryset = Production.objects.select_related('folder')
-
-        if parsed_id:
-            queryset = queryset.filter(id=parsed_id)
-        else:
-            queryset = queryset.filter(
-                Q(name__icontains=query) |
-                Q(description__icontains=query) |
-                Q(folder__name__icontains=query) |
-                Q(id__icontains=query)
-            )
+    def search_locations(self, query):
+        return self.match(Warehouse.objects.all(), query, 'name', ['name'])
 
-        return [self.build_production_result(item) for item in queryset.order_by('name')[:limit]]
+    def search_packets(self, query):
+        return self.match(Packet.objects.all(), query, 'date_added', ['component__name'])
 
-    def search_purchases(self, query, limit):
-        parsed_id = self.parse_uuid(query)
-        queryset = Purchase.objects.select_related('supplier')
-
-        if parsed_id:
-            queryset = queryset.filter(id=parsed_id)
-        else:
-            queryset = queryset.filter(
-                Q(id__icontains=query) |
-                Q(note__icontains=query) |
-                Q(supplier__name__icontains=query)
-            )
+    def search_productions(self, query):
+        return self.match(Production.objects.all(), query, 'name', ['name'])
 
-        return [self.build_purchase_result(item) for item in queryset.order_by('-created_at')[:limit]]
+    def search_purchases(self, query):
+        return self.match(Purchase.objects.all(), query, '-created_at', ['supplier__name'])
 
     def build_component_result(self, component):
         subtitle = component.category.name if component.category else str(component.id)
@@ -5,3 +5,6 @@ class NextintranetProductionConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'nextintranet_production'
     verbose_name = 'Production Management'
+
+    def ready(self) -> None:
+        from . import signals  # noqa: F401
@@ -0,0 +1,44 @@
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations, models
+
+
+class Unaccent(models.Func):
+    function = 'unaccent'
+    output_field = models.TextField()
+
+
+def fill_search_vectors(apps, schema_editor):
+    # Zmrazená kopie Production.search_document()
+    Production = apps.get_model('nextintranet_production', 'Production')
+    ProductionFolder = apps.get_model('nextintranet_production', 'ProductionFolder')
+
+    folder = models.Subquery(ProductionFolder.objects.filter(pk=models.OuterRef('folder_id')).values('name'))
+    Production.objects.update(search_vector=(
+        SearchVector(Unaccent(models.F('name')), weight='A', config='simple')
+        + SearchVector(Unaccent(folder), weight='B', config='simple')
+        + SearchVector(Unaccent(models.F('description')), weight='C', config='simple')
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nextintranet_production', '0004_alter_realizationcomponent_options_and_more'),
+        # Rozšíření unaccent
+        ('nextintranet_warehouse', '0049_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='production',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(fill_search_vectors, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='production',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='production_search_idx'),
+        ),
+    ]
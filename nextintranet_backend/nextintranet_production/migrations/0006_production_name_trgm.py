@@ -0,0 +1,18 @@
+import django.contrib.postgres.indexes
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nextintranet_production', '0005_production_search_vector'),
+        # Rozšíření pg_trgm
+        ('nextintranet_warehouse', '0050_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='production',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['name'], name='production_name_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+    ]
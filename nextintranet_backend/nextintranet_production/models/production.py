@@ -1,8 +1,11 @@
 from django.db import models
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.utils.translation import gettext_lazy as _
 from django.urls import reverse
 
 from nextintranet_backend.models import NIModel
+from nextintranet_backend.search import weighted
 from nextintranet_warehouse.models.component import Component
 
 
@@ -49,10 +52,28 @@ class Production(NIModel):
         help_text=_('Odkaz na skladovou položku (pokud production odpovídá konkrétní součástce)')
     )
 
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    SEARCH_FIELDS = {'name', 'description', 'folder'}
+
     class Meta:
         verbose_name = _('Production')
         verbose_name_plural = _('Productions')
         ordering = ['name']
+        indexes = [
+            GinIndex(fields=['search_vector'], name='production_search_idx'),
+            GinIndex(fields=['name'], name='production_name_trgm_idx', opclasses=['gin_trgm_ops']),
+        ]
+
+    @staticmethod
+    def search_document():
+        from .folder import ProductionFolder
+
+        return weighted(
+            ('name', 'A'),
+            (models.Subquery(ProductionFolder.objects.filter(pk=models.OuterRef('folder_id')).values('name')), 'B'),
+            ('description', 'C'),
+        )
 
     def __str__(self):
         return self.name
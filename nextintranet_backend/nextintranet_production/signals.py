@@ -0,0 +1,20 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from nextintranet_backend.search import refresh_search_vectors
+from .models import Production, ProductionFolder
+
+
+@receiver(post_save, sender=Production)
+def production_search(sender, instance: Production, raw: bool, update_fields=None, **kwargs):
+    if raw or (update_fields is not None and not Production.SEARCH_FIELDS & set(update_fields)):
+        return
+    refresh_search_vectors(Production.objects.filter(pk=instance.pk))
+
+
+@receiver(post_save, sender=ProductionFolder)
+def production_folder_search(sender, instance: ProductionFolder, raw: bool, update_fields=None, **kwargs):
+    # Název složky je součástí dokumentu jejích productions
+    if raw or (update_fields is not None and 'name' not in update_fields):
+        return
+    refresh_search_vectors(Production.objects.filter(folder=instance))
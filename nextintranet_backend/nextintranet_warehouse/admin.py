@@ -5,6 +5,7 @@ from .models import component
 from .models import category
 from .models import purchase
 from .models import stocktaking
+from .models import inventory
 
 
 class SuppliersRelationInline(admin.TabularInline):
@@ -46,6 +47,10 @@ admin.site.register(category.Category)
 admin.site.register(component.Tag)
 admin.site.register(component.Document)
 admin.site.register(component.StockOperation)
+admin.site.register(component.PacketLayer)
+admin.site.register(component.PacketRecalculation)
+admin.site.register(inventory.InventorySnapshot)
+admin.site.register(inventory.ArchivedStockOperation)
 admin.site.register(component.Reservation)
 admin.site.register(component.ParameterType)
 admin.site.register(component.ComponentParameter)
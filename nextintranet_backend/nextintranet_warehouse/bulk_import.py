@@ -0,0 +1,375 @@
+"""
+Bulk import of the legacy catalogue exports (NDJSON, one MongoDB document per
+line), used by the bulk_import command.
+
+The input is read line by line and every line is turned into rows of one or
+more models. Rows are staged batch by batch with COPY into unlogged
+`bulk_import_<table>` tables that survive restarts, so an interrupted import
+continues from its last checkpoint. The staged rows are then merged into the
+real tables with one INSERT ... ON CONFLICT per model, which runs no save()
+and sends no signals; trees, packet totals and cache versions are rebuilt
+once afterwards.
+"""
+import datetime
+import hashlib
+from abc import ABC, abstractmethod
+import io
+import json
+import uuid
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from nextintranet_backend.models.user import User
+from nextintranet_backend.storage_backends import public_url
+
+from .models.category import Category
+from .models.component import Component, Document, Packet, StockOperation, Supplier, SupplierRelation, Tag
+from .models.warehouse import Warehouse
+from .partitioning import is_partitioned
+
+BATCH_SIZE = 5000
+STAGING_PREFIX = 'bulk_import_'
+TREE_FIELDS = ('lft', 'rght', 'tree_id', 'level')
+
+ComponentTag = Component.tags.through
+
+# Pořadí slučování: odkazované tabulky před odkazujícími
+MERGE_ORDER = (Category, Warehouse, Supplier, Tag, Component, ComponentTag, SupplierRelation, Packet, Document, StockOperation)
+
+
+def oid_to_uuid4(oid: str) -> uuid.UUID:
+    """Deterministický převod ObjectId na UUID (stejný jako v původních transfer_* skriptech)."""
+    hash_bytes = hashlib.sha256(oid.encode('utf-8')).digest()[:16]
+    return uuid.UUID(bytes=hash_bytes)
+
+
+def name_to_uuid(*parts):
+    # Řádky bez vlastního ObjectId (dodavatelé, vazby, dokumenty) dostanou id odvozené z obsahu
+    return uuid.uuid5(uuid.NAMESPACE_URL, 'nextintranet:' + ':'.join(str(part) for part in parts))
+
+
+def _oid(value):
+    if isinstance(value, dict):
+        return value.get('$oid')
+    return value
+
+
+def _number(value):
+    # Mongo export obaluje čísla do {"$numberDouble": ...} / {"$numberInt": ...}
+    if isinstance(value, dict):
+        value = next((value[key] for key in ('$numberDouble', '$numberInt', '$numberLong') if key in value), None)
+    return None if value in (None, '') else float(value)
+
+
+class Source(ABC):
+    """Turns one decoded input line into (model, values) rows."""
+    models = ()
+
+    def __init__(self):
+        self.seen = set()
+
+    def once(self, key):
+        # Stejný řádek (sklad, dodavatel, štítek) stačí poslat jednou za běh
+        if key in self.seen:
+            return False
+        self.seen.add(key)
+        return True
+
+    @abstractmethod
+    def rows(self, entry):
+        """Yield (model, values) for one decoded input line."""
+
+
+class CategorySource(Source):
+    models = (Category,)
+
+    def rows(self, entry):
+        parent = _oid(entry.get('parent'))
+        yield Category, {
+            'id': oid_to_uuid4(entry['_id']['$oid']),
+            'name': entry['name'],
+            'abbreviation': entry['name'].lower()[:50],
+            'description': entry.get('description', ''),
+            'icon': '{}/{}'.format(entry.get('icon_source', ''), entry.get('icon', '')),
+            'parent_id': oid_to_uuid4(parent) if parent and parent != '#' else None,
+        }
+
+
+class PositionSource(Source):
+    models = (Warehouse,)
+
+    def rows(self, entry):
+        warehouse = _oid(entry.get('warehouse'))
+        root = oid_to_uuid4(warehouse) if warehouse else None
+        if root and self.once(root):
+            # Hlavní sklad se v exportu nevyskytuje, jen jeho ObjectId
+            name = f'Warehouse {warehouse}'
+            yield Warehouse, {
+                'id': root,
+                'uuid': root,
+                'name': name,
+                'location': warehouse,
+                'description': f'Automaticky vytvořený sklad {name}',
+                'parent_id': None,
+                'can_store_items': False,
+            }
+
+        parent = _oid(entry.get('parent'))
+        uid = oid_to_uuid4(entry['_id']['$oid'])
+        yield Warehouse, {
+            'id': uid,
+            'uuid': uid,
+            'name': entry['name'],
+            'location': warehouse or '',
+            'description': entry.get('text', ''),
+            'parent_id': root if parent == '#' else (oid_to_uuid4(parent) if parent else None),
+            'can_store_items': True,
+        }
+
+
+class StockSource(Source):
+    models = (Supplier, Tag, Component, ComponentTag, SupplierRelation, Packet, Document)
+
+    def __init__(self):
+        super().__init__()
+        # Existující dodavatele a štítky párujeme podle jména jako dřív get_or_create
+        self.suppliers = dict(Supplier.objects.values_list('name', 'id'))
+        self.tags = dict(Tag.objects.values_list('name', 'id'))
+
+    def rows(self, entry):
+        component_id = oid_to_uuid4(entry['_id']['$oid'])
+        category = _oid((entry.get('category') or [{}])[0])
+        image = (entry.get('img_title') or {}).get('url')
+        yield Component, {
+            'id': component_id,
+            'name': entry['name'],
+            'description': entry.get('description', ''),
+            'category_id': oid_to_uuid4(category) if category else None,
+            'unit_type': 'pcs',
+            'internal_price': _number(entry.get('price')),
+            'primary_image': image,
+            'primary_image_url': public_url(image),
+        }
+
+        for supplier_entry in entry.get('supplier', []):
+            name = supplier_entry['supplier']
+            supplier_id = self.suppliers.setdefault(name, name_to_uuid('supplier', name))
+            if self.once(('supplier', supplier_id)):
+                yield Supplier, {'id': supplier_id, 'name': name}
+            yield SupplierRelation, {
+                'id': name_to_uuid('supplier-relation', component_id, supplier_id),
+                'component_id': component_id,
+                'supplier_id': supplier_id,
+                'symbol': supplier_entry.get('symbol', ''),
+            }
+
+        for tag in entry.get('tags', []):
+            name = tag['id']
+            tag_id = self.tags.setdefault(name, name_to_uuid('tag', name))
+            if self.once(('tag', tag_id)):
+                yield Tag, {'id': tag_id, 'name': name}
+            yield ComponentTag, {'component_id': component_id, 'tag_id': tag_id}
+
+        for packet in entry.get('packets', []):
+            location = _oid(packet.get('position'))
+            yield Packet, {
+                'id': oid_to_uuid4(packet['_id']['$oid']),
+                'component_id': component_id,
+                'location_id': oid_to_uuid4(location) if location else None,
+                'description': packet.get('description', ''),
+            }
+
+        for document in entry.get('documents', []):
+            yield Document, {
+                'id': name_to_uuid('document', component_id, document['url']),
+                'component_id': component_id,
+                'url': document['url'],
+                'name': document.get('type', ''),
+                'doc_type': document.get('type', 'other'),
+            }
+
+
+class OperationSource(Source):
+    models = (StockOperation,)
+
+    def __init__(self):
+        super().__init__()
+        self.authors = dict(User.objects.values_list('username', 'id'))
+
+    def rows(self, entry):
+        timestamp_ms = float(entry['date']['$date']['$numberLong'])
+        date = datetime.datetime.fromtimestamp(timestamp_ms / 1000.0, tz=datetime.timezone.utc)
+        user = entry['user']
+        yield StockOperation, {
+            'id': oid_to_uuid4(entry['_id']['$oid']),
+            'created_at': date,
+            'timestamp': date,
+            'packet_id': oid_to_uuid4(entry['pid']['$oid']),
+            'operation_type': entry['type'],
+            'quantity': _number(entry['count']),
+            'relative_quantity': True,
+            'unit_price': _number(entry['unit_price']),
+            'author_id': self.authors.get(user),
+            'description': f"{entry['description']}, autor: {user}",
+        }
+
+
+SOURCES = {
+    'categories': CategorySource,
+    'positions': PositionSource,
+    'stock': StockSource,
+    'operations': OperationSource,
+}
+
+
+def copy_text(value):
+    """One value in the COPY text format."""
+    if value is None:
+        return '\\N'
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, (dict, list)):
+        value = json.dumps(value)
+    elif isinstance(value, datetime.datetime):
+        value = value.isoformat()
+    return str(value).replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+
+
+class StagedTable:
+    """The staging table of one model and the statements that fill and merge it."""
+
+    def __init__(self, model):
+        self.model = model
+        self.table = model._meta.db_table
+        self.staging = STAGING_PREFIX + self.table
+        self.is_through = model._meta.auto_created
+        # Automatické id vazební tabulky doplní sekvence
+        self.fields = [
+            field for field in model._meta.concrete_fields
+            if not (self.is_through and field.primary_key)
+        ]
+        self.columns = [field.column for field in self.fields]
+        self.attnames = {field.attname: field.column for field in self.fields}
+
+    def conflict_columns(self):
+        if self.is_through:
+            return [field.column for field in self.fields]
+        if self.model is StockOperation and is_partitioned(connection):
+            # Rozdělená tabulka má primární klíč (id, timestamp)
+            return ['id', 'timestamp']
+        return [self.model._meta.pk.column]
+
+    def row(self, values, line, now):
+        """All columns of one row in COPY text format; missing columns get their defaults."""
+        row = []
+        for field in self.fields:
+            if field.attname in values:
+                value = values[field.attname]
+            elif field.name in TREE_FIELDS:
+                value = 0  # MPTT sloupce dopočítá rebuild()
+            elif getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False):
+                value = now
+            elif field.has_default():
+                value = field.get_default()
+            else:
+                value = None
+            row.append(copy_text(value))
+        row.append(str(line))
+        return '\t'.join(row) + '\n'
+
+    def create(self, cursor):
+        cursor.execute(
+            f'CREATE UNLOGGED TABLE IF NOT EXISTS "{self.staging}" '
+            f'(LIKE "{self.table}" INCLUDING DEFAULTS, _line bigint NOT NULL)'
+        )
+
+    def copy(self, cursor, lines):
+        columns = ', '.join(f'"{column}"' for column in self.columns)
+        cursor.copy_expert(f'COPY "{self.staging}" ({columns}, _line) FROM STDIN', io.StringIO(''.join(lines)))
+
+    def exists(self, cursor):
+        cursor.execute('SELECT to_regclass(%s) IS NOT NULL', [self.staging])
+        return cursor.fetchone()[0]
+
+    def drop(self, cursor):
+        cursor.execute(f'DROP TABLE IF EXISTS "{self.staging}"')
+
+    def drop_dangling(self, cursor, columns):
+        """
+        Null (or, for required columns, drop) staged references to rows that
+        exist neither in the target table nor among the staged rows.
+        Returns the number of affected staged rows.
+        """
+        affected = 0
+        for field in self.fields:
+            if not field.is_relation or field.column not in columns:
+                continue
+            target = field.related_model
+            target_table = target._meta.db_table
+            target_pk = target._meta.pk.column
+            missing = (
+                f's."{field.column}" IS NOT NULL AND NOT EXISTS '
+                f'(SELECT 1 FROM "{target_table}" t WHERE t."{target_pk}" = s."{field.column}")'
+            )
+            if target is self.model:
+                missing += f' AND NOT EXISTS (SELECT 1 FROM "{self.staging}" o WHERE o."{target_pk}" = s."{field.column}")'
+            if field.null:
+                cursor.execute(f'UPDATE "{self.staging}" s SET "{field.column}" = NULL WHERE {missing}')
+            else:
+                cursor.execute(f'DELETE FROM "{self.staging}" s WHERE {missing}')
+            affected += cursor.rowcount
+        return affected
+
+    def merge(self, cursor, columns):
+        """
+        Upsert the staged rows. Duplicates of a key (e.g. lines staged twice
+        after a resume) collapse to the last staged one. Only `columns`, the
+        columns the input provides, are overwritten on existing rows, so
+        denormalised totals and tree fields are left to the rebuild.
+        """
+        conflict = self.conflict_columns()
+        names = ', '.join(f'"{column}"' for column in self.columns)
+        keys = ', '.join(f'"{column}"' for column in conflict)
+        updates = [column for column in self.columns if column in columns and column not in conflict]
+        if updates:
+            action = 'DO UPDATE SET ' + ', '.join(f'"{column}" = EXCLUDED."{column}"' for column in updates)
+        else:
+            action = 'DO NOTHING'
+        cursor.execute(
+            f'INSERT INTO "{self.table}" ({names}) '
+            f'SELECT DISTINCT ON ({keys}) {names} FROM "{self.staging}" ORDER BY {keys}, _line DESC '
+            f'ON CONFLICT ({keys}) {action}'
+        )
+        return cursor.rowcount
+
+    def staged_ids(self, cursor, column):
+        cursor.execute(f'SELECT DISTINCT "{column}" FROM "{self.staging}" WHERE "{column}" IS NOT NULL')
+        return [row[0] for row in cursor.fetchall()]
+
+
+class Stager:
+    """Buffers rows of one batch and stages them with one COPY per model."""
+
+    def __init__(self, source):
+        self.tables = {model: StagedTable(model) for model in source.models}
+        self.columns = {model._meta.label: set() for model in source.models}
+        self.buffers = {model: [] for model in source.models}
+        self.now = timezone.now()
+
+    def add(self, model, values, line):
+        table = self.tables[model]
+        self.columns[model._meta.label].update(table.attnames[name] for name in values)
+        self.buffers[model].append(table.row(values, line, self.now))
+
+    def flush(self):
+        """COPY the buffered rows in one transaction. Returns the number of staged rows."""
+        staged = 0
+        with transaction.atomic(), connection.cursor() as cursor:
+            for model, lines in self.buffers.items():
+                if lines:
+                    self.tables[model].create(cursor)
+                    self.tables[model].copy(cursor, lines)
+                    staged += len(lines)
+                    lines.clear()
+        return staged
@@ -0,0 +1,120 @@
+"""
+Streaming export of the catalogue (components, packets, supplier relations,
+parameters), shared by the export API view and the export_catalogue command.
+
+Every entity is read with values_list().iterator(chunk_size=...), i.e. over a
+server-side cursor, and turned into rows one at a time, so memory use does
+not depend on the size of the catalogue.
+"""
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models.component import Component, ComponentParameter, Packet, SupplierRelation
+from .models.warehouse import Warehouse
+
+CHUNK_SIZE = 2000
+
+
+class Echo:
+    # csv.writer jen vrací zapsaný řádek, aby šel rovnou streamovat
+    def write(self, value):
+        return value
+
+
+def location_paths():
+    """Full path of every warehouse location, built from a single query."""
+    locations = {row['id']: row for row in Warehouse.objects.values('id', 'name', 'parent_id')}
+    paths = {}
+
+    def path(location_id):
+        if location_id not in paths:
+            location = locations[location_id]
+            parent = location['parent_id']
+            paths[location_id] = f"{path(parent)} / {location['name']}" if parent in locations else location['name']
+        return paths[location_id]
+
+    for location_id in locations:
+        path(location_id)
+    return paths
+
+
+# Entita -> (queryset, {výstupní sloupec: pole pro values_list})
+ENTITIES = {
+    'components': (Component.objects.order_by('id'), {
+        'id': 'id',
+        'name': 'name',
+        'description': 'description',
+        'category': 'category_id',
+        'category_name': 'category__name',
+        'unit_type': 'unit_type',
+        'selling_price': 'selling_price',
+        'internal_price': 'internal_price',
+        'stock_total': 'stock_total',
+        'reserved_total': 'reserved_total',
+        'on_order_total': 'on_order_total',
+        'stock_value': 'stock_value',
+        'created_at': 'created_at',
+    }),
+    'packets': (Packet.objects.order_by('id'), {
+        'id': 'id',
+        'component': 'component_id',
+        'location': 'location_id',
+        'is_trackable': 'is_trackable',
+        'description': 'description',
+        'count': 'count',
+        'pending_quantity': 'pending_quantity',
+        'total_value': 'totalValue',
+        'item_value': 'itemValue',
+    }),
+    'suppliers': (SupplierRelation.objects.order_by('id'), {
+        'id': 'id',
+        'component': 'component_id',
+        'supplier': 'supplier_id',
+        'supplier_name': 'supplier__name',
+        'symbol': 'symbol',
+        'custom_url': 'custom_url',
+        'description': 'description',
+    }),
+    'parameters': (ComponentParameter.objects.order_by('id'), {
+        'id': 'id',
+        'component': 'component_id',
+        'parameter_type': 'parameter_type_id',
+        'parameter_name': 'parameter_type__name',
+        'value': 'value',
+    }),
+}
+
+
+def columns(entity):
+    names = list(ENTITIES[entity][1])
+    if entity == 'packets':
+        names.insert(names.index('location') + 1, 'location_path')
+    return names
+
+
+def rows(entity, chunk_size=CHUNK_SIZE):
+    """Yield the rows of one entity as dicts, in primary key order."""
+    queryset, fields = ENTITIES[entity]
+    names = list(fields)
+    paths = location_paths() if entity == 'packets' else None
+    for values in queryset.values_list(*fields.values()).iterator(chunk_size=chunk_size):
+        row = dict(zip(names, values))
+        if paths is not None:
+            row['location_path'] = paths.get(row['location'])
+        yield row
+
+
+def stream_ndjson(entities, chunk_size=CHUNK_SIZE):
+    """One JSON object per line, tagged with its entity in `type`."""
+    for entity in entities:
+        for row in rows(entity, chunk_size):
+            yield json.dumps({'type': entity, **row}, cls=DjangoJSONEncoder) + '\n'
+
+
+def stream_csv(entity, chunk_size=CHUNK_SIZE):
+    writer = csv.DictWriter(Echo(), fieldnames=columns(entity))
+    yield writer.writerow({name: name for name in writer.fieldnames})
+    for row in rows(entity, chunk_size):
+        yield writer.writerow(row)
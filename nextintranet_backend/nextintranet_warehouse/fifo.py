@@ -0,0 +1,108 @@
+"""
+Vectorised FIFO valuation (numpy), used by the valuation module.
+
+The kernels take a flat stream of entries ordered by (packet, timestamp),
+where `index` is the position of the entry's packet, and import no models,
+so worker processes of revalue_stock can load them without django.setup().
+
+FIFO consumption is a running difference of two cumulative sums: outflows
+always take the oldest priced inflows first, and an inflow arriving after
+an unmatched outflow is consumed by it first. After any entry the open
+layers of a packet are therefore the units of its layer stream between the
+cumulative outflow and the cumulative layer quantity, and their value is a
+difference of the cumulative layer value interpolated at those two points.
+"""
+import numpy as np
+
+PRICED_INFLOW = 1
+OUTFLOW = -1
+OTHER = 0
+# Pseudo-operace nesoucí Packet.archived_inflow_*: jen průměrná cena, bez vlivu na počet a FIFO
+ARCHIVED_INFLOW = 2
+
+
+def _group_cumsum(values, index, starts, size):
+    # Kumulativní součet restartovaný na začátku každého packetu
+    total = np.cumsum(values)
+    base = np.zeros(size)
+    base[index[starts]] = total[starts] - values[starts]
+    return total - base[index]
+
+
+def ledger_chunk(size, index, kinds, quantities, prices):
+    """
+    Running FIFO state after every entry, as arrays aligned with the entries:
+    count, total_value, item_value, inflow_quantity, inflow_value,
+    unmatched_outflow and remaining, the quantity left at the end in the
+    layer created by the entry (meaningful for PRICED_INFLOW entries).
+
+    Values follow Packet._replay() and Packet._update_valuation().
+    """
+    index = np.asarray(index, dtype=np.int64)
+    kinds = np.asarray(kinds, dtype=np.int8)
+    quantities = np.asarray(quantities, dtype=np.float64)
+    prices = np.asarray(prices, dtype=np.float64)
+    if not len(index):
+        return tuple(np.zeros(0) for _ in range(7))
+
+    starts = np.flatnonzero(np.r_[True, index[1:] != index[:-1]])
+    ends = np.r_[starts[1:], len(index)] - 1
+
+    def running(values):
+        return _group_cumsum(values, index, starts, size)
+
+    count = running(np.where(kinds == ARCHIVED_INFLOW, 0, quantities))
+    outflow = running(np.where(kinds == OUTFLOW, np.abs(quantities), 0))
+    priced = (kinds == PRICED_INFLOW) | (kinds == ARCHIVED_INFLOW)
+    inflow_quantity = running(np.where(priced, quantities, 0))
+    inflow_value = running(np.where(priced, quantities * prices, 0))
+
+    # Vrstvy jako jeden souvislý proud přes celý chunk; packet začíná na své bázi
+    layer_quantity = np.where((kinds == PRICED_INFLOW) & (quantities > 0), quantities, 0)
+    stream = np.cumsum(layer_quantity)
+    stream_value = np.cumsum(layer_quantity * prices)
+    stream_base = np.zeros(size)
+    stream_base[index[starts]] = stream[starts] - layer_quantity[starts]
+    layers = layer_quantity > 0
+    points = np.r_[0.0, stream[layers]]
+    values = np.r_[0.0, stream_value[layers]]
+
+    layered = stream - stream_base[index]
+    consumed = np.minimum(outflow, layered)
+    fifo_count = layered - consumed
+    fifo_value = stream_value - np.interp(stream_base[index] + consumed, points, values)
+    unmatched = outflow - consumed
+
+    # Stejné pravidlo jako Packet._update_valuation: chybějící oceněné kusy průměrnou cenou
+    average = np.divide(inflow_value, inflow_quantity, out=np.zeros_like(inflow_value), where=inflow_quantity > 0)
+    use_average = (count > fifo_count) & (inflow_quantity > 0)
+    total = np.where(use_average, fifo_value + (count - fifo_count) * average, fifo_value)
+    remaining_count = np.where(use_average, count, fifo_count)
+    valued = (count > 0) & (remaining_count > 0)
+    total_value = np.where(valued, np.round(total, 2), 0)
+    item_value = np.where(valued, np.round(np.divide(total, remaining_count, out=np.zeros_like(total), where=valued), 4), 0)
+
+    # Zbytek vrstvy na konci: část proudu nad celkovým výdejem packetu
+    final_outflow = np.repeat(outflow[ends], ends - starts + 1)
+    remaining = np.where(
+        layer_quantity > 0,
+        np.clip(layered - final_outflow, 0, layer_quantity),
+        quantities,
+    )
+    return count, total_value, item_value, inflow_quantity, inflow_value, unmatched, remaining
+
+
+def revalue_chunk(packet_ids, index, kinds, quantities, prices):
+    """
+    Final FIFO valuation of a chunk of packets, one row per packet:
+    (packet_id, count, total_value, item_value, inflow_quantity,
+    inflow_value, unmatched_outflow).
+    """
+    index = np.asarray(index, dtype=np.int64)
+    state = ledger_chunk(len(packet_ids), index, kinds, quantities, prices)
+    final = np.zeros((len(packet_ids), 6))
+    if len(index):
+        # Stav packetu je stav po jeho posledním záznamu
+        ends = np.flatnonzero(np.r_[index[1:] != index[:-1], True])
+        final[index[ends]] = np.column_stack(state[:6])[ends]
+    return [(packet_id, *map(float, row)) for packet_id, row in zip(packet_ids, final)]
@@ -0,0 +1,96 @@
+from django.core.management.base import BaseCommand
+from django.db import models
+from django.db.models.functions import Abs, Cast, Coalesce
+
+from nextintranet_warehouse.models.component import Component, Packet, Reservation, StockOperation
+from nextintranet_warehouse.models.purchase import PurchaseRequest
+from nextintranet_warehouse.signals import bump_component_versions
+from nextintranet_warehouse.valuation import rebuild_packets
+
+
+TOLERANCE = 0.005
+
+
+def total(queryset, group_by, expression):
+    return Coalesce(
+        models.Subquery(
+            queryset.order_by().values(group_by).annotate(total=models.Sum(expression)).values('total')[:1],
+            output_field=models.FloatField(),
+        ),
+        models.Value(0.0),
+    )
+
+
+def drift(field, expected):
+    return Abs(Cast(field, models.FloatField()) - Cast(expected, models.FloatField()))
+
+
+class Command(BaseCommand):
+    help = 'Find packets and components whose stored stock totals disagree with their history and repair them in bulk.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only report drift, do not repair.')
+        parser.add_argument('--show', type=int, default=20, help='How many drifted packets to list.')
+
+    def handle(self, *args, **options):
+        drifted = list(self.drifted_packets().values_list('id', 'count', 'expected_count', 'totalValue', 'expected_value'))
+        for packet_id, count, expected_count, total_value, expected_value in drifted[:options['show']]:
+            self.stdout.write(
+                f'{packet_id}: count {count} vs operations {expected_count:.2f}, '
+                f'totalValue {total_value} vs last operation {expected_value}'
+            )
+
+        components = list(self.drifted_components().values_list('id', flat=True))
+        self.stdout.write(f'{len(drifted)} packets and {len(components)} components drifted.')
+
+        if options['dry_run']:
+            self.stdout.write(self.style.SUCCESS('Dry run, nothing repaired.'))
+            return
+
+        # Přestavba ledgeru přepíše i balance_after/value_after operací, takže další audit už drift nenajde
+        repaired = rebuild_packets([row[0] for row in drifted])
+
+        Component.objects.filter(id__in=components).refresh_stock_totals()
+        bump_component_versions(components)
+
+        self.stdout.write(self.style.SUCCESS(f'Repaired {repaired} packets and {len(components)} components.'))
+
+    def drifted_packets(self):
+        """
+        Packets whose count differs from the sum of their operations, or whose
+        totalValue differs from the running value of their last operation.
+        Packets waiting in the recalculation queue are skipped.
+        """
+        operations = StockOperation.objects.filter(packet=models.OuterRef('pk'))
+        last_operation = operations.filter(value_after__isnull=False).order_by('-timestamp', '-id')
+        return Packet.objects.filter(pending_quantity=0).annotate(
+            expected_count=total(operations, 'packet', 'quantity'),
+            expected_value=Coalesce(
+                models.Subquery(last_operation.values('value_after')[:1]),
+                models.F('totalValue'),
+            ),
+        ).annotate(
+            count_drift=drift('count', 'expected_count'),
+            value_drift=drift('totalValue', 'expected_value'),
+        ).filter(
+            models.Q(count_drift__gte=TOLERANCE) | models.Q(value_drift__gte=TOLERANCE)
+        )
+
+    def drifted_components(self):
+        packets = Packet.objects.filter(component=models.OuterRef('pk'))
+        return Component.objects.annotate(
+            expected_stock=total(packets, 'component', Cast('count', models.FloatField()) + models.F('pending_quantity')),
+            expected_value=total(packets, 'component', Cast('totalValue', models.FloatField())),
+            expected_reserved=total(Reservation.objects.filter(component=models.OuterRef('pk')), 'component', 'quantity'),
+            expected_on_order=total(PurchaseRequest.objects.filter(component=models.OuterRef('pk'), purchase__isnull=True), 'component', 'quantity'),
+        ).annotate(
+            stock_drift=drift('stock_total', 'expected_stock'),
+            value_drift=drift('stock_value', 'expected_value'),
+            reserved_drift=drift('reserved_total', 'expected_reserved'),
+            on_order_drift=drift('on_order_total', 'expected_on_order'),
+        ).filter(
+            models.Q(stock_drift__gte=TOLERANCE)
+            | models.Q(value_drift__gte=TOLERANCE)
+            | models.Q(reserved_drift__gte=TOLERANCE)
+            | models.Q(on_order_drift__gte=TOLERANCE)
+        )
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from nextintranet_warehouse.models.component import Packet
+
+
+class Command(BaseCommand):
+    help = 'Fill balance_after and value_after of existing stock operations by replaying packet histories.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Replay every packet, not only packets with missing balances.')
+
+    def handle(self, *args, **options):
+        queryset = Packet.objects.all()
+        if not options['all']:
+            queryset = queryset.filter(operations__balance_after__isnull=True).distinct()
+
+        packet_ids = list(queryset.values_list('id', flat=True))
+        self.stdout.write(f'Replaying {len(packet_ids)} packets...')
+
+        for index, packet_id in enumerate(packet_ids, start=1):
+            with transaction.atomic():
+                Packet.objects.select_for_update().get(pk=packet_id).rebuild()
+            if index % 500 == 0:
+                self.stdout.write(f'  {index}/{len(packet_ids)}')
+
+        self.stdout.write(self.style.SUCCESS(f'Backfilled balances of {len(packet_ids)} packets.'))
@@ -0,0 +1,118 @@
+import random
+import threading
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+
+from nextintranet_warehouse.models.component import Component, Packet, PacketRecalculation, StockOperation
+from nextintranet_warehouse.models.warehouse import Warehouse
+from nextintranet_warehouse.signals import muted_model_events
+
+
+class Command(BaseCommand):
+    help = 'Fire parallel stock operations at a few hot packets, verify the resulting totals and report throughput.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--packets', type=int, default=3, help='Number of hot packets.')
+        parser.add_argument('--threads', type=int, default=8, help='Parallel writers (each uses its own DB connection).')
+        parser.add_argument('--operations', type=int, default=200, help='Operations per writer.')
+        parser.add_argument('--seed', type=int, default=1, help='Random seed, so runs are reproducible.')
+        parser.add_argument('--keep', action='store_true', help='Keep the benchmark component, packets and operations.')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('The benchmark needs PostgreSQL (row locks are not meaningful elsewhere).')
+
+        location = Warehouse.objects.create(name='Contention benchmark', can_store_items=True)
+        component = Component.objects.create(name='Contention benchmark')
+        packets = [Packet.objects.create(component=component, location=location) for _ in range(options['packets'])]
+        packet_ids = [packet.id for packet in packets]
+
+        # Každé vlákno má předem daný seznam operací, takže běh je opakovatelný
+        plans = []
+        for thread in range(options['threads']):
+            generator = random.Random(options['seed'] * 1000 + thread)
+            plan = []
+            for _ in range(options['operations']):
+                packet_id = generator.choice(packet_ids)
+                if generator.random() < 0.6:
+                    plan.append((packet_id, 'add', generator.randint(1, 20), round(generator.uniform(0.5, 5), 2)))
+                else:
+                    plan.append((packet_id, 'remove', -generator.randint(1, 10), None))
+            plans.append(plan)
+
+        errors = []
+        barrier = threading.Barrier(options['threads'])
+
+        def writer(plan):
+            try:
+                with muted_model_events():
+                    barrier.wait()
+                    for packet_id, operation_type, quantity, unit_price in plan:
+                        StockOperation.objects.create(
+                            packet_id=packet_id,
+                            operation_type=operation_type,
+                            quantity=quantity,
+                            unit_price=unit_price,
+                        )
+            except Exception as error:  # noqa: BLE001 - chyba se vypíše v souhrnu
+                errors.append(error)
+            finally:
+                connections.close_all()
+
+        workers = [threading.Thread(target=writer, args=(plan,)) for plan in plans]
+        started = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - started
+
+        total = options['threads'] * options['operations']
+        self.stdout.write(f'{total} operations on {len(packet_ids)} packets with {options["threads"]} writers in {elapsed:.2f}s')
+        self.stdout.write(f'Throughput: {total / elapsed:.0f} operations/s')
+        for error in errors:
+            self.stdout.write(self.style.ERROR(f'Writer failed: {error!r}'))
+
+        try:
+            ok = self.verify(packet_ids)
+        finally:
+            if not options['keep']:
+                self.cleanup(component, location, packet_ids)
+
+        if errors or not ok:
+            raise CommandError('Contention benchmark found inconsistent totals.')
+        self.stdout.write(self.style.SUCCESS('All packet totals are consistent.'))
+
+    def verify(self, packet_ids):
+        ok = True
+        for packet_id in packet_ids:
+            packet = Packet.objects.get(pk=packet_id)
+            # V odloženém režimu nejdřív doženeme frontu
+            packet.apply_pending()
+            PacketRecalculation.objects.filter(packet_id=packet_id).delete()
+            packet.refresh_from_db()
+
+            expected = sum(StockOperation.objects.filter(packet_id=packet_id).values_list('quantity', flat=True))
+            stored = (packet.count, packet.totalValue, packet.itemValue)
+            packet.rebuild()
+            packet.refresh_from_db()
+            rebuilt = (packet.count, packet.totalValue, packet.itemValue)
+
+            consistent = Decimal(str(round(expected, 2))) == stored[0] and stored == rebuilt
+            ok = ok and consistent
+            self.stdout.write(
+                f'{packet_id}: operations sum {expected:.2f}, stored count {stored[0]}, value {stored[1]}'
+                f'{"" if consistent else f" != rebuilt {rebuilt}"}'
+            )
+        return ok
+
+    def cleanup(self, component, location, packet_ids):
+        with muted_model_events():
+            Packet.objects.filter(pk__in=packet_ids).update(last_operation=None)
+            StockOperation.objects.filter(packet_id__in=packet_ids).delete()
+            Packet.objects.filter(pk__in=packet_ids).delete()
+            component.delete()
+            location.delete()
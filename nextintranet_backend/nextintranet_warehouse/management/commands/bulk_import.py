@@ -0,0 +1,202 @@
+import json
+import os
+import time
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Q
+
+from nextintranet_backend.conditional import bump_versions, version_key
+from nextintranet_backend.search import refresh_search_vectors
+from nextintranet_warehouse.bulk_import import BATCH_SIZE, MERGE_ORDER, SOURCES, StagedTable, Stager
+from nextintranet_warehouse.models.category import Category
+from nextintranet_warehouse.models.component import Component, Packet, StockOperation, Supplier, Tag
+from nextintranet_warehouse.models.warehouse import Warehouse
+from nextintranet_warehouse.signals import bump_component_versions
+from nextintranet_warehouse.valuation import rebuild_packets
+
+
+class Command(BaseCommand):
+    help = (
+        'Import a legacy NDJSON export (categories, positions, stock or operations) with COPY and '
+        'INSERT ... ON CONFLICT. Resumable; trees and packet totals are rebuilt once at the end.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=list(SOURCES), help='What the input file contains.')
+        parser.add_argument('input', help='NDJSON file, one exported document per line.')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Input lines staged per COPY transaction.')
+        parser.add_argument('--checkpoint', help='Checkpoint file (default: <input>.checkpoint.json).')
+        parser.add_argument('--restart', action='store_true', help='Ignore the checkpoint and drop previously staged rows.')
+        parser.add_argument('--max-errors', type=int, default=100, help='Abort after this many unparsable lines.')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('bulk_import needs PostgreSQL (COPY, ON CONFLICT).')
+
+        source = SOURCES[options['kind']]()
+        tables = [StagedTable(model) for model in MERGE_ORDER if model in source.models]
+        path = options['checkpoint'] or options['input'] + '.checkpoint.json'
+
+        if options['restart']:
+            self.cleanup(tables, path)
+        checkpoint = self.load_checkpoint(path, options)
+
+        started = time.perf_counter()
+        if checkpoint['phase'] == 'staging':
+            self.stage(source, options, checkpoint, path)
+            checkpoint['phase'] = 'merging'
+            self.save_checkpoint(path, checkpoint)
+
+        merged = self.merge(tables, checkpoint)
+        self.rebuild(tables, merged)
+        self.cleanup(tables, path)
+
+        elapsed = time.perf_counter() - started
+        total = sum(merged.values())
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {total} rows from {checkpoint["line"]} lines in {elapsed:.1f}s '
+            f'({total / elapsed if elapsed else 0:.0f} rows/s).'
+        ))
+
+    def load_checkpoint(self, path, options):
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as file:
+                checkpoint = json.load(file)
+            if checkpoint['kind'] != options['kind']:
+                raise CommandError(f'Checkpoint {path} belongs to a {checkpoint["kind"]} import, use --restart.')
+            self.stdout.write(f'Resuming from line {checkpoint["line"]} ({checkpoint["phase"]}).')
+            return checkpoint
+        return {'kind': options['kind'], 'phase': 'staging', 'offset': 0, 'line': 0, 'staged': 0, 'columns': {}}
+
+    def save_checkpoint(self, path, checkpoint):
+        # Zápis přes dočasný soubor, aby přerušení nenechalo rozbitý checkpoint
+        temporary = path + '.tmp'
+        with open(temporary, 'w', encoding='utf-8') as file:
+            json.dump(checkpoint, file)
+        os.replace(temporary, path)
+
+    def stage(self, source, options, checkpoint, path):
+        """Read the input from the checkpoint offset and COPY it into staging tables batch by batch."""
+        stager = Stager(source)
+        for label, columns in checkpoint['columns'].items():
+            stager.columns[label].update(columns)
+
+        errors = 0
+        pending = 0
+        started = time.perf_counter()
+        first_line = checkpoint['line']
+
+        with open(options['input'], 'rb') as file:
+            file.seek(checkpoint['offset'])
+            line_number = checkpoint['line']
+            for raw in iter(file.readline, b''):
+                line_number += 1
+                if raw.strip():
+                    try:
+                        for model, values in source.rows(json.loads(raw)):
+                            stager.add(model, values, line_number)
+                    except (ValueError, KeyError, TypeError, IndexError) as e:
+                        errors += 1
+                        self.stderr.write(f'Line {line_number}: {e!r}')
+                        if errors > options['max_errors']:
+                            raise CommandError(f'More than {options["max_errors"]} unparsable lines, giving up.')
+                pending += 1
+
+                if pending >= options['batch_size']:
+                    self.flush(stager, checkpoint, path, file.tell(), line_number)
+                    pending = 0
+                    rate = (line_number - first_line) / (time.perf_counter() - started)
+                    self.stdout.write(f'Staged {checkpoint["line"]} lines, {checkpoint["staged"]} rows ({rate:.0f} lines/s).')
+
+            self.flush(stager, checkpoint, path, file.tell(), line_number)
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f'Staged {checkpoint["line"] - first_line} lines in {elapsed:.1f}s '
+            f'({(checkpoint["line"] - first_line) / elapsed if elapsed else 0:.0f} lines/s), {errors} errors.'
+        )
+
+    def flush(self, stager, checkpoint, path, offset, line_number):
+        checkpoint['staged'] += stager.flush()
+        # Checkpoint se zapisuje až po commitu; řádky znovu nahrané po pádu se při slučování sloučí
+        checkpoint.update(
+            offset=offset,
+            line=line_number,
+            columns={label: sorted(columns) for label, columns in stager.columns.items()},
+        )
+        self.save_checkpoint(path, checkpoint)
+
+    def merge(self, tables, checkpoint):
+        """Upsert every staging table into its model table in one transaction."""
+        merged = {}
+        with transaction.atomic(), connection.cursor() as cursor:
+            for table in tables:
+                if not table.exists(cursor):
+                    continue
+                started = time.perf_counter()
+                columns = set(checkpoint['columns'].get(table.model._meta.label, ()))
+                dropped = table.drop_dangling(cursor, columns)
+                merged[table.model] = table.merge(cursor, columns)
+                self.stdout.write(
+                    f'{table.model._meta.label}: merged {merged[table.model]} rows in '
+                    f'{time.perf_counter() - started:.1f}s, {dropped} rows with dangling references cleared or dropped.'
+                )
+        return merged
+
+    def rebuild(self, tables, merged):
+        """Recompute everything the merge skipped: MPTT fields, operation chains, totals and search vectors."""
+        staged = {table.model: table for table in tables if table.model in merged}
+        with connection.cursor() as cursor:
+            component_ids = staged[Component].staged_ids(cursor, 'id') if Component in staged else []
+            packet_ids = staged[Packet].staged_ids(cursor, 'id') if Packet in staged else []
+            operation_packet_ids = staged[StockOperation].staged_ids(cursor, 'packet_id') if StockOperation in staged else []
+            operation_ids = staged[StockOperation].staged_ids(cursor, 'id') if StockOperation in staged else []
+            location_ids = staged[Warehouse].staged_ids(cursor, 'id') if Warehouse in staged else []
+
+        for model in (Category, Warehouse):
+            if model in staged:
+                started = time.perf_counter()
+                model.objects.rebuild()
+                self.stdout.write(f'Rebuilt {model._meta.label} tree in {time.perf_counter() - started:.1f}s.')
+        model_keys = [version_key(model) for model in (Category, Warehouse, Supplier, Tag) if model in staged]
+        bump_versions(*model_keys)
+
+        if operation_packet_ids:
+            call_command('relink_operations', *[str(packet_id) for packet_id in operation_packet_ids], stdout=self.stdout)
+
+        # Přestavba FIFO ledgeru po dávkách, stejně jako revalue_stock / audit_stock
+        revalue_ids = list(dict.fromkeys(packet_ids + operation_packet_ids))
+        started = time.perf_counter()
+        # Importované operace nemají balance_after, ale ve frontě (pending_quantity) nikdy nebyly
+        rebuild_packets(revalue_ids, fresh=operation_ids)
+        if revalue_ids:
+            self.stdout.write(f'Rebuilt the ledger of {len(revalue_ids)} packets in {time.perf_counter() - started:.1f}s.')
+
+        # Fulltextové dokumenty, které by jinak obnovily signály
+        search_scopes = [
+            Warehouse.objects.filter(id__in=location_ids),
+            Component.objects.filter(id__in=component_ids),
+            Packet.objects.filter(Q(id__in=packet_ids) | Q(component__in=component_ids) | Q(location__in=location_ids)),
+        ]
+        if location_ids or component_ids or packet_ids:
+            started = time.perf_counter()
+            refreshed = sum(refresh_search_vectors(queryset) for queryset in search_scopes)
+            self.stdout.write(f'Refreshed {refreshed} search vectors in {time.perf_counter() - started:.1f}s.')
+
+        if component_ids:
+            with transaction.atomic():
+                Component.objects.filter(id__in=component_ids).refresh_stock_totals()
+                bump_component_versions(component_ids)
+            # Ručně nahraný primární dokument má přednost před obrázkem z exportu
+            for component in Component.objects.filter(id__in=component_ids, documents__is_primary=True).distinct():
+                component.refresh_primary_image_url()
+
+    def cleanup(self, tables, path):
+        with connection.cursor() as cursor:
+            for table in tables:
+                table.drop(cursor)
+        for name in (path, path + '.tmp'):
+            if os.path.exists(name):
+                os.remove(name)
@@ -0,0 +1,152 @@
+import datetime
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from nextintranet_warehouse.models.component import Packet, StockOperation
+from nextintranet_warehouse.models.inventory import ArchivedStockOperation
+from nextintranet_warehouse.signals import muted_model_events
+
+
+class Mismatch(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Move stock operations older than a cutoff into the archive and replace them with '
+        'opening-balance operations, one per surviving FIFO layer.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--before', required=True, help='Cutoff date (YYYY-MM-DD); older operations are archived.')
+        parser.add_argument('packets', nargs='*', help='Packet ids to compact (default: all packets).')
+        parser.add_argument('--min-operations', type=int, default=50, help='Skip packets with fewer operations before the cutoff.')
+        parser.add_argument('--dry-run', action='store_true', help='Compact and verify, then roll everything back.')
+
+    def handle(self, *args, **options):
+        date = parse_date(options['before'])
+        if date is None:
+            raise CommandError('Invalid --before date.')
+        cutoff = timezone.make_aware(datetime.datetime.combine(date, datetime.time.min))
+
+        queryset = Packet.objects.filter(operations__timestamp__lt=cutoff).distinct()
+        if options['packets']:
+            queryset = queryset.filter(id__in=options['packets'])
+        packet_ids = list(queryset.values_list('id', flat=True))
+
+        compacted = archived = failed = 0
+        for packet_id in packet_ids:
+            try:
+                with transaction.atomic(), muted_model_events():
+                    result = self.compact(packet_id, cutoff, options['min_operations'])
+                    if options['dry_run']:
+                        transaction.set_rollback(True)
+            except Mismatch as error:
+                failed += 1
+                self.stdout.write(self.style.ERROR(f'{packet_id}: {error}, left untouched'))
+                continue
+            if result:
+                compacted += 1
+                archived += result
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Compacted {compacted} packets, archived {archived} operations'
+            f'{" (dry run, rolled back)" if options["dry_run"] else ""}, {failed} failed verification.'
+        ))
+
+    def compact(self, packet_id, cutoff, min_operations):
+        packet = Packet.objects.select_for_update().get(pk=packet_id)
+        if packet.pending_quantity:
+            return 0
+        old = list(packet.operations.filter(timestamp__lt=cutoff).order_by('timestamp', 'id'))
+        if len(old) < min_operations:
+            return 0
+        before = (packet.count, packet.totalValue, packet.itemValue)
+
+        count, layers, unmatched, inflow_quantity, inflow_value = self.replay(
+            old, packet.archived_inflow_quantity, packet.archived_inflow_value,
+        )
+
+        ArchivedStockOperation.objects.bulk_create(
+            [ArchivedStockOperation(**{field: getattr(operation, field) for field in ArchivedStockOperation.COPIED_FIELDS}) for operation in old],
+            batch_size=1000,
+        )
+        for start in range(0, len(old), 1000):
+            StockOperation.objects.filter(pk__in=[operation.pk for operation in old[start:start + 1000]]).delete()
+
+        # Otevírací stavy: oceněné vrstvy v původním pořadí, zbytek počtu a případný nespárovaný výdej
+        timestamps = []
+        opening = []
+        last = None
+        for timestamp, remaining, unit_price in layers:
+            last = timestamp if last is None or timestamp > last else last + datetime.timedelta(microseconds=1)
+            timestamps.append(last)
+            opening.append(self.opening(packet, 'add', remaining, unit_price))
+        closing = max(old[-1].timestamp, last) if last else old[-1].timestamp
+        rest = count - sum(remaining for _, remaining, _ in layers) + unmatched
+        if abs(rest) > 1e-9:
+            timestamps.append(closing)
+            opening.append(self.opening(packet, 'adjust', rest))
+        if unmatched > 1e-9:
+            timestamps.append(closing + datetime.timedelta(microseconds=1))
+            opening.append(self.opening(packet, 'remove', -unmatched))
+
+        StockOperation.objects.bulk_create(opening)
+        # timestamp má auto_now_add, skutečné časy doplníme až po vložení
+        for operation, timestamp in zip(opening, timestamps):
+            StockOperation.objects.filter(pk=operation.pk).update(timestamp=timestamp)
+
+        packet.archived_inflow_quantity = inflow_quantity - sum(remaining for _, remaining, _ in layers)
+        packet.archived_inflow_value = inflow_value - sum(remaining * unit_price for _, remaining, unit_price in layers)
+        packet.save(update_fields=['archived_inflow_quantity', 'archived_inflow_value'])
+        # Otevírací stavy nejsou ve frontě přepočtu, nesmí snížit pending_quantity
+        packet.rebuild(fresh=opening)
+        packet.refresh_from_db(fields=['count', 'totalValue', 'itemValue'])
+
+        after = (packet.count, packet.totalValue, packet.itemValue)
+        if any(Decimal(a) != Decimal(b) for a, b in zip(before, after)):
+            raise Mismatch(f'totals changed {before} -> {after}')
+        return len(old)
+
+    def opening(self, packet, operation_type, quantity, unit_price=None):
+        return StockOperation(
+            packet=packet,
+            operation_type=operation_type,
+            quantity=quantity,
+            unit_price=unit_price,
+            opening_balance=True,
+            description='Opening balance (archived history)',
+        )
+
+    def replay(self, operations, inflow_quantity, inflow_value):
+        # Stejná logika jako Packet._replay, jen v paměti
+        count = 0.0
+        unmatched = 0.0
+        layers = []
+        for operation in operations:
+            quantity = operation.quantity or 0
+            if operation.is_priced_inflow:
+                remaining = quantity
+                if quantity > 0 and unmatched > 0:
+                    consumed = min(quantity, unmatched)
+                    remaining -= consumed
+                    unmatched -= consumed
+                if remaining > 0:
+                    layers.append([operation.timestamp, remaining, operation.unit_price])
+                inflow_quantity += quantity
+                inflow_value += quantity * operation.unit_price
+            elif operation.operation_type in StockOperation.OUTFLOW_TYPES:
+                to_consume = abs(quantity)
+                while to_consume > 0 and layers:
+                    consumed = min(to_consume, layers[0][1])
+                    layers[0][1] -= consumed
+                    to_consume -= consumed
+                    if layers[0][1] <= 0:
+                        layers.pop(0)
+                unmatched += to_consume
+            count += quantity
+        return count, layers, unmatched, inflow_quantity, inflow_value
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from nextintranet_warehouse.partitioning import convert_stock_operations, ensure_partitions, is_partitioned
+
+
+class Command(BaseCommand):
+    help = 'Create upcoming monthly partitions of the stock operation table (run e.g. daily from cron).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--months', type=int, default=3, help='How many months ahead to prepare.')
+        parser.add_argument('--convert', action='store_true', help='Convert the plain table to a partitioned one first.')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Partitioning is only supported on PostgreSQL.')
+
+        with transaction.atomic():
+            if not is_partitioned(connection):
+                if not options['convert']:
+                    raise CommandError('The stock operation table is not partitioned, use --convert.')
+                self.stdout.write('Converting stock operations to a partitioned table...')
+                convert_stock_operations(connection, options['months'])
+
+            created = ensure_partitions(connection, timezone.now().date(), options['months'])
+
+        for name in created:
+            self.stdout.write(f'Created {name}')
+        self.stdout.write(self.style.SUCCESS(f'{len(created)} partitions created.'))
@@ -0,0 +1,50 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from nextintranet_warehouse.models.component import Packet, PacketRecalculation
+
+
+class Command(BaseCommand):
+    help = 'Apply queued stock operations to packet FIFO ledgers, one recalculation per dirty packet.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100, help='Packets taken from the queue per transaction.')
+        parser.add_argument('--loop', action='store_true', help='Keep polling the queue instead of exiting when it is empty.')
+        parser.add_argument('--interval', type=float, default=2.0, help='Seconds to sleep when the queue is empty (with --loop).')
+
+    def handle(self, *args, **options):
+        processed = 0
+        while True:
+            done = self.process_batch(options['batch_size'])
+            processed += done
+            if done:
+                self.stdout.write(f'Recalculated {done} packets, lag {PacketRecalculation.lag()["lag_seconds"]:.1f}s')
+                continue
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+        self.stdout.write(self.style.SUCCESS(f'Queue empty, {processed} packets recalculated.'))
+
+    def process_batch(self, batch_size):
+        with transaction.atomic():
+            # skip_locked dovolí běžet více workerům paralelně
+            entries = list(
+                PacketRecalculation.objects.select_for_update(skip_locked=True).order_by('queued_at')[:batch_size]
+            )
+            if not entries:
+                return 0
+
+            # Packety právě zamčené zápisem necháme ve frontě na příští kolo (a nečekáme na ně kvůli deadlocku)
+            packets = {
+                packet.pk: packet
+                for packet in Packet.objects.select_for_update(skip_locked=True).filter(
+                    pk__in=[entry.packet_id for entry in entries]
+                ).order_by('pk')
+            }
+            for packet in packets.values():
+                packet.apply_pending()
+            PacketRecalculation.objects.filter(packet_id__in=list(packets.keys())).delete()
+        return len(packets)
@@ -0,0 +1,41 @@
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from nextintranet_warehouse.models.component import Packet
+
+
+class Command(BaseCommand):
+    help = 'Rebuild FIFO ledgers of packets from their full operation history and report differences.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('packets', nargs='*', help='Packet ids to rebuild (default: all packets).')
+        parser.add_argument('--dry-run', action='store_true', help='Only report differences, roll back all changes.')
+
+    def handle(self, *args, **options):
+        queryset = Packet.objects.all().order_by('id')
+        if options['packets']:
+            queryset = queryset.filter(id__in=options['packets'])
+
+        rebuilt = 0
+        changed = 0
+        with transaction.atomic():
+            for packet in queryset.select_for_update().iterator(chunk_size=500):
+                before = (packet.count, packet.totalValue, packet.itemValue)
+                packet.rebuild()
+                packet.refresh_from_db(fields=['count', 'totalValue', 'itemValue'])
+                after = (packet.count, packet.totalValue, packet.itemValue)
+                rebuilt += 1
+
+                if any(Decimal(a) != Decimal(b) for a, b in zip(before, after)):
+                    changed += 1
+                    self.stdout.write(
+                        f'{packet.id}: count {before[0]} -> {after[0]}, '
+                        f'totalValue {before[1]} -> {after[1]}, itemValue {before[2]} -> {after[2]}'
+                    )
+
+            if options['dry_run']:
+                transaction.set_rollback(True)
+
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {rebuilt} packets, {changed} differed from stored values.'))
@@ -0,0 +1,82 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from nextintranet_warehouse.models.component import Packet, StockOperation
+from nextintranet_warehouse.signals import bump_component_versions
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute StockOperation.previous_operation and Packet.last_operation from operation '
+        'timestamps with set-based SQL. Runs no model save() and sends no signals.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('packets', nargs='*', help='Packet ids to relink (default: all packets).')
+        parser.add_argument('--dry-run', action='store_true', help='Only report how many rows would change.')
+
+    def handle(self, *args, **options):
+        operations = StockOperation._meta.db_table
+        packets = Packet._meta.db_table
+        packet_ids = options['packets']
+
+        # Pořadí (timestamp, id) je stejné jako při přepočtu paketu
+        scope = 'WHERE packet_id = ANY(%s::uuid[])' if packet_ids else ''
+        packet_scope = 'AND p.id = ANY(%s::uuid[])' if packet_ids else ''
+        params = [packet_ids] if packet_ids else []
+
+        chain = f'''
+            WITH ordered AS (
+                SELECT id, "timestamp",
+                       LAG(id) OVER (PARTITION BY packet_id ORDER BY "timestamp", id) AS previous_id
+                FROM "{operations}" {scope}
+            )
+        '''
+        latest = f'''
+            WITH latest AS (
+                SELECT DISTINCT ON (packet_id) packet_id, id
+                FROM "{operations}" {scope}
+                ORDER BY packet_id, "timestamp" DESC, id DESC
+            )
+        '''
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            if options['dry_run']:
+                cursor.execute(
+                    chain + f'SELECT count(*) FROM ordered JOIN "{operations}" o '
+                    'ON o.id = ordered.id AND o."timestamp" = ordered."timestamp" '
+                    'WHERE o.previous_operation_id IS DISTINCT FROM ordered.previous_id',
+                    params,
+                )
+                relinked = cursor.fetchone()[0]
+                cursor.execute(
+                    latest + f'SELECT count(*) FROM "{packets}" p LEFT JOIN latest ON latest.packet_id = p.id '
+                    f'WHERE p.last_operation_id IS DISTINCT FROM latest.id {packet_scope}',
+                    params * 2,
+                )
+                repointed = cursor.fetchone()[0]
+            else:
+                # Podmínka na timestamp dovolí PostgreSQL spojovat po oddílech, pokud je tabulka rozdělená
+                cursor.execute(
+                    chain + f'UPDATE "{operations}" o SET previous_operation_id = ordered.previous_id FROM ordered '
+                    'WHERE o.id = ordered.id AND o."timestamp" = ordered."timestamp" '
+                    'AND o.previous_operation_id IS DISTINCT FROM ordered.previous_id',
+                    params,
+                )
+                relinked = cursor.rowcount
+                # Pakety bez operací dostanou NULL díky LEFT JOIN v poddotazu
+                cursor.execute(
+                    latest + f'UPDATE "{packets}" p SET last_operation_id = target.id FROM ('
+                    f'SELECT p.id AS packet_id, latest.id FROM "{packets}" p LEFT JOIN latest ON latest.packet_id = p.id '
+                    f'WHERE p.last_operation_id IS DISTINCT FROM latest.id {packet_scope}'
+                    ') target WHERE p.id = target.packet_id RETURNING p.id, p.component_id',
+                    params * 2,
+                )
+                changed = cursor.fetchall()
+                repointed = len(changed)
+                bump_component_versions([row[1] for row in changed], [row[0] for row in changed])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{"Would relink" if options["dry_run"] else "Relinked"} {relinked} operations '
+            f'and {"would repoint" if options["dry_run"] else "repointed"} last_operation of {repointed} packets.'
+        ))
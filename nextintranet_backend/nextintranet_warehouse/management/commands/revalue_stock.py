@@ -0,0 +1,81 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+
+from nextintranet_warehouse.models.component import Packet
+from nextintranet_warehouse.fifo import revalue_chunk
+from nextintranet_warehouse.valuation import operation_chunks, rebuild_packets
+
+
+class Command(BaseCommand):
+    help = 'Revalue all packets (count, FIFO totalValue, itemValue) in bulk and report differences.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only report differences, do not write anything.')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Worker processes (1 = compute inline).')
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Packets per computation chunk.')
+        parser.add_argument('--show', type=int, default=50, help='How many differing packets to list.')
+
+    def handle(self, *args, **options):
+        stored = {
+            packet_id: (count, total_value, item_value)
+            for packet_id, count, total_value, item_value in Packet.objects.values_list('id', 'count', 'totalValue', 'itemValue')
+        }
+        # Packety čekající ve frontě přepočtu přeskočíme, jejich count ještě nezahrnuje všechny operace
+        skipped = set(Packet.objects.exclude(pending_quantity=0).values_list('id', flat=True))
+
+        results = {}
+        workers = max(options['workers'], 1)
+        # revalue_chunk je z modulu bez modelů, workery ho načtou i bez django.setup() (spawn/forkserver)
+        executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+        try:
+            futures = []
+            for chunk in operation_chunks(exclude=skipped, chunk_size=options['chunk_size']):
+                if executor:
+                    futures.append(executor.submit(revalue_chunk, *chunk))
+                else:
+                    results.update((row[0], row) for row in revalue_chunk(*chunk))
+            for future in futures:
+                results.update((row[0], row) for row in future.result())
+        finally:
+            if executor:
+                executor.shutdown()
+
+        changed = []
+        for packet_id, values in stored.items():
+            if packet_id in skipped:
+                continue
+            row = results.get(packet_id, (packet_id, 0, 0, 0, 0, 0, 0))
+            if self.differs(values, row[1:4]):
+                changed.append((packet_id, values, row))
+
+        for packet_id, before, row in changed[:options['show']]:
+            self.stdout.write(
+                f'{packet_id}: count {before[0]} -> {row[1]:.2f}, '
+                f'totalValue {before[1]} -> {row[2]:.2f}, itemValue {before[2]} -> {row[3]:.4f}'
+            )
+        if len(changed) > options['show']:
+            self.stdout.write(f'... and {len(changed) - options["show"]} more')
+
+        value_before = sum(Decimal(before[1]) for _, before, _ in changed)
+        value_after = sum(Decimal(str(row[2])) for _, _, row in changed)
+        self.stdout.write(f'Value of changed packets: {value_before:.2f} -> {value_after:.2f}')
+
+        if not options['dry_run'] and changed:
+            # Oprava pod zámky packetů přepíše vrstvy i balance_after/value_after operací
+            rebuild_packets([packet_id for packet_id, _, _ in changed])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Revalued {len(stored) - len(skipped)} packets, {len(changed)} differed'
+            f'{" (dry run, nothing written)" if options["dry_run"] else ""}, {len(skipped)} skipped as queued.'
+        ))
+
+    def differs(self, before, after):
+        count, total_value, item_value = before
+        return (
+            abs(float(count) - after[0]) >= 0.005
+            or abs(float(total_value) - after[1]) >= 0.005
+            or abs(float(item_value) - after[2]) >= 0.00005
+        )
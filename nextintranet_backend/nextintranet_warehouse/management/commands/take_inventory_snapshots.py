@@ -0,0 +1,79 @@
+import calendar
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import models, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from nextintranet_warehouse.models.component import Packet, StockOperation
+from nextintranet_warehouse.models.inventory import InventorySnapshot
+
+
+class Command(BaseCommand):
+    help = 'Store per-packet stock count and value at the end of a day (or month) into InventorySnapshot.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help='Snapshot date (YYYY-MM-DD). Defaults to yesterday.')
+        parser.add_argument('--since', help='Backfill every day (or month end) from this date up to --date.')
+        parser.add_argument('--period', choices=['day', 'month'], default='day')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        end = self.parse(options['date']) if options['date'] else timezone.localdate() - datetime.timedelta(days=1)
+        start = self.parse(options['since']) if options['since'] else end
+        if start > end:
+            raise CommandError('--since must not be after --date.')
+
+        for date in self.dates(start, end, options['period']):
+            stored = self.snapshot(date, options['period'], options['batch_size'])
+            self.stdout.write(f'{date}: {stored} packets')
+
+        self.stdout.write(self.style.SUCCESS('Inventory snapshots stored.'))
+
+    def parse(self, value):
+        date = parse_date(value)
+        if date is None:
+            raise CommandError(f'Invalid date: {value}')
+        return date
+
+    def dates(self, start, end, period):
+        if period == 'day':
+            for offset in range((end - start).days + 1):
+                yield start + datetime.timedelta(days=offset)
+            return
+
+        # Měsíční snapshot vždy k poslednímu dni měsíce
+        year, month = start.year, start.month
+        while (year, month) <= (end.year, end.month):
+            yield datetime.date(year, month, calendar.monthrange(year, month)[1])
+            year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+
+    def snapshot(self, date, period, batch_size):
+        until = timezone.make_aware(datetime.datetime.combine(date, datetime.time.max))
+
+        # Jen packety, které do daného okamžiku měly nějaký pohyb
+        packets = Packet.objects.filter(
+            models.Exists(StockOperation.objects.filter(packet=models.OuterRef('pk'), timestamp__lte=until))
+        ).as_of(until).values_list('id', 'count_as_of', 'value_as_of')
+
+        stored = 0
+        batch = []
+        with transaction.atomic():
+            for packet_id, count, value in packets.iterator(chunk_size=batch_size):
+                batch.append(InventorySnapshot(packet_id=packet_id, date=date, period=period, until=until, count=count, value=value))
+                if len(batch) >= batch_size:
+                    stored += self.store(batch)
+                    batch = []
+            if batch:
+                stored += self.store(batch)
+        return stored
+
+    def store(self, batch):
+        InventorySnapshot.objects.bulk_create(
+            batch,
+            update_conflicts=True,
+            unique_fields=['packet', 'date'],
+            update_fields=['period', 'until', 'count', 'value'],
+        )
+        return len(batch)
@@ -0,0 +1,52 @@
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nextintranet_warehouse', '0040_purchaserequest_item_name_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='packet',
+            name='ledger_ready',
+            field=models.BooleanField(default=False, help_text='Indicates if the FIFO layers of the packet are built and can be updated incrementally.', verbose_name='Ledger ready'),
+        ),
+        migrations.AddField(
+            model_name='packet',
+            name='inflow_quantity',
+            field=models.FloatField(default=0, help_text='Total quantity of all priced inflow operations.', verbose_name='Inflow quantity'),
+        ),
+        migrations.AddField(
+            model_name='packet',
+            name='inflow_value',
+            field=models.FloatField(default=0, help_text='Total value of all priced inflow operations.', verbose_name='Inflow value'),
+        ),
+        migrations.AddField(
+            model_name='packet',
+            name='unmatched_outflow',
+            field=models.FloatField(default=0, help_text='Outflow quantity not yet matched against any priced inflow.', verbose_name='Unmatched outflow'),
+        ),
+        migrations.CreateModel(
+            name='PacketLayer',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('timestamp', models.DateTimeField(verbose_name='Timestamp')),
+                ('quantity', models.FloatField(verbose_name='Quantity')),
+                ('remaining', models.FloatField(verbose_name='Remaining quantity')),
+                ('unit_price', models.FloatField(verbose_name='Unit price')),
+                ('operation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='layers', to='nextintranet_warehouse.stockoperation', verbose_name='Operation')),
+                ('packet', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='layers', to='nextintranet_warehouse.packet', verbose_name='Packet')),
+            ],
+            options={
+                'verbose_name': 'Packet layer',
+                'verbose_name_plural': 'Packet layers',
+                'ordering': ['timestamp', 'id'],
+                'indexes': [models.Index(fields=['packet', 'timestamp'], name='packetlayer_packet_ts_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nextintranet_warehouse', '0041_packet_fifo_ledger'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stockoperation',
+            name='balance_after',
+            field=models.DecimalField(blank=True, decimal_places=2, help_text='Packet count right after this operation.', max_digits=10, null=True, verbose_name='Balance after'),
+        ),
+        migrations.AddField(
+            model_name='stockoperation',
+            name='value_after',
+            field=models.DecimalField(blank=True, decimal_places=2, help_text='Packet total value right after this operation.', max_digits=15, null=True, verbose_name='Value after'),
+        ),
+        migrations.AddIndex(
+            model_name='stockoperation',
+            index=models.Index(fields=['packet', 'timestamp'], name='stockop_packet_ts_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nextintranet_warehouse', '0042_stockoperation_balance_after'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InventorySnapshot',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('date', models.DateField(verbose_name='Date')),
+                ('period', models.CharField(choices=[('day', 'Day'), ('month', 'Month')], default='day', max_length=10, verbose_name='Period')),
+                ('until', models.DateTimeField(help_text='Moment the snapshot describes (end of the date).', verbose_name='Until')),
+                ('count', models.DecimalField(decimal_places=2, default=0, max_digits=10, verbose_name='Count')),
+                ('value', models.DecimalField(decimal_places=2, default=0, max_digits=15, verbose_name='Value')),
+                ('packet', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshots', to='nextintranet_warehouse.packet', verbose_name='Packet')),
+            ],
+            options={
+                'verbose_name': 'Inventory snapshot',
+                'verbose_name_plural': 'Inventory snapshots',
+                'ordering': ['-date'],
+                'constraints': [models.UniqueConstraint(fields=('packet', 'date'), name='inventorysnapshot_packet_date_uniq')],
+            },
+        ),
+    ]
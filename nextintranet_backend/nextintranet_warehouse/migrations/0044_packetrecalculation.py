@@ -0,0 +1,34 @@
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nextintranet_warehouse', '0043_inventorysnapshot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='packet',
+            name='pending_quantity',
+            field=models.FloatField(default=0, help_text='Quantity of operations waiting in the recalculation queue.', verbose_name='Pending quantity'),
+        ),
+        migrations.CreateModel(
+            name='PacketRecalculation',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('queued_at', models.DateTimeField(verbose_name='Queued at')),
+                ('last_marked_at', models.DateTimeField(verbose_name='Last marked at')),
+                ('pending_operations', models.PositiveIntegerField(default=1, verbose_name='Pending operations')),
+                ('packet', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='recalculation', to='nextintranet_warehouse.packet', verbose_name='Packet')),
+            ],
+            options={
+                'verbose_name': 'Packet recalculation',
+                'verbose_name_plural': 'Packet recalculations',
+                'ordering': ['queued_at'],
+            },
+        ),
+    ]
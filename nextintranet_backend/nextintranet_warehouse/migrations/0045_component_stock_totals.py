@@ -0,0 +1,57 @@
+from django.db import migrations, models
+from django.db.models.functions import Cast, Coalesce
+
+
+def fill_stock_totals(apps, schema_editor):
+    Component = apps.get_model('nextintranet_warehouse', 'Component')
+    Packet = apps.get_model('nextintranet_warehouse', 'Packet')
+    Reservation = apps.get_model('nextintranet_warehouse', 'Reservation')
+    PurchaseRequest = apps.get_model('nextintranet_warehouse', 'PurchaseRequest')
+
+    def total(queryset, expression):
+        return Coalesce(
+            models.Subquery(
+                queryset.order_by().values('component').annotate(total=models.Sum(expression)).values('total')[:1],
+                output_field=models.FloatField(),
+            ),
+            models.Value(0.0),
+        )
+
+    packets = Packet.objects.filter(component=models.OuterRef('pk'))
+    Component.objects.update(
+        stock_total=total(packets, Cast('count', models.FloatField()) + models.F('pending_quantity')),
+        stock_value=total(packets, Cast('totalValue', models.FloatField())),
+        reserved_total=total(Reservation.objects.filter(component=models.OuterRef('pk')), 'quantity'),
+        on_order_total=total(PurchaseRequest.objects.filter(component=models.OuterRef('pk'), purchase__isnull=True), 'quantity'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nextintranet_warehouse', '0044_packetrecalculation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='component',
+            name='stock_total',
+            field=models.FloatField(db_index=True, default=0, help_text='Quantity in all packets of the component.', verbose_name='Stock total'),
+        ),
+        migrations.AddField(
+            model_name='component',
+            name='reserved_total',
+            field=models.FloatField(default=0, help_text='Quantity reserved by reservations.', verbose_name='Reserved total'),
+        ),
+        migrations.AddField(
+            model_name='component',
+            name='on_order_total',
+            field=models.FloatField(default=0, help_text='Quantity in purchase requests not yet ordered.', verbose_name='On order total'),
+        ),
+        migrations.AddField(
+            model_name='component',
+            name='stock_value',
+            field=models.FloatField(db_index=True, default=0, help_text='Total value of all packets of the component.', verbose_name='Stock value'),
+        ),
+        migrations.RunPython(fill_stock_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,13 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    # Převod na rozdělenou tabulku není součástí migrací, aby schéma nezáviselo na prostředí.
+    # Provádí se výslovně příkazem `manage.py create_stock_partitions --convert`
+    # (viz nextintranet_warehouse/partitioning.py a docs/stock-partitioning.md).
+
+    dependencies = [
+        ('nextintranet_warehouse', '0045_component_stock_totals'),
+    ]
+
+    operations = []
@@ -0,0 +1,56 @@
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nextintranet_warehouse', '0046_stockoperation_partitioning'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stockoperation',
+            name='opening_balance',
+            field=models.BooleanField(default=False, help_text='Synthetic operation replacing archived history (see compact_stock_history).', verbose_name='Opening balance'),
+        ),
+        migrations.AddField(
+            model_name='packet',
+            name='archived_inflow_quantity',
+            field=models.FloatField(default=0, help_text='Priced inflow quantity of archived operations not represented by opening balances.', verbose_name='Archived inflow quantity'),
+        ),
+        migrations.AddField(
+            model_name='packet',
+            name='archived_inflow_value',
+            field=models.FloatField(default=0, help_text='Priced inflow value of archived operations not represented by opening balances.', verbose_name='Archived inflow value'),
+        ),
+        migrations.CreateModel(
+            name='ArchivedStockOperation',
+            fields=[
+                ('id', models.UUIDField(editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(verbose_name='Created at')),
+                ('archived_at', models.DateTimeField(auto_now_add=True, verbose_name='Archived at')),
+                ('reference', models.UUIDField(blank=True, null=True, verbose_name='Reference')),
+                ('previous_operation_id', models.UUIDField(blank=True, null=True, verbose_name='Previous operation')),
+                ('operation_type', models.CharField(choices=[('add', 'Add'), ('remove', 'Remove'), ('adjust', 'Adjust'), ('trans_in', 'Transfer in'), ('trans_out', 'Transfer out'), ('inventory', 'Inventory'), ('service', 'Service withdrawal'), ('buy', 'Buy'), ('sell', 'Sell')], max_length=10, verbose_name='Operation type')),
+                ('quantity', models.FloatField(verbose_name='Quantity')),
+                ('timestamp', models.DateTimeField(verbose_name='Timestamp')),
+                ('relative_quantity', models.BooleanField(default=True, verbose_name='Relative quantity')),
+                ('unit_price', models.FloatField(blank=True, null=True, verbose_name='Unit price')),
+                ('description', models.TextField(blank=True, null=True, verbose_name='Description')),
+                ('balance_after', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='Balance after')),
+                ('value_after', models.DecimalField(blank=True, decimal_places=2, max_digits=15, null=True, verbose_name='Value after')),
+                ('opening_balance', models.BooleanField(default=False, verbose_name='Opening balance')),
+                ('author', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_stock_operations', to=settings.AUTH_USER_MODEL, verbose_name='Author')),
+                ('packet', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_operations', to='nextintranet_warehouse.packet', verbose_name='Packet')),
+            ],
+            options={
+                'verbose_name': 'Archived stock operation',
+                'verbose_name_plural': 'Archived stock operations',
+                'ordering': ['-timestamp'],
+                'indexes': [models.Index(fields=['packet', 'timestamp'], name='archivedop_packet_ts_idx')],
+            },
+        ),
+    ]
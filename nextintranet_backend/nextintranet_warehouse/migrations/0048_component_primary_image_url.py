@@ -0,0 +1,54 @@
+from urllib.parse import urlparse
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def public_url(url):
+    # Zmrazená kopie storage_backends.public_url z doby migrace
+    if not url:
+        return None
+    public_endpoint = getattr(settings, 'S3_PUBLIC_ENDPOINT_URL', None) or getattr(settings, 'AWS_S3_PUBLIC_ENDPOINT_URL', None)
+    internal_endpoint = getattr(settings, 'S3_ENDPOINT_URL', None) or getattr(settings, 'AWS_S3_ENDPOINT_URL', None)
+    bucket = getattr(settings, 'S3_STORAGE_BUCKET_NAME', None) or getattr(settings, 'AWS_STORAGE_BUCKET_NAME', None)
+
+    if public_endpoint and internal_endpoint and url.startswith(internal_endpoint):
+        return public_endpoint.rstrip('/') + url[len(internal_endpoint):]
+    path = urlparse(url).path or ''
+    if public_endpoint and bucket and path.startswith('/documents/'):
+        return f"{public_endpoint.rstrip('/')}/{bucket}{path}"
+    return url
+
+
+def fill_primary_image_urls(apps, schema_editor):
+    Component = apps.get_model('nextintranet_warehouse', 'Component')
+    Document = apps.get_model('nextintranet_warehouse', 'Document')
+
+    # Zmrazená kopie Component.resolve_primary_image_url: první veřejný primární dokument podle id,
+    # jinak obrázek z importu. Sestupné pořadí nechá v mapě ten s nejnižším id.
+    primary = {}
+    for document in Document.objects.filter(is_primary=True).exclude(access_level='signed').order_by('-id'):
+        primary[document.component_id] = str(document.file.url if document.file else document.url)
+
+    components = []
+    queryset = Component.objects.filter(models.Q(id__in=list(primary)) | models.Q(primary_image__isnull=False))
+    for component in queryset.only('id', 'primary_image').iterator(chunk_size=1000):
+        component.primary_image_url = public_url(primary.get(component.id) or component.primary_image)
+        components.append(component)
+    Component.objects.bulk_update(components, ['primary_image_url'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nextintranet_warehouse', '0047_stock_history_archive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='component',
+            name='primary_image_url',
+            field=models.CharField(blank=True, editable=False, help_text='Resolved public URL of the primary image.', max_length=1024, null=True, verbose_name='Primary image URL'),
+        ),
+        migrations.RunPython(fill_primary_image_urls, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,98 @@
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import UnaccentExtension
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations, models
+from django.db.models.functions import Cast
+
+
+class Unaccent(models.Func):
+    function = 'unaccent'
+    output_field = models.TextField()
+
+
+def weighted(*parts):
+    vector = None
+    for expression, weight in parts:
+        if isinstance(expression, str):
+            expression = models.F(expression)
+        part = SearchVector(Unaccent(expression), weight=weight, config='simple')
+        vector = part if vector is None else vector + part
+    return vector
+
+
+def fill_search_vectors(apps, schema_editor):
+    # Zmrazená kopie search_document() modelů, pozdější změny modelů migraci neovlivní
+    Component = apps.get_model('nextintranet_warehouse', 'Component')
+    Packet = apps.get_model('nextintranet_warehouse', 'Packet')
+    Purchase = apps.get_model('nextintranet_warehouse', 'Purchase')
+    Supplier = apps.get_model('nextintranet_warehouse', 'Supplier')
+    SupplierRelation = apps.get_model('nextintranet_warehouse', 'SupplierRelation')
+    Warehouse = apps.get_model('nextintranet_warehouse', 'Warehouse')
+
+    relations = SupplierRelation.objects.filter(component=models.OuterRef('pk')).order_by().values('component')
+    Component.objects.update(search_vector=weighted(
+        ('name', 'A'),
+        (models.Subquery(relations.annotate(text=models.StringAgg('symbol', models.Value(' '))).values('text')), 'A'),
+        (models.Subquery(relations.annotate(text=models.StringAgg('supplier__name', models.Value(' '))).values('text')), 'B'),
+        ('description', 'C'),
+    ))
+    Packet.objects.update(search_vector=weighted(
+        (models.Subquery(Component.objects.filter(pk=models.OuterRef('component_id')).values('name')), 'A'),
+        (models.Subquery(Warehouse.objects.filter(pk=models.OuterRef('location_id')).values('name')), 'B'),
+        ('description', 'C'),
+    ))
+    Purchase.objects.update(search_vector=weighted(
+        (Cast('id', models.TextField()), 'A'),
+        (models.Subquery(Supplier.objects.filter(pk=models.OuterRef('supplier_id')).values('name')), 'A'),
+        ('note', 'C'),
+    ))
+    Warehouse.objects.update(search_vector=weighted(('name', 'A'), ('location', 'B'), ('description', 'C')))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nextintranet_warehouse', '0048_component_primary_image_url'),
+    ]
+
+    operations = [
+        UnaccentExtension(),
+        migrations.AddField(
+            model_name='component',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='packet',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='purchase',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='warehouse',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(fill_search_vectors, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='component',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='component_search_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='packet',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='packet_search_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='purchase',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='purchase_search_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='warehouse',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='warehouse_search_idx'),
+        ),
+    ]
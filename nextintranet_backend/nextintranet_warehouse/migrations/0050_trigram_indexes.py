@@ -0,0 +1,30 @@
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nextintranet_warehouse', '0049_search_vector'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddIndex(
+            model_name='component',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['name'], name='component_name_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='supplier',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['name'], name='supplier_name_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='supplierrelation',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['symbol'], name='supplier_symbol_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='warehouse',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['name'], name='warehouse_name_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+    ]
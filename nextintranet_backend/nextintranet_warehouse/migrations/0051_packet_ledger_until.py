@@ -0,0 +1,31 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nextintranet_warehouse', '0050_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='packet',
+            name='ledger_until',
+            field=models.DateTimeField(blank=True, editable=False, help_text='Timestamp of the newest operation applied to the FIFO ledger.', null=True, verbose_name='Ledger until'),
+        ),
+        # Nejnovější operace s vypočteným zůstatkem je poslední započtená v ledgeru
+        migrations.RunSQL(
+            """
+            UPDATE nextintranet_warehouse_packet AS packet
+            SET ledger_until = applied.until
+            FROM (
+                SELECT packet_id, max("timestamp") AS until
+                FROM nextintranet_warehouse_stockoperation
+                WHERE balance_after IS NOT NULL
+                GROUP BY packet_id
+            ) AS applied
+            WHERE applied.packet_id = packet.id AND packet.ledger_ready
+            """,
+            migrations.RunSQL.noop,
+        ),
+    ]
@@ -2,3 +2,4 @@ from .warehouse import *
 from .stocktaking import *
 from .component import *
 from .purchase import *
+from .inventory import *
@@ -1,24 +1,92 @@
-from django.db import models
+from django.db import connection, models, transaction
+from django.conf import settings
+from django.utils import timezone
 from django.core import validators
 from django.utils.translation import gettext_lazy as _
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
 from mptt.models import MPTTModel, TreeForeignKey
 from django.contrib.postgres.fields import JSONField
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db.models import UUIDField
+from django.db.models.functions import Cast, Coalesce
 from colorfield.fields import ColorField
 import uuid
+import datetime
+from collections import deque
 
 from nextintranet_backend.models import NIModel
 from nextintranet_backend.models.user import User
+from nextintranet_backend.search import weighted
 from django.urls import reverse
 
+def _component_total(queryset, expression):
+    # Součet přes komponentu jako korelovaný poddotaz, takže se řádky nenásobí joinem
+    return Coalesce(
+        models.Subquery(
+            queryset.order_by().values('component').annotate(total=models.Sum(expression)).values('total')[:1],
+            output_field=models.FloatField(),
+        ),
+        models.Value(0.0),
+    )
+
+
+class ComponentQuerySet(models.QuerySet):
+    def refresh_stock_totals(self):
+        """
+        Recompute the denormalised stock aggregates of the selected components
+        in a single UPDATE.
+        """
+        from .purchase import PurchaseRequest
+
+        packets = Packet.objects.filter(component=models.OuterRef('pk'))
+        return self.update(
+            stock_total=_component_total(packets, Cast('count', models.FloatField()) + models.F('pending_quantity')),
+            stock_value=_component_total(packets, Cast('totalValue', models.FloatField())),
+            reserved_total=_component_total(Reservation.objects.filter(component=models.OuterRef('pk')), 'quantity'),
+            on_order_total=_component_total(PurchaseRequest.objects.filter(component=models.OuterRef('pk'), purchase__isnull=True), 'quantity'),
+        )
+
+    def inventory_summary(self, locations=None):
+        """
+        One row per selected component with total_quantity, reserved_quantity
+        and purchase_quantity, computed in a single SELECT.
+
+        Without `locations` the stored aggregates are returned. With a
+        queryset of locations, total_quantity only counts packets stored there.
+        """
+        if locations is None:
+            return self.values('id').annotate(
+                total_quantity=models.F('stock_total'),
+                reserved_quantity=models.F('reserved_total'),
+                purchase_quantity=models.F('on_order_total'),
+            ).order_by('id')
+
+        from .purchase import PurchaseRequest
+
+        packets = Packet.objects.filter(component=models.OuterRef('pk'), location__in=locations)
+        return self.values('id').annotate(
+            total_quantity=_component_total(packets, Cast('count', models.FloatField()) + models.F('pending_quantity')),
+            reserved_quantity=_component_total(Reservation.objects.filter(component=models.OuterRef('pk')), 'quantity'),
+            purchase_quantity=_component_total(PurchaseRequest.objects.filter(component=models.OuterRef('pk'), purchase__isnull=True), 'quantity'),
+        ).order_by('id')
+
+
 class Component(NIModel):
+    objects = ComponentQuerySet.as_manager()
+
     class meta:
         verbose_name = _('Component')
         verbose_name_plural = _('Components')
         ordering = ['name']
 
+    class Meta:
+        indexes = [
+            GinIndex(fields=['search_vector'], name='component_search_idx'),
+            GinIndex(fields=['name'], name='component_name_trgm_idx', opclasses=['gin_trgm_ops']),
+        ]
+
     # Základní informace o součástce
     UNIT_TYPE_CHOICES = (
         ('int', _('Integer')),
@@ -35,6 +103,30 @@ class Component(NIModel):
     internal_price = models.FloatField(blank=True, null=True, help_text=_('Price per unit for internal use.'))
     primary_image = models.CharField(max_length=255, blank=True, null=True, help_text=_('URL of the primary image for the component.'))
     # primary_image = models.ForeignKey('Document', on_delete=models.PROTECT, null=True, blank=True, related_name='primary_for', help_text=_('Primary image for the component.'))
+    # Veřejná URL primárního dokumentu (nebo primary_image), udržovaná signály dokumentů
+    primary_image_url = models.CharField(max_length=1024, blank=True, null=True, editable=False, help_text=_('Resolved public URL of the primary image.'), verbose_name=_('Primary image URL'))
+
+    # Fulltext přes název, popis a dodavatele, udržovaný signály (viz nextintranet_backend.search)
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    # Denormalizované souhrny skladu, udržované signály (viz ComponentQuerySet.refresh_stock_totals)
+    stock_total = models.FloatField(default=0, db_index=True, help_text=_('Quantity in all packets of the component.'), verbose_name=_('Stock total'))
+    reserved_total = models.FloatField(default=0, help_text=_('Quantity reserved by reservations.'), verbose_name=_('Reserved total'))
+    on_order_total = models.FloatField(default=0, help_text=_('Quantity in purchase requests not yet ordered.'), verbose_name=_('On order total'))
+    stock_value = models.FloatField(default=0, db_index=True, help_text=_('Total value of all packets of the component.'), verbose_name=_('Stock value'))
+
+    STOCK_TOTAL_FIELDS = ['stock_total', 'reserved_total', 'on_order_total', 'stock_value']
+    SEARCH_FIELDS = {'name', 'description'}
+
+    @staticmethod
+    def search_document():
+        relations = SupplierRelation.objects.filter(component=models.OuterRef('pk')).order_by().values('component')
+        return weighted(
+            ('name', 'A'),
+            (models.Subquery(relations.annotate(text=models.StringAgg('symbol', models.Value(' '))).values('text')), 'A'),
+            (models.Subquery(relations.annotate(text=models.StringAgg('supplier__name', models.Value(' '))).values('text')), 'B'),
+            ('description', 'C'),
+        )
 
     def __str__(self):
         return self.name
@@ -48,30 +140,48 @@ class Component(NIModel):
 
     @property
     def count(self):
-        # Calculate current quantity of the component across all batches, excluding reservations
-        total_quantity = sum(packet.count for packet in self.packets.all())
-        reserved_quantity = self.reservations.aggregate(total_reserved=models.Sum('quantity'))['total_reserved'] or 0
-        return total_quantity - reserved_quantity
+        # Current quantity of the component across all batches, excluding reservations
+        return self.stock_total - self.reserved_total
 
     def count_warehouse(self, include_reservations=True):
-        # Calculate current quantity of the component across all batches with option to include reservations
-        total_quantity = sum(packet.count for packet in self.packets.all())
+        # Current quantity of the component across all batches with option to include reservations
         if not include_reservations:
-            reserved_quantity = self.reservations.aggregate(total_reserved=models.Sum('quantity'))['total_reserved'] or 0
-            return total_quantity - reserved_quantity
-        return total_quantity
+            return self.stock_total - self.reserved_total
+        return self.stock_total
 
-    def min_purchase_price(self):
-        return StockOperation.objects.filter(packet__component=self, operation_type='purchase').aggregate(models.Min('unit_price'))['unit_price__min']
+    def refresh_stock_totals(self):
+        Component.objects.filter(pk=self.pk).refresh_stock_totals()
+        self.refresh_from_db(fields=self.STOCK_TOTAL_FIELDS)
 
-    def max_purchase_price(self):
-        return StockOperation.objects.filter(packet__component=self, operation_type='purchase').aggregate(models.Max('unit_price'))['unit_price__max']
+    def resolve_primary_image_url(self):
+        from nextintranet_backend.storage_backends import public_url
 
-    def average_purchase_price(self):
-        return StockOperation.objects.filter(packet__component=self, operation_type='purchase').aggregate(models.Avg('unit_price'))['unit_price__avg']
+        # Podepsané URL vyprší, do sloupce patří jen veřejné dokumenty
+        primary_document = self.documents.filter(is_primary=True).exclude(access_level='signed').order_by('id').first()
+        return public_url(primary_document.get_url if primary_document else self.primary_image)
 
-    def last_purchase_price(self):
-        last_purchase = StockOperation.objects.filter(packet__component=self, operation_type='purchase').order_by('-timestamp').first()
+    def refresh_primary_image_url(self):
+        self.primary_image_url = self.resolve_primary_image_url()
+        Component.objects.filter(pk=self.pk).update(primary_image_url=self.primary_image_url)
+
+    def purchase_operations(self, since=None):
+        # Omezení časem (since) dovolí vynechat staré oddíly tabulky operací
+        operations = StockOperation.objects.filter(packet__component=self, operation_type='purchase')
+        if since is not None:
+            operations = operations.filter(timestamp__gte=since)
+        return operations
+
+    def min_purchase_price(self, since=None):
+        return self.purchase_operations(since).aggregate(models.Min('unit_price'))['unit_price__min']
+
+    def max_purchase_price(self, since=None):
+        return self.purchase_operations(since).aggregate(models.Max('unit_price'))['unit_price__max']
+
+    def average_purchase_price(self, since=None):
+        return self.purchase_operations(since).aggregate(models.Avg('unit_price'))['unit_price__avg']
+
+    def last_purchase_price(self, since=None):
+        last_purchase = self.purchase_operations(since).order_by('-timestamp').first()
         return last_purchase.unit_price if last_purchase else None
 
     def track_price_history(self, price_type, new_price):
@@ -158,8 +268,18 @@ class Document(NIModel):
     def __str__(self):
         return self.name
 
+    @property
+    def is_signed(self) -> bool:
+        from nextintranet_backend.storage_backends import signing_available
+
+        return self.access_level == 'signed' and bool(self.file) and signing_available()
+
     @property
     def get_url(self) -> str:
+        if self.is_signed:
+            from nextintranet_backend.storage_backends import signed_url
+
+            return signed_url(self.file.name)
         return str(self.file.url if self.file else self.url)
 
 
@@ -182,6 +302,9 @@ class Supplier(NIModel):
 
     class Meta:
         ordering = ['name']
+        indexes = [
+            GinIndex(fields=['name'], name='supplier_name_trgm_idx', opclasses=['gin_trgm_ops']),
+        ]
 
 
 class SupplierRelation(NIModel):
@@ -193,6 +316,11 @@ class SupplierRelation(NIModel):
 
     api_data = models.JSONField(blank=True, null=True, verbose_name=_('api_data'))
 
+    class Meta:
+        indexes = [
+            GinIndex(fields=['symbol'], name='supplier_symbol_trgm_idx', opclasses=['gin_trgm_ops']),
+        ]
+
     @property
     def url(self):
         if self.custom_url or not self.supplier:
@@ -221,7 +349,87 @@ class Tag(NIModel):
 
 
 
+class PacketQuerySet(models.QuerySet):
+    def as_of(self, timestamp):
+        """
+        Annotate packets with their count and value at the given moment.
+
+        Each packet resolves to its latest applied operation at or before the
+        timestamp, which is a single index seek on (packet, timestamp) per
+        packet. Operations still waiting in the recalculation queue have no
+        running balance yet, so their quantity is added on top.
+        """
+        operations = StockOperation.objects.filter(packet=models.OuterRef('pk'), timestamp__lte=timestamp)
+        last_operation = operations.filter(balance_after__isnull=False).order_by('-timestamp', '-id')
+        queued = operations.filter(balance_after__isnull=True).order_by().values('packet').annotate(total=models.Sum('quantity')).values('total')[:1]
+        return self.annotate(
+            count_as_of=models.ExpressionWrapper(
+                Coalesce(
+                    models.Subquery(last_operation.values('balance_after')[:1]),
+                    models.Value(0, output_field=models.DecimalField(max_digits=10, decimal_places=2)),
+                )
+                + Cast(
+                    Coalesce(models.Subquery(queued, output_field=models.FloatField()), models.Value(0.0)),
+                    models.DecimalField(max_digits=10, decimal_places=2),
+                ),
+                output_field=models.DecimalField(max_digits=10, decimal_places=2),
+            ),
+            value_as_of=Coalesce(
+                models.Subquery(last_operation.values('value_after')[:1]),
+                models.Value(0, output_field=models.DecimalField(max_digits=15, decimal_places=2)),
+            ),
+        )
+
+    def from_snapshots(self, timestamp):
+        """
+        Annotate packets with their count and value at the given moment,
+        starting from the nearest InventorySnapshot and adding only the
+        operations recorded after it.
+        """
+        from .inventory import InventorySnapshot
+
+        snapshot = InventorySnapshot.objects.filter(
+            packet=models.OuterRef('pk'),
+            until__lte=timestamp,
+        ).order_by('-until')
+        queryset = self.annotate(
+            snapshot_date=models.Subquery(snapshot.values('date')[:1]),
+            snapshot_until=models.Subquery(snapshot.values('until')[:1]),
+            snapshot_count=models.Subquery(snapshot.values('count')[:1]),
+            snapshot_value=models.Subquery(snapshot.values('value')[:1]),
+        )
+
+        # Bez snapshotu se počítá od úplného začátku
+        since = Coalesce(
+            models.OuterRef('snapshot_until'),
+            models.Value(datetime.datetime.min.replace(tzinfo=datetime.timezone.utc), output_field=models.DateTimeField()),
+        )
+        delta = StockOperation.objects.filter(
+            packet=models.OuterRef('pk'),
+            timestamp__gt=since,
+            timestamp__lte=timestamp,
+        )
+        delta_count = delta.order_by().values('packet').annotate(total=models.Sum('quantity')).values('total')[:1]
+        # Operace ve frontě přepočtu ještě nemají value_after
+        delta_value = delta.filter(value_after__isnull=False).order_by('-timestamp', '-id').values('value_after')[:1]
+
+        return queryset.annotate(
+            count_at=models.ExpressionWrapper(
+                Cast(Coalesce(models.F('snapshot_count'), models.Value(0)), models.FloatField())
+                + Coalesce(models.Subquery(delta_count, output_field=models.FloatField()), models.Value(0.0)),
+                output_field=models.FloatField(),
+            ),
+            value_at=Coalesce(
+                models.Subquery(delta_value),
+                models.F('snapshot_value'),
+                models.Value(0, output_field=models.DecimalField(max_digits=15, decimal_places=2)),
+            ),
+        )
+
+
 class Packet(NIModel):
+    objects = PacketQuerySet.as_manager()
+
     component = models.ForeignKey(Component, on_delete=models.CASCADE, related_name='packets', verbose_name=_('Component'))
     location = models.ForeignKey(
         'Warehouse',
@@ -242,6 +450,45 @@ class Packet(NIModel):
     totalValue = models.DecimalField(max_digits=15, decimal_places=2, default=0, verbose_name=_('Total Value'))
     itemValue = models.DecimalField(max_digits=15, decimal_places=4, default=0, verbose_name=_('Item Value'))
 
+    # Stav FIFO evidence (viz PacketLayer)
+    ledger_ready = models.BooleanField(default=False, help_text=_('Indicates if the FIFO layers of the packet are built and can be updated incrementally.'), verbose_name=_('Ledger ready'))
+    inflow_quantity = models.FloatField(default=0, help_text=_('Total quantity of all priced inflow operations.'), verbose_name=_('Inflow quantity'))
+    inflow_value = models.FloatField(default=0, help_text=_('Total value of all priced inflow operations.'), verbose_name=_('Inflow value'))
+    unmatched_outflow = models.FloatField(default=0, help_text=_('Outflow quantity not yet matched against any priced inflow.'), verbose_name=_('Unmatched outflow'))
+    pending_quantity = models.FloatField(default=0, help_text=_('Quantity of operations waiting in the recalculation queue.'), verbose_name=_('Pending quantity'))
+    # Čas poslední operace započtené v ledgeru; spodní mez pro hledání operací ve frontě
+    ledger_until = models.DateTimeField(blank=True, null=True, editable=False, help_text=_('Timestamp of the newest operation applied to the FIFO ledger.'), verbose_name=_('Ledger until'))
+    # Oceněné příjmy z archivované historie, které už nemají vlastní operaci (vstupují do průměrné ceny)
+    archived_inflow_quantity = models.FloatField(default=0, help_text=_('Priced inflow quantity of archived operations not represented by opening balances.'), verbose_name=_('Archived inflow quantity'))
+    archived_inflow_value = models.FloatField(default=0, help_text=_('Priced inflow value of archived operations not represented by opening balances.'), verbose_name=_('Archived inflow value'))
+
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    LEDGER_FIELDS = ['count', 'totalValue', 'itemValue', 'ledger_ready', 'ledger_until', 'inflow_quantity', 'inflow_value', 'unmatched_outflow']
+    # Rezerva pro operace uložené s časem mírně starším než ledger_until (rozdíl hodin mezi servery)
+    QUEUE_CLOCK_MARGIN = datetime.timedelta(minutes=5)
+    SEARCH_FIELDS = {'component', 'location', 'description'}
+
+    class Meta:
+        indexes = [
+            GinIndex(fields=['search_vector'], name='packet_search_idx'),
+        ]
+
+    @staticmethod
+    def search_document():
+        from .warehouse import Warehouse
+
+        return weighted(
+            (models.Subquery(Component.objects.filter(pk=models.OuterRef('component_id')).values('name')), 'A'),
+            (models.Subquery(Warehouse.objects.filter(pk=models.OuterRef('location_id')).values('name')), 'B'),
+            ('description', 'C'),
+        )
+
+    @property
+    def current_count(self):
+        # Přesný stav včetně operací, které ještě čekají ve frontě na přepočet
+        return float(self.count) + self.pending_quantity
+
     def is_stocktaked(self, stocktaking):
         return self.operations.filter(reference=stocktaking).exists()
 
@@ -254,76 +501,171 @@ class Packet(NIModel):
         super().save(*args, **kwargs)
 
     def calculate(self):
+        # Plný přepočet z historie operací (ponecháno kvůli zpětné kompatibilitě)
+        self.rebuild()
+
+    def rebuild(self, fresh=()):
+        """
+        Rebuild the FIFO ledger of the packet from its whole operation history.
+
+        Produces the same count, totalValue and itemValue as the original
+        full-history replay, stores the surviving inventory layers so that
+        following operations can be applied incrementally and refreshes the
+        running balance of every operation. `fresh` lists operations that were
+        just created and are not counted in pending_quantity.
+
+        The whole history is read, so on a partitioned table this scans every
+        partition of the packet; incremental updates go through
+        apply_operations().
+        """
+        operations = list(StockOperation.objects.filter(packet=self).order_by('timestamp', 'id'))
+        fresh = {operation.id for operation in fresh}
+        queued = [
+            operation for operation in operations
+            if operation.balance_after is None and operation.id not in fresh
+        ] if self.ledger_ready else []
+
+        PacketLayer.objects.filter(packet=self).delete()
+        self.count = 0
+        self.inflow_quantity = self.archived_inflow_quantity
+        self.inflow_value = self.archived_inflow_value
+        self.unmatched_outflow = 0
+        self.ledger_ready = True
+        self.ledger_until = None
+        self.last_operation = None
+        self._replay(operations, deque())
+        self._release_pending(queued)
+
+    def apply_operation(self, operation):
+        self.apply_operations([operation])
+
+    def apply_operations(self, operations):
+        """
+        Apply newly created operations to the FIFO ledger and save the packet once.
+
+        Only the open layers of the packet are touched, so the cost does not
+        grow with the length of the history. Falls back to rebuild() when the
+        ledger has not been built yet or when a priced inflow is back-dated
+        before an existing layer.
+        """
+        if not self.ledger_ready:
+            return self.rebuild(fresh=operations)
+
+        # Přibereme i operace čekající ve frontě, aby se ledger aplikoval ve správném pořadí
+        given = {operation.id for operation in operations}
+        queued = [operation for operation in self.queued_operations() if operation.id not in given]
+        operations = sorted(list(operations) + queued, key=lambda operation: (operation.timestamp, str(operation.id)))
+        if not operations:
+            return
 
-        # Aktualizace počtu položek v packetu (předpokládáme, že výdej má zápornou quantity)
-        self.count = StockOperation.objects.filter(packet=self).aggregate(
-            total_quantity=models.Sum('quantity')
-        )['total_quantity'] or 0
-
+        inflows = [operation for operation in operations if operation.is_priced_inflow]
+        if inflows:
+            newest_layer = self.layers.order_by('-timestamp').first()
+            if newest_layer and inflows[0].timestamp < newest_layer.timestamp:
+                return self.rebuild(fresh=[operation for operation in operations if operation.id in given])
+
+        open_layers = deque(self.layers.filter(remaining__gt=0).order_by('timestamp', 'id'))
+        self._replay(operations, open_layers)
+        self._release_pending(queued)
+
+    def queued_operations(self):
+        """
+        Operations waiting for the deferred recalculation. They are never
+        older than the ledger, so the search is bounded by ledger_until and on
+        a partitioned table only reads the newest partitions.
+        """
+        queued = self.operations.filter(balance_after__isnull=True)
+        if self.ledger_until is not None:
+            queued = queued.filter(timestamp__gte=self.ledger_until - self.QUEUE_CLOCK_MARGIN)
+        return queued
+
+    def apply_pending(self):
+        """Apply the operations queued by StockOperation.save() in deferred mode."""
+        self.apply_operations([])
+
+    def _release_pending(self, queued):
+        quantity = sum(operation.quantity or 0 for operation in queued)
+        if quantity:
+            Packet.objects.filter(pk=self.pk).update(pending_quantity=models.F('pending_quantity') - quantity)
+            self.refresh_from_db(fields=['pending_quantity'])
+            Component.objects.filter(pk=self.component_id).refresh_stock_totals()
+
+    def _replay(self, operations, open_layers):
+        new_layers = []
+        consumed_layers = {}
+        for operation in operations:
+            quantity = operation.quantity or 0
+
+            if operation.is_priced_inflow:
+                remaining = quantity
+                if quantity > 0 and self.unmatched_outflow > 0:
+                    # Výdej, který předběhl příjem, spotřebuje nejdříve tuto vrstvu
+                    consumed = min(quantity, self.unmatched_outflow)
+                    remaining -= consumed
+                    self.unmatched_outflow -= consumed
+
+                layer = PacketLayer(
+                    packet=self,
+                    operation=operation,
+                    timestamp=operation.timestamp,
+                    quantity=quantity,
+                    remaining=remaining,
+                    unit_price=operation.unit_price,
+                )
+                new_layers.append(layer)
+                if remaining > 0:
+                    open_layers.append(layer)
+                self.inflow_quantity += quantity
+                self.inflow_value += quantity * operation.unit_price
+
+            elif operation.operation_type in StockOperation.OUTFLOW_TYPES:
+                # Výdej odebíráme z nejstarších zásob (FIFO)
+                quantity_to_consume = abs(quantity)
+                while quantity_to_consume > 0 and open_layers:
+                    layer = open_layers[0]
+                    consumed = min(quantity_to_consume, layer.remaining)
+                    layer.remaining -= consumed
+                    quantity_to_consume -= consumed
+                    if not layer._state.adding:
+                        consumed_layers[layer.id] = layer
+                    if layer.remaining <= 0:
+                        open_layers.popleft()
+                self.unmatched_outflow += quantity_to_consume
+
+            self.count = float(self.count) + quantity
+            self._update_valuation(open_layers)
+            operation.balance_after = self.count
+            operation.value_after = self.totalValue
+
+        PacketLayer.objects.bulk_update(list(consumed_layers.values()), ['remaining'])
+        PacketLayer.objects.bulk_create(new_layers)
+        if operations:
+            # Spodní mez na timestamp omezí UPDATE na oddíly s přepočítanými operacemi
+            oldest = min(operation.timestamp for operation in operations)
+            StockOperation.objects.filter(timestamp__gte=oldest).bulk_update(operations, ['balance_after', 'value_after'], batch_size=500)
+            self.last_operation = operations[-1]
+            newest = max(operation.timestamp for operation in operations)
+            self.ledger_until = max(self.ledger_until, newest) if self.ledger_until else newest
+        self.save(update_fields=self.LEDGER_FIELDS + ['last_operation'])
+
+    def _update_valuation(self, open_layers):
         if self.count <= 0:
             self.totalValue = 0
             self.itemValue = 0
-            self.save()
             return
 
-        # Získání všech nákupů/příjmů s kladnou cenou, seřazených chronologicky
-        inflow_operations = StockOperation.objects.filter(
-            packet=self,
-            operation_type__in=['add', 'trans_in', 'buy'],
-            unit_price__gt=0
-        ).order_by('timestamp')
-
-        # Získání všech výdejů/prodejů, seřazených chronologicky
-        outflow_operations = StockOperation.objects.filter(
-            packet=self,
-            operation_type__in=['remove', 'trans_out', 'service', 'sell'],
-        ).order_by('timestamp')
-
-        # Vytvoříme seznam zásob (množství, cena) z nákupů - nyní jako seznamy
-        inventory_layers = [[op.quantity, op.unit_price] for op in inflow_operations]
-
-        # Projdeme výdeje a odebereme je z nejstarších zásob (FIFO)
-        for outflow in outflow_operations:
-            quantity_to_consume = abs(outflow.quantity)  # Předpokládáme zápornou quantity pro výdej
-
-            for layer in inventory_layers:
-                remaining, price = layer
-                if quantity_to_consume <= 0:
-                    break
-
-                if remaining > 0:
-                    consumed_from_this_layer = min(quantity_to_consume, remaining)
-                    layer[0] -= consumed_from_this_layer
-                    quantity_to_consume -= consumed_from_this_layer
-
-        # Spočítáme celkovou hodnotu zbývajících zásob a jejich počet (dle FIFO)
-        total_value_fifo = 0
-        remaining_count_fifo = 0
-        for remaining, price in inventory_layers:
-            if remaining > 0:
-                total_value_fifo += remaining * price
-                remaining_count_fifo += remaining
+        remaining_count_fifo = sum(layer.remaining for layer in open_layers)
+        total_value_fifo = sum(layer.remaining * layer.unit_price for layer in open_layers)
 
         # Pokud se počet položek v packetu liší od počtu oceněných FIFO, dopočítáme průměrnou cenou
-        if self.count > remaining_count_fifo:
-            unaccounted_count = self.count - remaining_count_fifo
-
-            # Spočítáme průměrnou nákupní cenu (pouze z oceněných nákupů)
-            total_inflow_value = sum(op.quantity * op.unit_price for op in inflow_operations)
-            total_inflow_quantity = sum(op.quantity for op in inflow_operations)
-
-            if total_inflow_quantity > 0:
-                average_purchase_price = total_inflow_value / total_inflow_quantity
-                total_value = total_value_fifo + (unaccounted_count * average_purchase_price)
-                remaining_count = self.count
-            else:
-                total_value = total_value_fifo
-                remaining_count = remaining_count_fifo
+        if self.count > remaining_count_fifo and self.inflow_quantity > 0:
+            average_purchase_price = self.inflow_value / self.inflow_quantity
+            total_value = total_value_fifo + (self.count - remaining_count_fifo) * average_purchase_price
+            remaining_count = self.count
         else:
             total_value = total_value_fifo
             remaining_count = remaining_count_fifo
 
-        # Aktualizujeme hodnoty packetu
         if remaining_count > 0:
             self.totalValue = round(total_value, 2)
             self.itemValue = round(total_value / remaining_count, 4)
@@ -331,17 +673,38 @@ class Packet(NIModel):
             self.totalValue = 0
             self.itemValue = 0
 
-        # Uložení packetu
-        self.save()
-
 
     def get_absolute_url(self):
         return self.component.get_absolute_url()+"?packet="+str(self.pk)
 
 
 
+class PacketLayer(NIModel):
+    # FIFO vrstva zásob packetu vzniklá z oceněného příjmu
+    class Meta:
+        verbose_name = _('Packet layer')
+        verbose_name_plural = _('Packet layers')
+        ordering = ['timestamp', 'id']
+        indexes = [
+            models.Index(fields=['packet', 'timestamp'], name='packetlayer_packet_ts_idx'),
+        ]
+
+    packet = models.ForeignKey(Packet, on_delete=models.CASCADE, related_name='layers', verbose_name=_('Packet'))
+    operation = models.ForeignKey('StockOperation', on_delete=models.CASCADE, related_name='layers', verbose_name=_('Operation'))
+    timestamp = models.DateTimeField(verbose_name=_('Timestamp'))
+    quantity = models.FloatField(verbose_name=_('Quantity'))
+    remaining = models.FloatField(verbose_name=_('Remaining quantity'))
+    unit_price = models.FloatField(verbose_name=_('Unit price'))
+
+    def __str__(self):
+        return f"{self.packet_id} - {self.remaining}/{self.quantity} @ {self.unit_price}"
+
+
 class StockOperation(NIModel):
     # Operace se skladovými zásobami
+    INFLOW_TYPES = ('add', 'trans_in', 'buy')
+    OUTFLOW_TYPES = ('remove', 'trans_out', 'service', 'sell')
+
     OPERATION_TYPE = (
         ('add', _('Add')),
         ('remove', _('Remove')),
@@ -358,6 +721,9 @@ class StockOperation(NIModel):
         verbose_name = _('Stock operation')
         verbose_name_plural = _('Stock operations')
         ordering = ['-timestamp']
+        indexes = [
+            models.Index(fields=['packet', 'timestamp'], name='stockop_packet_ts_idx'),
+        ]
 
     packet = models.ForeignKey(Packet, on_delete=models.PROTECT, related_name='operations', verbose_name=_('Packet'))
     reference = UUIDField(default=uuid.uuid4, unique=False, editable=True, verbose_name=_('Reference'), help_text=_('Reference to the stocktaking or other operation.'), blank=True, null=True)
@@ -370,10 +736,19 @@ class StockOperation(NIModel):
     description = models.TextField(blank=True, null=True, verbose_name=_('Description'))
     author = models.ForeignKey(User, on_delete=models.SET_NULL, blank=True, null=True, related_name='stock_operations', verbose_name=_('Author'))
 
+    # Stav packetu po provedení operace (udržováno při zápisu)
+    balance_after = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True, help_text=_('Packet count right after this operation.'), verbose_name=_('Balance after'))
+    value_after = models.DecimalField(max_digits=15, decimal_places=2, blank=True, null=True, help_text=_('Packet total value right after this operation.'), verbose_name=_('Value after'))
+    opening_balance = models.BooleanField(default=False, help_text=_('Synthetic operation replacing archived history (see compact_stock_history).'), verbose_name=_('Opening balance'))
+
     @property
     def next_operation(self):
         return self.next_operation
 
+    @property
+    def is_priced_inflow(self):
+        return self.operation_type in self.INFLOW_TYPES and (self.unit_price or 0) > 0
+
     @property
     def operation_price(self):
         return self.quantity * self.unit_price
@@ -382,26 +757,98 @@ class StockOperation(NIModel):
         return f"{self.operation_type} - {self.packet.component.name} - {self.quantity} units"
 
     @classmethod
-    def min_purchase_price(cls):
-        return cls.objects.filter(operation_type='purchase').aggregate(models.Min('unit_price'))['unit_price__min']
+    def purchases(cls, since=None):
+        operations = cls.objects.filter(operation_type='purchase')
+        if since is not None:
+            operations = operations.filter(timestamp__gte=since)
+        return operations
 
     @classmethod
-    def max_purchase_price(cls):
-        return cls.objects.filter(operation_type='purchase').aggregate(models.Max('unit_price'))['unit_price__max']
+    def min_purchase_price(cls, since=None):
+        return cls.purchases(since).aggregate(models.Min('unit_price'))['unit_price__min']
 
     @classmethod
-    def average_purchase_price(cls):
-        return cls.objects.filter(operation_type='purchase').aggregate(models.Avg('unit_price'))['unit_price__avg']
+    def max_purchase_price(cls, since=None):
+        return cls.purchases(since).aggregate(models.Max('unit_price'))['unit_price__max']
+
+    @classmethod
+    def average_purchase_price(cls, since=None):
+        return cls.purchases(since).aggregate(models.Avg('unit_price'))['unit_price__avg']
 
     # @classmethod
     # def last_purchase_price(cls):
     #     last_purchase = cls.objects.filter(operation_type='purchase').order_by('-timestamp').first()
     #     return last_purchase.unit_price if last_purchase else None
     def save(self, *args, **kwargs):
-        super().save(*args, **kwargs)
+        created = self._state.adding
+        if not self.packet_id:
+            return super().save(*args, **kwargs)
+
+        with transaction.atomic():
+            # Zápisy do jednoho packetu se serializují přes zámek řádku, různé packety běží paralelně
+            packet = Packet.objects.select_for_update().get(pk=self.packet_id)
+            self.packet = packet
+            super().save(*args, **kwargs)
+
+            if created and packet.ledger_ready and settings.WAREHOUSE_DEFERRED_RECALCULATION:
+                # Přepočet FIFO proběhne ve workeru (process_packet_queue), počet zůstává přesný
+                Packet.objects.filter(pk=packet.pk).update(pending_quantity=models.F('pending_quantity') + (self.quantity or 0))
+                Component.objects.filter(pk=packet.component_id).refresh_stock_totals()
+                PacketRecalculation.mark(packet.pk)
+            elif created:
+                packet.apply_operation(self)
+            else:
+                packet.rebuild()
 
-        if self.packet:
-            self.packet.calculate()
+
+class PacketRecalculation(NIModel):
+    """
+    Queue of packets with operations waiting for the FIFO recalculation.
+
+    A burst of operations on one packet coalesces into a single row, which
+    the process_packet_queue worker picks up and applies at once.
+    """
+    packet = models.OneToOneField(Packet, on_delete=models.CASCADE, related_name='recalculation', verbose_name=_('Packet'))
+    queued_at = models.DateTimeField(verbose_name=_('Queued at'))
+    last_marked_at = models.DateTimeField(verbose_name=_('Last marked at'))
+    pending_operations = models.PositiveIntegerField(default=1, verbose_name=_('Pending operations'))
+
+    class Meta:
+        verbose_name = _('Packet recalculation')
+        verbose_name_plural = _('Packet recalculations')
+        ordering = ['queued_at']
+
+    @classmethod
+    def mark(cls, packet_id):
+        # INSERT ... ON CONFLICT zachová původní queued_at, jen navýší počítadlo
+        table = cls._meta.db_table
+        now = timezone.now()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {table} (id, created_at, packet_id, queued_at, last_marked_at, pending_operations)
+                VALUES (%s, %s, %s, %s, %s, 1)
+                ON CONFLICT (packet_id) DO UPDATE
+                SET last_marked_at = EXCLUDED.last_marked_at,
+                    pending_operations = {table}.pending_operations + 1
+                """,
+                [str(uuid.uuid4()), now, str(packet_id), now, now],
+            )
+
+    @classmethod
+    def lag(cls):
+        stats = cls.objects.aggregate(
+            packets=models.Count('id'),
+            operations=models.Sum('pending_operations'),
+            oldest=models.Min('queued_at'),
+        )
+        oldest = stats['oldest']
+        return {
+            'pending_packets': stats['packets'],
+            'pending_operations': stats['operations'] or 0,
+            'oldest_queued_at': oldest,
+            'lag_seconds': (timezone.now() - oldest).total_seconds() if oldest else 0,
+        }
 
 class Reservation(NIModel):
     # Rezervace součástek
@@ -0,0 +1,69 @@
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+
+from nextintranet_backend.models import NIModel
+from nextintranet_backend.models.user import User
+from .component import Packet, StockOperation
+
+
+class InventorySnapshot(NIModel):
+    # Stav packetu ke konci dne/měsíce pro historické reporty
+    PERIOD_CHOICES = (
+        ('day', _('Day')),
+        ('month', _('Month')),
+    )
+
+    packet = models.ForeignKey(Packet, on_delete=models.CASCADE, related_name='snapshots', verbose_name=_('Packet'))
+    date = models.DateField(verbose_name=_('Date'))
+    period = models.CharField(max_length=10, choices=PERIOD_CHOICES, default='day', verbose_name=_('Period'))
+    until = models.DateTimeField(help_text=_('Moment the snapshot describes (end of the date).'), verbose_name=_('Until'))
+    count = models.DecimalField(max_digits=10, decimal_places=2, default=0, verbose_name=_('Count'))
+    value = models.DecimalField(max_digits=15, decimal_places=2, default=0, verbose_name=_('Value'))
+
+    class Meta:
+        verbose_name = _('Inventory snapshot')
+        verbose_name_plural = _('Inventory snapshots')
+        ordering = ['-date']
+        constraints = [
+            models.UniqueConstraint(fields=['packet', 'date'], name='inventorysnapshot_packet_date_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.packet_id} @ {self.date}: {self.count}"
+
+
+class ArchivedStockOperation(models.Model):
+    # Operace přesunuté z hlavní tabulky příkazem compact_stock_history (zachovává původní id i časy)
+    id = models.UUIDField(primary_key=True, editable=False)
+    created_at = models.DateTimeField(verbose_name=_('Created at'))
+    archived_at = models.DateTimeField(auto_now_add=True, verbose_name=_('Archived at'))
+    packet = models.ForeignKey(Packet, on_delete=models.CASCADE, related_name='archived_operations', verbose_name=_('Packet'))
+    reference = models.UUIDField(blank=True, null=True, verbose_name=_('Reference'))
+    previous_operation_id = models.UUIDField(blank=True, null=True, verbose_name=_('Previous operation'))
+    operation_type = models.CharField(max_length=10, choices=StockOperation.OPERATION_TYPE, verbose_name=_('Operation type'))
+    quantity = models.FloatField(verbose_name=_('Quantity'))
+    timestamp = models.DateTimeField(verbose_name=_('Timestamp'))
+    relative_quantity = models.BooleanField(default=True, verbose_name=_('Relative quantity'))
+    unit_price = models.FloatField(blank=True, null=True, verbose_name=_('Unit price'))
+    description = models.TextField(blank=True, null=True, verbose_name=_('Description'))
+    author = models.ForeignKey(User, on_delete=models.SET_NULL, blank=True, null=True, related_name='archived_stock_operations', verbose_name=_('Author'))
+    balance_after = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True, verbose_name=_('Balance after'))
+    value_after = models.DecimalField(max_digits=15, decimal_places=2, blank=True, null=True, verbose_name=_('Value after'))
+    opening_balance = models.BooleanField(default=False, verbose_name=_('Opening balance'))
+
+    COPIED_FIELDS = [
+        'id', 'created_at', 'packet_id', 'reference', 'previous_operation_id', 'operation_type', 'quantity',
+        'timestamp', 'relative_quantity', 'unit_price', 'description', 'author_id', 'balance_after',
+        'value_after', 'opening_balance',
+    ]
+
+    class Meta:
+        verbose_name = _('Archived stock operation')
+        verbose_name_plural = _('Archived stock operations')
+        ordering = ['-timestamp']
+        indexes = [
+            models.Index(fields=['packet', 'timestamp'], name='archivedop_packet_ts_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.operation_type} - {self.quantity} units (archived)"
@@ -16,8 +16,13 @@ from nextintranet_backend.models import NIModel
 
 from django.db import models
 from django.conf import settings
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
+from django.db.models.functions import Cast
 from django.utils.translation import gettext_lazy as _
 
+from nextintranet_backend.search import weighted
+
 class PurchaseStatus(models.TextChoices):
     DRAFT = 'draft', _('Draft')
     SUBMITTED = 'submitted', _('Submitted')
@@ -81,11 +86,26 @@ class Purchase(NIModel):
     )
 
     note = models.TextField(blank=True, verbose_name=_("Note"))
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    SEARCH_FIELDS = {'supplier', 'note'}
 
     class Meta:
         verbose_name = _("Purchase")
         verbose_name_plural = _("Purchases")
         ordering = ['-created_at']
+        indexes = [
+            GinIndex(fields=['search_vector'], name='purchase_search_idx'),
+        ]
+
+    @staticmethod
+    def search_document():
+        # Id je v dokumentu kvůli hledání podle čísla objednávky ("Order 3f2a1b2c")
+        return weighted(
+            (Cast('id', models.TextField()), 'A'),
+            (models.Subquery(Supplier.objects.filter(pk=models.OuterRef('supplier_id')).values('name')), 'A'),
+            ('note', 'C'),
+        )
 
     def __str__(self):
         return f"Purchase #{self.id} - {self.supplier} ({self.get_status_display()})"
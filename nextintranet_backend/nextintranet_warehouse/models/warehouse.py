@@ -2,11 +2,14 @@ from django.db import models
 from django.utils.translation import gettext_lazy as _
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from mptt.models import MPTTModel, TreeForeignKey
 from colorfield.fields import ColorField
 import uuid
 
 from nextintranet_backend.models import NIModel
+from nextintranet_backend.search import weighted
 
 class Warehouse(MPTTModel, NIModel):
     # Sklad nebo místo, kde se součástky uchovávají
@@ -16,10 +19,23 @@ class Warehouse(MPTTModel, NIModel):
     parent = TreeForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, related_name='sub_units', verbose_name=_('Parent unit'))  # Hierarchický vztah
     can_store_items = models.BooleanField(default=False, help_text=_('Indicates if this location can store components.'), verbose_name=_('Can store items'))
     description = models.TextField(blank=True, null=True, verbose_name=_('Description'))  # Popis skladu nebo umístění
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    SEARCH_FIELDS = {'name', 'location', 'description'}
 
     class MPTTMeta:
         order_insertion_by = ['name']
 
+    class Meta:
+        indexes = [
+            GinIndex(fields=['search_vector'], name='warehouse_search_idx'),
+            GinIndex(fields=['name'], name='warehouse_name_trgm_idx', opclasses=['gin_trgm_ops']),
+        ]
+
+    @staticmethod
+    def search_document():
+        return weighted(('name', 'A'), ('location', 'B'), ('description', 'C'))
+
     
     @property
     def full_path(self):
@@ -0,0 +1,127 @@
+"""
+Optional PostgreSQL range partitioning of the StockOperation table by timestamp.
+
+The table is converted in place by `manage.py create_stock_partitions --convert`
+(see convert_stock_operations) into monthly partitions plus a DEFAULT
+partition. PostgreSQL requires the partition key in every unique constraint,
+so the primary key becomes (id, timestamp) and the database-level foreign
+keys pointing *to* stock operations are dropped.
+Django still enforces on_delete for those relations in Python.
+"""
+import datetime
+
+from django.utils import timezone
+
+TABLE = 'nextintranet_warehouse_stockoperation'
+
+
+def month_start(date):
+    return datetime.date(date.year, date.month, 1)
+
+
+def next_month(date):
+    return datetime.date(date.year + 1, 1, 1) if date.month == 12 else datetime.date(date.year, date.month + 1, 1)
+
+
+def partition_name(start):
+    return f'{TABLE}_p{start:%Y%m}'
+
+
+def is_partitioned(connection):
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT 1 FROM pg_partitioned_table WHERE partrelid = %s::regclass', [TABLE])
+        return cursor.fetchone() is not None
+
+
+def existing_partitions(connection):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT child.relname FROM pg_inherits JOIN pg_class child ON child.oid = pg_inherits.inhrelid '
+            'WHERE pg_inherits.inhparent = %s::regclass',
+            [TABLE],
+        )
+        return {row[0] for row in cursor.fetchall()}
+
+
+def ensure_partitions(connection, start, months_ahead=3):
+    """
+    Create monthly partitions from `start` up to `months_ahead` months after
+    the current month. Rows that already landed in the DEFAULT partition for
+    a new month are moved into it. Returns the names of created partitions.
+    """
+    existing = existing_partitions(connection)
+    last = month_start(timezone.now().date())
+    for _ in range(months_ahead):
+        last = next_month(last)
+
+    created = []
+    current = month_start(start)
+    with connection.cursor() as cursor:
+        while current <= last:
+            name = partition_name(current)
+            if name not in existing:
+                upper = next_month(current)
+                bounds = [current.isoformat(), upper.isoformat()]
+                # Nový oddíl nejde připojit, dokud v DEFAULT leží řádky z jeho rozsahu
+                cursor.execute(f'CREATE TABLE "{name}" (LIKE "{TABLE}" INCLUDING DEFAULTS INCLUDING CONSTRAINTS)')
+                cursor.execute(
+                    f'WITH moved AS (DELETE FROM "{TABLE}_default" WHERE "timestamp" >= %s AND "timestamp" < %s RETURNING *) '
+                    f'INSERT INTO "{name}" SELECT * FROM moved',
+                    bounds,
+                )
+                cursor.execute(
+                    f'ALTER TABLE "{TABLE}" ATTACH PARTITION "{name}" FOR VALUES FROM (%s) TO (%s)',
+                    bounds,
+                )
+                created.append(name)
+            current = next_month(current)
+    return created
+
+
+def convert_stock_operations(connection, months_ahead=3):
+    """Turn the plain StockOperation table into a range-partitioned one. Must run inside a transaction."""
+    with connection.cursor() as cursor:
+        # Odložené kontroly cizích klíčů z této transakce by jinak blokovaly ALTER TABLE
+        cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+        # Cizí klíče mířící na tabulku (včetně previous_operation) partitioned tabulka neumí
+        cursor.execute(
+            'SELECT conrelid::regclass::text, conname FROM pg_constraint WHERE contype = %s AND confrelid = %s::regclass',
+            ['f', TABLE],
+        )
+        for table, name in cursor.fetchall():
+            cursor.execute(f'ALTER TABLE {table} DROP CONSTRAINT "{name}"')
+
+        cursor.execute(
+            'SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint WHERE contype = %s AND conrelid = %s::regclass',
+            ['f', TABLE],
+        )
+        foreign_keys = cursor.fetchall()
+        cursor.execute(
+            'SELECT indexrelid::regclass::text, pg_get_indexdef(indexrelid) FROM pg_index '
+            'WHERE indrelid = %s::regclass AND NOT indisprimary AND NOT indisunique',
+            [TABLE],
+        )
+        indexes = cursor.fetchall()
+        cursor.execute(f'SELECT min("timestamp") FROM "{TABLE}"')
+        first = cursor.fetchone()[0]
+
+        cursor.execute(f'ALTER TABLE "{TABLE}" RENAME TO "{TABLE}_legacy"')
+        cursor.execute(
+            f'CREATE TABLE "{TABLE}" (LIKE "{TABLE}_legacy" INCLUDING DEFAULTS INCLUDING CONSTRAINTS) '
+            f'PARTITION BY RANGE ("timestamp")'
+        )
+        # Jméno původního pkey zůstává obsazené indexem staré tabulky
+        cursor.execute(f'ALTER TABLE "{TABLE}" ADD CONSTRAINT "{TABLE}_id_ts_pk" PRIMARY KEY (id, "timestamp")')
+        cursor.execute(f'CREATE TABLE "{TABLE}_default" PARTITION OF "{TABLE}" DEFAULT')
+
+    # Hranice oddílů jsou v UTC, stejně jako ukládané časy
+    start = first.date() if first else timezone.now().date()
+    ensure_partitions(connection, start, months_ahead)
+
+    with connection.cursor() as cursor:
+        cursor.execute(f'INSERT INTO "{TABLE}" SELECT * FROM "{TABLE}_legacy"')
+        cursor.execute(f'DROP TABLE "{TABLE}_legacy"')
+        for name, definition in indexes:
+            cursor.execute(definition)
+        for name, definition in foreign_keys:
+            cursor.execute(f'ALTER TABLE "{TABLE}" ADD CONSTRAINT "{name}" {definition}')
@@ -4,5 +4,5 @@ from nextintranet_warehouse.models.component import Component
 class ComponentSerializer(serializers.ModelSerializer):
     class Meta:
         model = Component
-        fields = '__all__'
+        exclude = ['search_vector']
         
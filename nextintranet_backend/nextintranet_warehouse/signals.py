@@ -1,11 +1,18 @@
-from typing import Optional
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterable, Optional
 
 from django.db import transaction
-from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
 from django.dispatch import receiver
 
+from nextintranet_backend.conditional import bump_versions, version_key
 from nextintranet_backend.realtime import broadcast_event
-from .models.component import Component, ComponentParameter, Document, SupplierRelation
+from nextintranet_backend.search import refresh_search_vectors
+from .models.category import Category
+from .models.component import Component, ComponentParameter, Document, Packet, Reservation, StockOperation, Supplier, SupplierRelation, Tag
+from .models.purchase import Purchase, PurchaseRequest
+from .models.warehouse import Warehouse
 
 IGNORED_APP_LABELS = {
     'admin',
@@ -15,6 +22,19 @@ IGNORED_APP_LABELS = {
 }
 
 
+_muted = ContextVar('nextintranet_warehouse_events_muted', default=False)
+
+
+@contextmanager
+def muted_model_events():
+    """Suppress per-instance model.changed events, e.g. for bulk writes that emit one summary."""
+    token = _muted.set(True)
+    try:
+        yield
+    finally:
+        _muted.reset(token)
+
+
 def _should_emit(sender) -> bool:
     app_label = sender._meta.app_label
     return app_label not in IGNORED_APP_LABELS
@@ -26,7 +46,7 @@ def _emit_model_change(
     using: Optional[str] = None,
     extra: Optional[dict] = None
 ) -> None:
-    if not _should_emit(instance.__class__):
+    if _muted.get() or not _should_emit(instance.__class__):
         return
 
     payload = {
@@ -41,6 +61,25 @@ def _emit_model_change(
     transaction.on_commit(lambda: broadcast_event('model.changed', payload), using=using)
 
 
+def emit_bulk_model_change(
+    model,
+    pks: Iterable,
+    action: str,
+    using: Optional[str] = None,
+    extra: Optional[dict] = None
+) -> None:
+    payload = {
+        'appLabel': model._meta.app_label,
+        'model': model._meta.model_name,
+        'pks': [str(pk) for pk in pks],
+        'action': action,
+    }
+    if extra:
+        payload.update(extra)
+
+    transaction.on_commit(lambda: broadcast_event('model.changed', payload), using=using)
+
+
 def _emit_component_update(
     component_id,
     change: str,
@@ -100,6 +139,145 @@ def document_deleted(sender, instance: Document, **kwargs):
     _emit_component_update(instance.component_id, 'document.deleted', entity='document', entity_id=instance.id)
 
 
+def _refresh_stock_totals(*component_ids) -> None:
+    component_ids = {component_id for component_id in component_ids if component_id}
+    if component_ids:
+        Component.objects.filter(pk__in=component_ids).refresh_stock_totals()
+
+
+def _refresh_primary_image_url(component_id) -> None:
+    component = Component.objects.filter(pk=component_id).only('id', 'primary_image').first()
+    if component:
+        component.refresh_primary_image_url()
+
+
+@receiver(post_save, sender=Document)
+@receiver(post_delete, sender=Document)
+def document_primary_image(sender, instance: Document, raw: bool = False, **kwargs):
+    # Přepnutí primárního obrázku (document_api) končí uložením dokumentu, takže stačí tady
+    if raw:
+        return
+    _refresh_primary_image_url(instance.component_id)
+
+
+@receiver(post_save, sender=Component)
+def component_primary_image(sender, instance: Component, raw: bool, update_fields=None, **kwargs):
+    if raw or (update_fields is not None and 'primary_image' not in update_fields):
+        return
+    instance.refresh_primary_image_url()
+
+
+def _search_fields_changed(instance, update_fields) -> bool:
+    # Uložení jen souhrnů nebo ledgeru (update_fields) dokument nemění
+    return update_fields is None or bool(instance.SEARCH_FIELDS & set(update_fields))
+
+
+@receiver(post_save, sender=Component)
+@receiver(post_save, sender=Packet)
+@receiver(post_save, sender=Warehouse)
+@receiver(post_save, sender=Purchase)
+def search_document_saved(sender, instance, raw: bool, update_fields=None, **kwargs):
+    if raw or not _search_fields_changed(instance, update_fields):
+        return
+    refresh_search_vectors(sender.objects.filter(pk=instance.pk))
+    # Název součástky a umístění je i v dokumentu paketů
+    if update_fields is None or 'name' in update_fields:
+        if sender is Component:
+            refresh_search_vectors(Packet.objects.filter(component=instance))
+        elif sender is Warehouse:
+            refresh_search_vectors(Packet.objects.filter(location=instance))
+
+
+@receiver(post_save, sender=SupplierRelation)
+@receiver(post_delete, sender=SupplierRelation)
+def supplier_relation_search(sender, instance: SupplierRelation, raw: bool = False, **kwargs):
+    if raw:
+        return
+    refresh_search_vectors(Component.objects.filter(pk=instance.component_id))
+
+
+@receiver(post_save, sender=Supplier)
+def supplier_search(sender, instance: Supplier, raw: bool, update_fields=None, **kwargs):
+    if raw or (update_fields is not None and 'name' not in update_fields):
+        return
+    refresh_search_vectors(Component.objects.filter(suppliers__supplier=instance))
+    refresh_search_vectors(Purchase.objects.filter(supplier=instance))
+
+
+@receiver(pre_save, sender=Packet)
+@receiver(pre_save, sender=Reservation)
+@receiver(pre_save, sender=PurchaseRequest)
+def stock_source_moving(sender, instance, raw: bool, update_fields=None, **kwargs):
+    # Při přesunu na jinou součástku je nutné přepočítat i tu původní
+    if raw or instance._state.adding or (update_fields is not None and 'component' not in update_fields):
+        return
+    instance._previous_component_id = sender.objects.filter(pk=instance.pk).values_list('component_id', flat=True).first()
+
+
+@receiver(post_save, sender=Packet)
+@receiver(post_save, sender=Reservation)
+@receiver(post_save, sender=PurchaseRequest)
+def stock_source_saved(sender, instance, raw: bool, **kwargs):
+    if raw:
+        return
+    _refresh_stock_totals(instance.component_id, getattr(instance, '_previous_component_id', None))
+
+
+@receiver(post_delete, sender=Packet)
+@receiver(post_delete, sender=Reservation)
+@receiver(post_delete, sender=PurchaseRequest)
+def stock_source_deleted(sender, instance, **kwargs):
+    _refresh_stock_totals(instance.component_id)
+
+
+# Modely, jejichž změna mění výstup stromů a vnořených serializerů celé tabulky
+MODEL_WIDE_VERSIONS = (Warehouse, Category, Tag, Supplier)
+COMPONENT_CHILDREN = (ComponentParameter, SupplierRelation, Document, Reservation, PurchaseRequest)
+
+
+def _component_keys(*component_ids):
+    return [version_key(Component, component_id) for component_id in set(component_ids) if component_id]
+
+
+def _version_keys(instance):
+    if isinstance(instance, Component):
+        return [version_key(Component, instance.pk)]
+    if isinstance(instance, Packet):
+        return [version_key(Packet, instance.pk)] + _component_keys(
+            instance.component_id, getattr(instance, '_previous_component_id', None),
+        )
+    if isinstance(instance, StockOperation):
+        if not instance.packet_id:
+            return []
+        packet = instance._state.fields_cache.get('packet')
+        if packet is not None:
+            component_id = packet.component_id
+        else:
+            component_id = Packet.objects.filter(pk=instance.packet_id).values_list('component_id', flat=True).first()
+        return [version_key(Packet, instance.packet_id)] + _component_keys(component_id)
+    if isinstance(instance, COMPONENT_CHILDREN):
+        return _component_keys(instance.component_id, getattr(instance, '_previous_component_id', None))
+    if isinstance(instance, MODEL_WIDE_VERSIONS):
+        return [version_key(instance.__class__)]
+    return []
+
+
+def bump_component_versions(component_ids, packet_ids=()) -> None:
+    """Bump versions after bulk writes that bypass model signals."""
+    bump_versions(
+        *_component_keys(*component_ids),
+        *[version_key(Packet, packet_id) for packet_id in packet_ids],
+    )
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def model_version_bump(sender, instance, using: str, raw: bool = False, **kwargs):
+    if raw:
+        return
+    bump_versions(*_version_keys(instance), using=using)
+
+
 @receiver(post_save)
 def model_saved(sender, instance, created: bool, raw: bool, using: str, **kwargs):
     if raw:
@@ -117,6 +295,10 @@ def model_deleted(sender, instance, using: str, **kwargs):
 def model_m2m_changed(sender, instance, action: str, reverse: bool, model, pk_set, using: str, **kwargs):
     if action not in {'post_add', 'post_remove', 'post_clear'}:
         return
+    if isinstance(instance, Component):
+        bump_versions(version_key(Component, instance.pk), using=using)
+    elif model is Component:
+        bump_versions(*_component_keys(*(pk_set or [])), using=using)
     if not _should_emit(instance.__class__):
         return
 
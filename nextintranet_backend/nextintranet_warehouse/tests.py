@@ -1,3 +1,841 @@
-from django.test import TestCase
+import csv
+import datetime
+import io
+import json
+import os
+import tempfile
+import uuid
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import boto3
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse, reverse_lazy
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from nextintranet_backend.models.user import User
+from nextintranet_backend.storage_backends import SignedS3Boto3Storage, public_endpoints, signed_storage, signed_url
+from nextintranet_backend.views.search import SearchApiView
+from .bulk_import import oid_to_uuid4
+from .models.category import Category
+from .models.component import Component, Document, Packet, PacketLayer, Reservation, StockOperation, Tag
+from .models.inventory import ArchivedStockOperation, InventorySnapshot
+from .models.purchase import PurchaseRequest
+from .models.warehouse import Warehouse
+from .partitioning import is_partitioned, month_start, partition_name
+from .fifo import revalue_chunk
+from .valuation import operation_chunks, rebuild_packets
+
+TEST_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tests-default'},
+    'select2': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tests-select2'},
+}
+try:
+    from moto import mock_aws
+except ImportError:
+    mock_aws = None
+
+TEST_CHANNEL_LAYERS = {'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}}
+
+# Uživatel z JWT se načítá dvakrát: v LoginRequiredMiddleware a v autentizaci DRF
+AUTH_QUERIES = 2
+
+
+@override_settings(CACHES=TEST_CACHES, CHANNEL_LAYERS=TEST_CHANNEL_LAYERS, WAREHOUSE_DEFERRED_RECALCULATION=False)
+class WarehouseTestCase(TestCase):
+    """Shared fixture: one shelf, one component with one empty packet and an API client."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='tester', password='tester')
+        cls.warehouse = Warehouse.objects.create(name='Main')
+        cls.shelf = Warehouse.objects.create(name='Shelf A', parent=cls.warehouse, can_store_items=True)
+        cls.category = Category.objects.create(name='Resistors', abbreviation='res')
+        cls.component = Component.objects.create(name='Resistor 10k', category=cls.category)
+        cls.packet = Packet.objects.create(component=cls.component, location=cls.shelf)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+
+    def operation(self, operation_type, quantity, unit_price=None, packet=None):
+        return StockOperation.objects.create(
+            packet=packet or self.packet,
+            operation_type=operation_type,
+            quantity=quantity,
+            unit_price=unit_price,
+        )
+
+    def backdate(self, timestamp, packet=None):
+        # timestamp je auto_now_add, starší historii lze vytvořit jen přepsáním a přestavbou ledgeru
+        packet = packet or self.packet
+        StockOperation.objects.filter(packet=packet).update(timestamp=timestamp)
+        packet.refresh_from_db()
+        packet.rebuild()
+
+    def streamed(self, response):
+        return b''.join(response.streaming_content).decode()
+
+    def ledger(self, packet):
+        packet.refresh_from_db()
+        layers = list(PacketLayer.objects.filter(packet=packet).order_by('timestamp', 'id').values_list('quantity', 'remaining', 'unit_price'))
+        return float(packet.count), float(packet.totalValue), float(packet.itemValue), layers
+
+
+class FifoLedgerTests(WarehouseTestCase):
+    def test_outflow_consumes_oldest_layer(self):
+        self.operation('add', 10, unit_price=2)
+        self.operation('add', 5, unit_price=4)
+        self.operation('remove', -12)
+
+        count, total_value, item_value, layers = self.ledger(self.packet)
+        self.assertEqual((count, total_value, item_value), (3, 12, 4))
+        self.assertEqual(layers, [(10, 0, 2), (5, 3, 4)])
+
+    def test_incremental_ledger_matches_rebuild(self):
+        self.operation('add', 10, unit_price=2)
+        self.operation('remove', -4)
+        self.operation('add', 6, unit_price=3)
+        self.operation('remove', -8)
+        self.operation('adjust', 1)
+        incremental = self.ledger(self.packet)
+
+        self.packet.refresh_from_db()
+        self.packet.rebuild()
+        self.assertEqual(self.ledger(self.packet), incremental)
+
+
+class BulkOperationTests(WarehouseTestCase):
+    url = '/api/v1/store/packet/operation/bulk/'
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.other_packet = Packet.objects.create(component=cls.component, location=cls.shelf)
+
+    def payload(self, *items):
+        return [
+            {'packet': str(packet.pk), 'operation_type': operation_type, 'quantity': quantity, 'unit_price': unit_price}
+            for packet, operation_type, quantity, unit_price in items
+        ]
+
+    def test_creates_operations_and_returns_packet_states(self):
+        response = self.client.post(self.url, self.payload(
+            (self.packet, 'add', 10, 2),
+            (self.packet, 'remove', -3, None),
+            (self.other_packet, 'add', 5, 1),
+        ), format='json')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['created'], 3)
+        counts = {state['id']: float(state['count']) for state in response.data['packets']}
+        self.assertEqual(counts, {str(self.packet.pk): 7, str(self.other_packet.pk): 5})
+        self.assertEqual(StockOperation.objects.count(), 3)
+
+    def test_invalid_item_rejects_the_whole_batch(self):
+        payload = self.payload((self.packet, 'add', 10, 2))
+        payload.append({'packet': '00000000-0000-0000-0000-000000000000', 'operation_type': 'add', 'quantity': 1})
+
+        response = self.client.post(self.url, payload, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(StockOperation.objects.exists())
+
+    def test_failure_while_applying_rolls_back_every_packet(self):
+        apply_operations = Packet.apply_operations
+        applied = []
+
+        def fail_on_second_packet(packet, operations):
+            applied.append(packet.pk)
+            if len(applied) == 2:
+                raise RuntimeError('ledger failure')
+            return apply_operations(packet, operations)
+
+        with mock.patch.object(Packet, 'apply_operations', fail_on_second_packet), self.assertRaises(RuntimeError):
+            self.client.post(self.url, self.payload(
+                (self.packet, 'add', 10, 2),
+                (self.other_packet, 'add', 5, 1),
+            ), format='json')
+
+        self.assertEqual(len(applied), 2)
+        self.assertFalse(StockOperation.objects.exists())
+        self.assertFalse(PacketLayer.objects.exists())
+        for packet in (self.packet, self.other_packet):
+            packet.refresh_from_db()
+            self.assertEqual(float(packet.count), 0)
+            self.assertFalse(packet.ledger_ready)
+
+
+class RunningBalanceTests(WarehouseTestCase):
+    def test_operations_store_balance_and_value_after(self):
+        operations = [
+            self.operation('add', 10, unit_price=2),
+            self.operation('add', 5, unit_price=4),
+            self.operation('remove', -12),
+        ]
+
+        balances = [
+            (float(operation.balance_after), float(operation.value_after))
+            for operation in StockOperation.objects.filter(pk__in=[operation.pk for operation in operations]).order_by('timestamp', 'id')
+        ]
+        self.assertEqual(balances, [(10, 20), (15, 40), (3, 12)])
+
+        self.packet.refresh_from_db()
+        self.assertEqual(self.packet.last_operation_id, operations[-1].pk)
+
+    def test_stock_as_of_rejects_malformed_ids(self):
+        self.operation('add', 10, unit_price=2)
+        url = '/api/v1/store/packet/stock-as-of/'
+        timestamp = timezone.now().isoformat()
+
+        for name in ('packet', 'component', 'location'):
+            response = self.client.get(url, {'timestamp': timestamp, name: 'not-a-uuid'})
+            self.assertEqual(response.status_code, 400)
+
+        response = self.client.get(url, {'timestamp': timestamp, 'component': str(self.component.pk)})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['total_count'], 10)
+
+
+class InventorySnapshotTests(WarehouseTestCase):
+    def test_history_adds_operations_after_the_snapshot(self):
+        yesterday = timezone.localdate() - datetime.timedelta(days=1)
+        self.operation('add', 10, unit_price=2)
+        self.operation('remove', -4)
+        self.backdate(timezone.make_aware(datetime.datetime.combine(yesterday, datetime.time(12))))
+
+        call_command('take_inventory_snapshots', '--date', yesterday.isoformat(), stdout=io.StringIO())
+        snapshot = InventorySnapshot.objects.get(packet=self.packet, date=yesterday)
+        self.assertEqual((float(snapshot.count), float(snapshot.value)), (6, 12))
+
+        self.operation('add', 5, unit_price=3)
+        response = self.client.get(reverse('api_warehouse_inventory_history'), {'timestamp': timezone.now().isoformat()})
+
+        self.assertEqual(response.status_code, 200)
+        row, = json.loads(self.streamed(response))['packets']
+        self.assertEqual(row['snapshot_date'], yesterday.isoformat())
+        self.assertEqual((row['count'], row['value']), (11, 27))
+
+
+class DeferredRecalculationTests(WarehouseTestCase):
+    @override_settings(WAREHOUSE_DEFERRED_RECALCULATION=True)
+    def test_queued_operations_count_in_historical_stock(self):
+        self.operation('add', 10, unit_price=2)
+        queued = self.operation('add', 5, unit_price=3)
+        queued.refresh_from_db()
+        self.packet.refresh_from_db()
+        self.assertIsNone(queued.balance_after)
+        self.assertEqual(self.packet.pending_quantity, 5)
+        self.assertEqual(self.packet.current_count, 15)
+
+        packet = Packet.objects.as_of(timezone.now()).get(pk=self.packet.pk)
+        self.assertEqual((float(packet.count_as_of), float(packet.value_as_of)), (15, 20))
+
+        today = timezone.localdate()
+        call_command('take_inventory_snapshots', '--date', today.isoformat(), stdout=io.StringIO())
+        snapshot = InventorySnapshot.objects.get(packet=self.packet, date=today)
+        self.assertEqual(float(snapshot.count), 15)
+        packet = Packet.objects.from_snapshots(snapshot.until).get(pk=self.packet.pk)
+        self.assertEqual(packet.count_at, 15)
+
+        self.packet.apply_pending()
+        packet = Packet.objects.as_of(timezone.now()).get(pk=self.packet.pk)
+        self.assertEqual((float(packet.count_as_of), float(packet.value_as_of)), (15, 35))
+        self.assertEqual(Packet.objects.get(pk=self.packet.pk).pending_quantity, 0)
+
+
+class RevalueStockTests(WarehouseTestCase):
+    def test_bulk_valuation_matches_ledger(self):
+        self.operation('add', 10, unit_price=2)
+        self.operation('add', 5, unit_price=4)
+        self.operation('remove', -12)
+        self.operation('adjust', 2)
+        count, total_value, item_value, _ = self.ledger(self.packet)
+
+        rows = [row for chunk in operation_chunks(packet_ids=[self.packet.pk]) for row in revalue_chunk(*chunk)]
+        self.assertEqual([row[:4] for row in rows], [(self.packet.pk, count, total_value, item_value)])
+
+    def test_repair_rewrites_ledger_and_running_columns(self):
+        self.operation('add', 10, unit_price=2)
+        last = self.operation('remove', -4)
+        expected = self.ledger(self.packet)
+        Packet.objects.filter(pk=self.packet.pk).update(count=99, totalValue=1)
+        StockOperation.objects.filter(pk=last.pk).update(balance_after=1, value_after=1)
+
+        call_command('revalue_stock', '--workers', '1', stdout=io.StringIO())
+
+        self.assertEqual(self.ledger(self.packet), expected)
+        self.assertTrue(self.packet.ledger_ready)
+        last.refresh_from_db()
+        self.assertEqual((float(last.balance_after), float(last.value_after)), (6, 12))
+
+    def test_repair_in_worker_processes(self):
+        other = Packet.objects.create(component=self.component, location=self.shelf)
+        self.operation('add', 10, unit_price=2)
+        self.operation('add', 4, unit_price=3, packet=other)
+        expected = [self.ledger(self.packet), self.ledger(other)]
+        Packet.objects.update(count=99, totalValue=1)
+
+        # Po jednom packetu na chunk, aby práci dostaly oba workery
+        call_command('revalue_stock', '--workers', '2', '--chunk-size', '1', stdout=io.StringIO())
+
+        self.assertEqual([self.ledger(self.packet), self.ledger(other)], expected)
+
+    def test_bulk_rebuild_matches_incremental_ledger(self):
+        self.operation('remove', -3)
+        self.operation('add', 10, unit_price=2)
+        self.operation('add', 5, unit_price=4)
+        self.operation('remove', -9)
+        self.operation('adjust', 2)
+        Packet.objects.filter(pk=self.packet.pk).update(archived_inflow_quantity=4, archived_inflow_value=20)
+        self.packet.refresh_from_db()
+        self.packet.rebuild()
+        expected = self.ledger(self.packet)
+        running = list(StockOperation.objects.filter(packet=self.packet).order_by('timestamp', 'id').values_list('balance_after', 'value_after'))
+
+        StockOperation.objects.filter(packet=self.packet).update(balance_after=None, value_after=None)
+        PacketLayer.objects.filter(packet=self.packet).delete()
+        Packet.objects.filter(pk=self.packet.pk).update(count=0, totalValue=0, itemValue=0, ledger_ready=False, last_operation=None)
+
+        self.assertEqual(rebuild_packets([self.packet.pk]), 1)
+        self.assertEqual(self.ledger(self.packet), expected)
+        self.assertEqual(list(StockOperation.objects.filter(packet=self.packet).order_by('timestamp', 'id').values_list('balance_after', 'value_after')), running)
+        self.packet.refresh_from_db()
+        newest = StockOperation.objects.filter(packet=self.packet).latest('timestamp')
+        self.assertEqual((self.packet.last_operation_id, self.packet.ledger_until), (newest.pk, newest.timestamp))
+        self.assertEqual(self.packet.pending_quantity, 0)
+        self.component.refresh_from_db()
+        self.assertEqual(float(self.component.stock_total), 5)
+
+
+class StockTotalsTests(WarehouseTestCase):
+    def test_component_totals_follow_packets_and_requests(self):
+        self.operation('add', 10, unit_price=2)
+        self.operation('remove', -4)
+        Reservation.objects.create(component=self.component, quantity=3, reserved_by='tester')
+        PurchaseRequest.objects.create(component=self.component, quantity=7)
+
+        self.component.refresh_from_db()
+        totals = [getattr(self.component, field) for field in Component.STOCK_TOTAL_FIELDS]
+        self.assertEqual(totals, [6, 3, 7, 12])
+        self.assertEqual(self.component.count, 3)
+
+
+class AuditStockTests(WarehouseTestCase):
+    def audit(self):
+        output = io.StringIO()
+        call_command('audit_stock', stdout=output)
+        return output.getvalue()
+
+    def test_repair_converges(self):
+        self.operation('add', 10, unit_price=2)
+        last = self.operation('remove', -4)
+        Packet.objects.filter(pk=self.packet.pk).update(count=99)
+        StockOperation.objects.filter(pk=last.pk).update(balance_after=50, value_after=5)
+
+        self.assertIn('1 packets and 1 components drifted.', self.audit())
+        self.assertIn('0 packets and 0 components drifted.', self.audit())
+
+        last.refresh_from_db()
+        self.assertEqual((float(last.balance_after), float(last.value_after)), (6, 12))
+        self.assertEqual(self.ledger(self.packet)[:2], (6, 12))
+
+
+class PacketLockTests(WarehouseTestCase):
+    def test_operation_locks_its_packet_before_insert(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.operation('add', 10, unit_price=2)
+
+        statements = [query['sql'] for query in queries]
+        locks = [index for index, sql in enumerate(statements) if 'FOR UPDATE' in sql]
+        self.assertEqual(len(locks), 1)
+        self.assertIn(Packet._meta.db_table, statements[locks[0]])
+        insert = next(index for index, sql in enumerate(statements) if sql.startswith(f'INSERT INTO "{StockOperation._meta.db_table}"'))
+        self.assertLess(locks[0], insert)
+
+
+class StockPartitioningTests(WarehouseTestCase):
+    def test_conversion_prunes_queue_lookup(self):
+        now = timezone.now()
+        old = now - datetime.timedelta(days=62)
+        self.operation('add', 10, unit_price=2)
+        self.backdate(old)
+        self.operation('remove', -3)
+
+        call_command('create_stock_partitions', '--convert', stdout=io.StringIO())
+        self.assertTrue(is_partitioned(connection))
+
+        self.packet.refresh_from_db()
+        self.assertEqual(self.packet.ledger_until, self.packet.last_operation.timestamp)
+        plan = self.packet.queued_operations().explain()
+        self.assertIn(partition_name(month_start(now.date())), plan)
+        self.assertNotIn(partition_name(month_start(old.date())), plan)
+
+        # Zápis do rozdělené tabulky a přírůstková aktualizace dál fungují
+        self.operation('remove', -2)
+        self.assertEqual(self.ledger(self.packet)[:2], (5, 10))
+        self.assertEqual(StockOperation.objects.filter(packet=self.packet, balance_after__isnull=True).count(), 0)
+
+
+class CompactStockHistoryTests(WarehouseTestCase):
+    def test_compaction_preserves_totals(self):
+        self.operation('add', 10, unit_price=2)
+        self.operation('add', 5, unit_price=4)
+        self.operation('remove', -12)
+        self.operation('adjust', 2)
+        self.backdate(timezone.now() - datetime.timedelta(days=60))
+        before = self.ledger(self.packet)[:3]
+
+        cutoff = timezone.localdate() - datetime.timedelta(days=30)
+        output = io.StringIO()
+        call_command('compact_stock_history', '--before', cutoff.isoformat(), '--min-operations', '1', stdout=output)
+
+        self.assertIn('Compacted 1 packets, archived 4 operations', output.getvalue())
+        self.assertEqual(self.ledger(self.packet)[:3], before)
+        self.assertEqual(ArchivedStockOperation.objects.filter(packet=self.packet).count(), 4)
+        self.assertFalse(StockOperation.objects.filter(packet=self.packet, opening_balance=False).exists())
+        self.assertEqual(self.packet.pending_quantity, 0)
+
+
+class RelinkOperationsTests(WarehouseTestCase):
+    def test_relink_rebuilds_chains(self):
+        for quantity in (10, -2, -3):
+            self.operation('add' if quantity > 0 else 'remove', quantity, unit_price=2 if quantity > 0 else None)
+        StockOperation.objects.update(previous_operation=None)
+        Packet.objects.filter(pk=self.packet.pk).update(last_operation=None)
+
+        output = io.StringIO()
+        call_command('relink_operations', str(self.packet.pk), stdout=output)
+
+        self.assertIn('Relinked 2 operations and repointed last_operation of 1 packets.', output.getvalue())
+        operations = list(StockOperation.objects.filter(packet=self.packet).order_by('timestamp', 'id'))
+        self.assertEqual(
+            [operation.previous_operation_id for operation in operations],
+            [None] + [operation.id for operation in operations[:-1]],
+        )
+        self.packet.refresh_from_db()
+        self.assertEqual(self.packet.last_operation_id, operations[-1].id)
+
+
+class ComponentQueryCountTests(WarehouseTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        other_shelf = Warehouse.objects.create(name='Shelf B', parent=cls.warehouse, can_store_items=True)
+        tag = Tag.objects.create(name='smd')
+        cls.component.tags.add(tag)
+        Packet.objects.create(component=cls.component, location=other_shelf)
+        for index in range(4):
+            component = Component.objects.create(name=f'Capacitor {index}', category=cls.category)
+            component.tags.add(tag)
+            Packet.objects.create(component=component, location=cls.shelf)
+            Packet.objects.create(component=component, location=other_shelf)
+
+    def test_list_queries_do_not_grow_with_page_size(self):
+        url = reverse('api_warehouse_components')
+        for page_size in (1, 5):
+            # Počet a stránka
+            with self.assertNumQueries(AUTH_QUERIES + 2):
+                response = self.client.get(url, {'page_size': page_size})
+            self.assertEqual(len(response.data['results']), page_size)
+
+            # Navíc jeden prefetch na každý rozbalený vztah
+            with self.assertNumQueries(AUTH_QUERIES + 4):
+                response = self.client.get(url, {'page_size': page_size, 'expand': 'packets,tags'})
+            self.assertEqual(len(response.data['results']), page_size)
+            self.assertTrue(all(len(result['packets']) == 2 for result in response.data['results']))
+
+    def test_detail_queries(self):
+        url = reverse('api_warehouse_component_detail', args=[self.component.pk])
+        # Součástka s kategorií, dokumenty, packety s umístěním, dodavatelé, tagy a cesta umístění každého packetu
+        with self.assertNumQueries(AUTH_QUERIES + 5 + 2):
+            response = self.client.get(url)
+        self.assertEqual(len(response.data['packets']), 2)
+
+        # Z cache jen ověření uživatele
+        with self.assertNumQueries(AUTH_QUERIES):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+
+class KeysetPaginationTests(WarehouseTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        for name in ('Diode', 'Anode', 'Crystal', 'Bead', 'Fuse'):
+            Component.objects.create(name=name, category=cls.category)
+
+    def walk(self, **params):
+        response = self.client.get(reverse('api_warehouse_components'), {'pagination': 'cursor', 'page_size': 2, **params})
+        pages = []
+        while True:
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('total_count', response.data)
+            pages.append([result['name'] for result in response.data['results']])
+            if not response.data['next']:
+                return pages
+            response = self.client.get(response.data['next'])
+
+    def test_cursor_walks_every_row_once(self):
+        pages = self.walk(ordering='name')
+        self.assertEqual([len(page) for page in pages], [2, 2, 2])
+        self.assertEqual(sum(pages, []), sorted(Component.objects.values_list('name', flat=True)))
+
+    def test_cursor_breaks_ties_by_id(self):
+        # Všechny součástky mají stock_total 0, pořadí určuje jen id
+        names = sum(self.walk(ordering='-stock_total'), [])
+        self.assertEqual(len(names), Component.objects.count())
+        self.assertEqual(len(set(names)), len(names))
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse('api_warehouse_components'), {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 404)
+
+
+class ConditionalGetTests(WarehouseTestCase):
+    def test_component_detail_etag(self):
+        url = reverse('api_warehouse_component_detail', args=[self.component.pk])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        # Verze se mění až po commitu
+        with self.captureOnCommitCallbacks(execute=True):
+            self.operation('add', 3, unit_price=1)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(float(response.data['packets'][0]['count']), 3)
+
+    def test_packet_detail_etag(self):
+        url = f'/api/v1/store/packet/{self.packet.pk}/'
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+        self.assertEqual(self.client.get(f'/api/v1/store/packet/{uuid.uuid4()}/').status_code, 404)
+        self.assertEqual(self.client.get('/api/v1/store/packet/not-a-uuid/').status_code, 404)
+
+    def test_versions_created_on_read_expire(self):
+        # Id z požadavku nemusí existovat, založená verze nesmí v cache zůstat navždy
+        url = reverse('api_warehouse_component_detail', args=[uuid.uuid4()])
+        with mock.patch.object(cache, 'add', wraps=cache.add) as add:
+            self.assertEqual(self.client.get(url).status_code, 404)
+        timeouts = {call.kwargs['timeout'] for call in add.call_args_list if call.args[0].startswith('version:')}
+        self.assertEqual(timeouts, {settings.VERSION_KEY_TIMEOUT})
+
+
+class ComponentDetailCacheTests(WarehouseTestCase):
+    def test_cached_detail_lives_until_version_bump(self):
+        url = reverse('api_warehouse_component_detail', args=[self.component.pk])
+        self.assertEqual(self.client.get(url).data['name'], 'Resistor 10k')
+
+        # update() neposílá signály, v cache zůstává původní reprezentace
+        Component.objects.filter(pk=self.component.pk).update(name='Resistor 22k')
+        self.assertEqual(self.client.get(url).data['name'], 'Resistor 10k')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Component.objects.get(pk=self.component.pk).save()
+        self.assertEqual(self.client.get(url).data['name'], 'Resistor 22k')
+
+
+class ComponentBatchTests(WarehouseTestCase):
+    def test_batch_keeps_order_and_reports_unknown_ids(self):
+        other = Component.objects.create(name='Capacitor', category=self.category)
+        unknown = '00000000-0000-0000-0000-000000000000'
+
+        response = self.client.post(reverse('api_warehouse_components_batch'), {
+            'ids': [str(other.pk), unknown, str(self.component.pk), 'nonsense'],
+            'fields': ['name'],
+            'expand': ['packets'],
+        }, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([result['name'] for result in response.data['results']], ['Capacitor', 'Resistor 10k'])
+        self.assertEqual(set(response.data['results'][0]), {'id', 'name', 'packets'})
+        self.assertEqual(response.data['missing'], [unknown])
+        self.assertEqual(response.data['invalid'], ['nonsense'])
+
+
+class PrimaryImageUrlTests(WarehouseTestCase):
+    def test_primary_document_overrides_imported_image(self):
+        Component.objects.filter(pk=self.component.pk).update(primary_image='https://example.com/img/imported.png')
+        self.component.refresh_from_db()
+        self.component.refresh_primary_image_url()
+        self.assertEqual(self.component.primary_image_url, 'https://example.com/img/imported.png')
+
+        document = Document.objects.create(component=self.component, url='https://example.com/img/photo.png', is_primary=True)
+        self.component.refresh_from_db()
+        self.assertEqual(self.component.primary_image_url, 'https://example.com/img/photo.png')
+
+        response = self.client.get(reverse('api_warehouse_components'), {'fields': 'primary_image_url'})
+        self.assertEqual(response.data['results'][0]['primary_image_url'], 'https://example.com/img/photo.png')
+
+        document.delete()
+        self.component.refresh_from_db()
+        self.assertEqual(self.component.primary_image_url, 'https://example.com/img/imported.png')
+
+
+S3_TEST_BUCKET = 'intranet-tests'
+S3_TEST_ENDPOINT = 'https://s3.us-east-1.amazonaws.com'
+
+
+@skipUnless(mock_aws, 'moto is not installed')
+@override_settings(
+    S3_ENDPOINT_URL=S3_TEST_ENDPOINT, AWS_S3_ENDPOINT_URL=S3_TEST_ENDPOINT,
+    S3_STORAGE_BUCKET_NAME=S3_TEST_BUCKET, AWS_STORAGE_BUCKET_NAME=S3_TEST_BUCKET,
+    S3_PUBLIC_ENDPOINT_URL=None, AWS_S3_PUBLIC_ENDPOINT_URL=None,
+    AWS_ACCESS_KEY_ID='testing', AWS_SECRET_ACCESS_KEY='testing', AWS_S3_REGION_NAME='us-east-1',
+)
+class SignedDocumentUrlTests(WarehouseTestCase):
+    def setUp(self):
+        super().setUp()
+        aws = mock_aws()
+        aws.start()
+        self.addCleanup(aws.stop)
+        # Endpointy i podepisující úložiště jsou cachované na proces
+        for cached in (public_endpoints, signed_storage):
+            cached.cache_clear()
+            self.addCleanup(cached.cache_clear)
+
+        s3 = boto3.client('s3', region_name='us-east-1')
+        s3.create_bucket(Bucket=S3_TEST_BUCKET)
+        s3.put_object(Bucket=S3_TEST_BUCKET, Key='documents/datasheet.pdf', Body=b'%PDF')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.document = Document.objects.create(
+                component=self.component, name='Datasheet', access_level='signed', file='documents/datasheet.pdf',
+            )
+
+    def test_signed_url_is_shared_through_cache(self):
+        url = signed_url('documents/datasheet.pdf')
+        self.assertIn('X-Amz-Signature', url)
+        self.assertIn(S3_TEST_BUCKET, url)
+
+        with mock.patch.object(SignedS3Boto3Storage, 'url') as sign:
+            self.assertEqual(signed_url('documents/datasheet.pdf'), url)
+        sign.assert_not_called()
+
+    def test_component_detail_signs_every_response(self):
+        url = reverse('api_warehouse_component_detail', args=[self.component.pk])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        document = response.data['documents'][0]
+        self.assertIn('X-Amz-Signature', document['get_url'])
+        self.assertEqual(document['file_url'], document['get_url'])
+        self.assertNotIn('_signed_name', document)
+        # Expirující URL nesmí klient revalidovat ani uložit
+        self.assertNotIn('ETag', response)
+        self.assertIn('no-store', response['Cache-Control'])
+
+        # Detail jde z cache, URL se ale podepisuje znovu
+        fresh = {'documents/datasheet.pdf': 'https://signed.example/datasheet.pdf'}
+        with mock.patch('nextintranet_warehouse.views.document.signed_urls', return_value=fresh):
+            response = self.client.get(url)
+        self.assertEqual(response.data['documents'][0]['get_url'], 'https://signed.example/datasheet.pdf')
+
+    def test_packet_responses_sign_nested_documents(self):
+        for url in (f'/api/v1/store/packet/{self.packet.pk}/', reverse('api_warehouse_component_packets', args=[self.component.pk])):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            packet = response.data[0] if isinstance(response.data, list) else response.data
+            document = packet['component']['documents'][0]
+            self.assertIn('X-Amz-Signature', document['get_url'])
+            self.assertNotIn('_signed_name', document)
+            self.assertNotIn('ETag', response)
+            self.assertIn('no-store', response['Cache-Control'])
+
+
+class InventorySummaryTests(WarehouseTestCase):
+    def test_summary_by_ids_and_location(self):
+        other_shelf = Warehouse.objects.create(name='Shelf B', parent=self.warehouse, can_store_items=True)
+        other_packet = Packet.objects.create(component=self.component, location=other_shelf)
+        self.operation('add', 5, unit_price=1)
+        self.operation('add', 2, unit_price=1, packet=other_packet)
+        url = reverse('api_warehouse_components_inventory_summary')
+
+        response = self.client.get(url, {'ids': str(self.component.pk)})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'], [{
+            'id': self.component.pk, 'total_quantity': 7.0, 'reserved_quantity': 0.0, 'purchase_quantity': 0.0,
+        }])
+
+        # Se skladem se počítají jen packety v jeho podstromu
+        response = self.client.post(url, {'ids': [str(self.component.pk)], 'location': str(other_shelf.pk)}, format='json')
+        self.assertEqual(response.data['results'][0]['total_quantity'], 2.0)
+
+        self.assertEqual(self.client.get(url).status_code, 400)
+        self.assertEqual(self.client.get(url, {'ids': 'not-a-uuid'}).status_code, 400)
+
+
+class CatalogueExportTests(WarehouseTestCase):
+    url = reverse_lazy('api_warehouse_export_catalogue')
+
+    def test_ndjson_tags_rows_with_entity(self):
+        response = self.client.get(self.url, {'entity': 'components,packets'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = [json.loads(line) for line in self.streamed(response).splitlines()]
+        self.assertEqual([(line['type'], line['id']) for line in lines], [
+            ('components', str(self.component.pk)),
+            ('packets', str(self.packet.pk)),
+        ])
+        self.assertEqual(lines[0]['category_name'], 'Resistors')
+
+    def test_csv_exports_one_entity(self):
+        self.operation('add', 4, unit_price=2)
+        response = self.client.get(self.url, {'entity': 'packets', 'output': 'csv'})
+        self.assertEqual(response.status_code, 200)
+        rows = list(csv.DictReader(io.StringIO(self.streamed(response))))
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['id'], str(self.packet.pk))
+        self.assertEqual(float(rows[0]['total_value']), 8)
+
+    def test_rejects_bad_parameters(self):
+        self.assertEqual(self.client.get(self.url, {'entity': 'nonsense'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'output': 'csv'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'output': 'xml'}).status_code, 400)
+
+
+class BulkImportTests(WarehouseTestCase):
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def run_import(self, kind, entries):
+        path = os.path.join(self.directory, f'{kind}.ndjson')
+        with open(path, 'w', encoding='utf-8') as file:
+            file.writelines(json.dumps(entry) + '\n' for entry in entries)
+        call_command('bulk_import', kind, path, stdout=io.StringIO(), stderr=io.StringIO())
+        # Po úspěšném importu checkpoint nezůstává
+        self.assertFalse(os.path.exists(path + '.checkpoint.json'))
+
+    def test_import_is_idempotent(self):
+        categories = [
+            {'_id': {'$oid': 'a' * 24}, 'name': 'Passives', 'parent': '#'},
+            {'_id': {'$oid': 'b' * 24}, 'name': 'Capacitors', 'parent': {'$oid': 'a' * 24}},
+        ]
+        stock = [{
+            '_id': {'$oid': 'c' * 24},
+            'name': 'Capacitor 100n',
+            'category': [{'$oid': 'b' * 24}],
+            'price': {'$numberDouble': '0.5'},
+            'supplier': [{'supplier': 'TME', 'symbol': 'C100N'}],
+            'tags': [{'id': 'smd'}],
+        }]
+        for _ in range(2):
+            self.run_import('categories', categories)
+            self.run_import('stock', stock)
+
+        child = Category.objects.get(id=oid_to_uuid4('b' * 24))
+        self.assertEqual(child.parent_id, oid_to_uuid4('a' * 24))
+        self.assertEqual(child.level, 1)
+
+        component = Component.objects.get(id=oid_to_uuid4('c' * 24))
+        self.assertEqual((component.name, component.category_id, float(component.internal_price)), ('Capacitor 100n', child.id, 0.5))
+        self.assertEqual(list(component.tags.values_list('name', flat=True)), ['smd'])
+        self.assertEqual(list(component.suppliers.values_list('supplier__name', 'symbol')), [('TME', 'C100N')])
+        self.assertEqual(Component.objects.filter(name='Capacitor 100n').count(), 1)
+
+    def test_operations_into_existing_ledger(self):
+        packet = Packet.objects.create(id=oid_to_uuid4('d' * 24), component=self.component, location=self.shelf)
+        self.operation('add', 10, unit_price=2, packet=packet)
+        imported_at = int(timezone.now().timestamp() * 1000)
+        self.run_import('operations', [{
+            '_id': {'$oid': 'e' * 24},
+            'date': {'$date': {'$numberLong': str(imported_at)}},
+            'user': 'tester',
+            'pid': {'$oid': 'd' * 24},
+            'type': 'remove',
+            'count': {'$numberInt': '-4'},
+            'unit_price': None,
+            'description': 'import',
+        }])
+
+        # Importovaná operace nebyla ve frontě, pending_quantity se nesmí snížit
+        self.assertEqual(self.ledger(packet)[:2], (6, 12))
+        self.assertEqual((packet.pending_quantity, packet.current_count), (0, 6))
+        operation = StockOperation.objects.get(id=oid_to_uuid4('e' * 24))
+        self.assertEqual((float(operation.balance_after), float(operation.value_after)), (6, 12))
+        self.component.refresh_from_db()
+        self.assertEqual(float(self.component.stock_total), 6)
+
+
+class GlobalSearchTests(WarehouseTestCase):
+    url = reverse_lazy('api-search')
+
+    def setUp(self):
+        super().setUp()
+        User.objects.filter(pk=self.user.pk).update(is_superuser=True)
+
+    def found(self, **params):
+        response = self.client.get(self.url, {'source': 'components', **params})
+        self.assertEqual(response.status_code, 200)
+        return [item['label'] for item in response.data['results']]
+
+    def test_fulltext_prefix_ignores_accents(self):
+        Component.objects.create(name='Odpór 4k7', category=self.category)
+        self.assertEqual(self.found(q='odpo'), ['Odpór 4k7'])
+        self.assertEqual(self.found(q='ODPOR 4k'), ['Odpór 4k7'])
+        self.assertEqual(self.found(q='kondenzator'), [])
+
+    def test_fuzzy_mode_tolerates_typos(self):
+        Component.objects.create(name='STM32F103C8', category=self.category)
+        self.assertEqual(self.found(q='STM32F10C8'), [])
+        self.assertEqual(self.found(q='STM32F10C8', mode='fuzzy'), ['STM32F103C8'])
+
+        response = self.client.get(self.url, {'q': 'STM32F10C8', 'mode': 'fuzzy', 'threshold': '1'})
+        self.assertEqual((response.data['mode'], response.data['threshold']), ('fuzzy', 1.0))
+        self.assertEqual(response.data['total_count'], 0)
+
+    def ranked(self, **params):
+        response = self.client.get(self.url, {'q': 'resistor', 'source': 'components,locations,packets', **params})
+        self.assertEqual(response.status_code, 200)
+        return response.data, [(item['source'], item['label']) for item in response.data['results']]
+
+    def test_ranking_across_sources(self):
+        Warehouse.objects.create(name='Resistor drawer', parent=self.warehouse)
+        Component.objects.create(name='Trimmer 1k', description='Adjustable resistor', category=self.category)
+
+        # Shody v názvu mají stejné skóre a řadí se podle pořadí zdrojů, shoda v popisu až za nimi
+        data, results = self.ranked(limit=10)
+        self.assertEqual(results, [
+            ('components', 'Resistor 10k'),
+            ('locations', 'Resistor drawer'),
+            ('packets', 'Resistor 10k'),
+            ('components', 'Trimmer 1k'),
+        ])
+        self.assertEqual(data['source_counts'], {'components': 2, 'locations': 1, 'packets': 1})
+        self.assertEqual((data['total_count'], data['total_pages']), (4, 1))
+
+        self.assertEqual(self.ranked(limit=3, page=2)[1], [('components', 'Trimmer 1k')])
+
+    def test_pages_after_direct_matches(self):
+        drawer = Warehouse.objects.create(name='Resistor drawer', parent=self.warehouse)
+        Component.objects.create(name='Trimmer 1k', description='Adjustable resistor', category=self.category)
+
+        def identifier_match(view, query, sources, warehouse_access):
+            return [view.build_location_result(drawer)]
+
+        with mock.patch.object(SearchApiView, 'resolve_identifier_match', autospec=True, side_effect=identifier_match):
+            first, first_results = self.ranked(limit=2)
+            second, second_results = self.ranked(limit=2, page=2)
+
+        # Přímá shoda je první a z řazených výsledků se vynechá, druhá stránka na ni navazuje
+        self.assertEqual(first_results, [('locations', 'Resistor drawer'), ('components', 'Resistor 10k')])
+        self.assertEqual(second_results, [('packets', 'Resistor 10k'), ('components', 'Trimmer 1k')])
+        for data in (first, second):
+            self.assertEqual(data['source_counts'], {'components': 2, 'locations': 1, 'packets': 1})
+            self.assertEqual((data['total_count'], data['total_pages']), (4, 2))
@@ -8,7 +8,7 @@ from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 from .views import warehouse
 
 # from .serializers.components import ComponentSerializer
-from .views.components import ComponentListAPIView, ComponentDetailAPIView, ComponentParameterListAPIView, ComponentParameterCreateAPIView
+from .views.components import ComponentListAPIView, ComponentBatchAPIView, ComponentInventorySummaryAPIView, ComponentDetailAPIView, ComponentParameterListAPIView, ComponentParameterCreateAPIView
 from .views.warehouse import WarehousePositionsListAPIView, WarehousePositionsTreeAPIView
 from .views.category import CategoryRouter
 from .views.packets import PacketRouter, PacketListCreateAPIView, PDFGeneratorView, PacketOperationsAPIView
@@ -21,10 +21,13 @@ from .views.stockOperation import StockOperationRouter
 from .views.purchase_requests import PurchaseRequestListAPIView, PurchaseRequestDetailAPIView
 from .views.document_api import ComponentDocumentListCreateAPIView, ComponentDocumentDetailAPIView, DocumentDetailAPIView
 from .views.reservations import ReservationListAPIView, ReservationDetailAPIView
+from .views.inventory import CatalogueExportAPIView, InventoryHistoryAPIView
 
 # /api/v1/warehouse/
 urlpatterns = [
     path('components/', ComponentListAPIView.as_view(), name='api_warehouse_components'),
+    path('components/batch/', ComponentBatchAPIView.as_view(), name='api_warehouse_components_batch'),
+    path('components/inventory-summary/', ComponentInventorySummaryAPIView.as_view(), name='api_warehouse_components_inventory_summary'),
     path('component/<uuid:pk>/', ComponentDetailAPIView.as_view(), name='api_warehouse_component_detail'),
     #path('component/<uuid:pk>/parameter/new/', ComponentParameterCreateAPIView.as_view(), name='api_warehouse_component_parameter_create'),
     #path('component/<uuid:pk>/parameter/', ComponentParameterListAPIView.as_view(), name='api_warehouse_component_parameters'),
@@ -41,6 +44,8 @@ urlpatterns = [
     path('packet/', include(PacketRouter.urls), name='api_warehouse_packet_detail'),
     # path('packet/<uuid:pk>/operations/', PacketOperationsAPIView.as_view(), name='api_warehouse_packet_operations'),
     path('component/<uuid:pk>/packet/', PacketListCreateAPIView.as_view(), name='api_warehouse_component_packets'),
+    path('inventory/history/', InventoryHistoryAPIView.as_view(), name='api_warehouse_inventory_history'),
+    path('export/catalogue/', CatalogueExportAPIView.as_view(), name='api_warehouse_export_catalogue'),
 
 # Operations
 
@@ -0,0 +1,189 @@
+"""
+Bulk FIFO valuation of packets, shared by the revalue_stock, audit_stock and
+bulk_import commands.
+
+fifo.revalue_chunk() produces the same count, totalValue and itemValue as
+Packet.rebuild(), but for many packets at once from a flat stream of
+operations, so a whole warehouse can be checked cheaply. Packets that
+differ are then repaired with rebuild_packets(), which computes the running
+columns of their operations with fifo.ledger_chunk() and writes them back
+with bulk_update, together with the layers and ledger of the packets.
+"""
+from django.db import models, transaction
+
+from .fifo import ARCHIVED_INFLOW, OTHER, OUTFLOW, PRICED_INFLOW, ledger_chunk
+from .models.component import Component, Packet, PacketLayer, StockOperation
+from .signals import bump_component_versions, emit_bulk_model_change, muted_model_events
+
+
+def operation_kind(operation_type, unit_price):
+    if operation_type in StockOperation.INFLOW_TYPES and (unit_price or 0) > 0:
+        return PRICED_INFLOW
+    if operation_type in StockOperation.OUTFLOW_TYPES:
+        return OUTFLOW
+    return OTHER
+
+
+def operation_chunks(packet_ids=None, exclude=(), chunk_size=2000):
+    """
+    Stream operations ordered by (packet, timestamp) and group them into
+    chunks of `chunk_size` packets, ready for fifo.revalue_chunk().
+    """
+    operations = StockOperation.objects.all()
+    if packet_ids is not None:
+        operations = operations.filter(packet_id__in=packet_ids)
+    if exclude:
+        operations = operations.exclude(packet_id__in=exclude)
+    operations = operations.order_by('packet_id', 'timestamp', 'id').values_list(
+        'packet_id', 'operation_type', 'quantity', 'unit_price',
+    )
+    archived = {
+        packet_id: (quantity, value)
+        for packet_id, quantity, value in Packet.objects.exclude(archived_inflow_quantity=0).values_list(
+            'id', 'archived_inflow_quantity', 'archived_inflow_value',
+        )
+    }
+
+    chunk = ([], [], [], [], [])
+    for packet_id, operation_type, quantity, unit_price in operations.iterator(chunk_size=20000):
+        packet_ids, index, kinds, quantities, prices = chunk
+        if not packet_ids or packet_ids[-1] != packet_id:
+            if len(packet_ids) >= chunk_size:
+                yield chunk
+                chunk = packet_ids, index, kinds, quantities, prices = ([], [], [], [], [])
+            packet_ids.append(packet_id)
+            if packet_id in archived:
+                quantity_archived, value_archived = archived[packet_id]
+                index.append(len(packet_ids) - 1)
+                kinds.append(ARCHIVED_INFLOW)
+                quantities.append(quantity_archived)
+                prices.append(value_archived / quantity_archived)
+
+        index.append(len(packet_ids) - 1)
+        kinds.append(operation_kind(operation_type, unit_price))
+        quantities.append(quantity or 0)
+        prices.append(unit_price or 0)
+
+    if chunk[0]:
+        yield chunk
+
+
+def rebuild_packets(packet_ids, fresh=(), chunk_size=500):
+    """
+    Rebuild the FIFO ledger of the packets in bulk, with the same result as
+    Packet.rebuild() on each of them. Returns the number of rebuilt packets.
+
+    Every chunk runs in one transaction holding the row locks of its
+    packets, so it serialises with StockOperation.save() like any other
+    stock write. `fresh` lists ids of operations that are not counted in
+    pending_quantity (e.g. just imported); other operations without a
+    running balance on a ready ledger are queued ones and are released
+    from pending_quantity, as in Packet.rebuild().
+    """
+    packet_ids = list(packet_ids)
+    fresh = {str(operation_id) for operation_id in fresh}
+    rebuilt = 0
+    for start in range(0, len(packet_ids), chunk_size):
+        with transaction.atomic(), muted_model_events():
+            # Zámky v pořadí podle pk jako hromadný endpoint operací, aby nevznikl deadlock
+            packets = list(
+                Packet.objects.select_for_update().filter(id__in=packet_ids[start:start + chunk_size]).order_by('pk')
+            )
+            _rebuild_chunk(packets, fresh)
+        rebuilt += len(packets)
+    return rebuilt
+
+
+def _rebuild_chunk(packets, fresh):
+    if not packets:
+        return
+    positions = {packet.pk: position for position, packet in enumerate(packets)}
+    operations = list(
+        StockOperation.objects.filter(packet_id__in=positions).order_by('packet_id', 'timestamp', 'id').only(
+            'id', 'packet_id', 'operation_type', 'quantity', 'unit_price', 'timestamp', 'balance_after',
+        )
+    )
+    by_packet = {packet.pk: [] for packet in packets}
+    for operation in operations:
+        by_packet[operation.packet_id].append(operation)
+
+    # Každý packet začíná pseudo-záznamem archivovaných příjmů, i když nemá žádnou operaci
+    index, kinds, quantities, prices, entries = [], [], [], [], []
+    for packet in packets:
+        position = positions[packet.pk]
+        index.append(position)
+        kinds.append(ARCHIVED_INFLOW)
+        quantities.append(packet.archived_inflow_quantity)
+        prices.append(packet.archived_inflow_value / packet.archived_inflow_quantity if packet.archived_inflow_quantity else 0)
+        entries.append(None)
+        for operation in by_packet[packet.pk]:
+            index.append(position)
+            kinds.append(operation_kind(operation.operation_type, operation.unit_price))
+            quantities.append(operation.quantity or 0)
+            prices.append(operation.unit_price or 0)
+            entries.append(operation)
+
+    count, total_value, item_value, inflow_quantity, inflow_value, unmatched, remaining = ledger_chunk(
+        len(packets), index, kinds, quantities, prices,
+    )
+
+    layers = []
+    released = {}
+    last = {}
+    for entry, operation in enumerate(entries):
+        if operation is None:
+            continue
+        packet = packets[index[entry]]
+        if packet.ledger_ready and operation.balance_after is None and str(operation.id) not in fresh:
+            released[packet.pk] = released.get(packet.pk, 0) + (operation.quantity or 0)
+        operation.balance_after = float(count[entry])
+        operation.value_after = float(total_value[entry])
+        if kinds[entry] == PRICED_INFLOW:
+            layers.append(PacketLayer(
+                packet=packet,
+                operation=operation,
+                timestamp=operation.timestamp,
+                quantity=operation.quantity,
+                remaining=float(remaining[entry]),
+                unit_price=operation.unit_price,
+            ))
+        last[packet.pk] = entry
+
+    for packet in packets:
+        entry = last.get(packet.pk)
+        packet.ledger_ready = True
+        if entry is None:
+            packet.count = packet.totalValue = packet.itemValue = 0
+            packet.inflow_quantity = packet.archived_inflow_quantity
+            packet.inflow_value = packet.archived_inflow_value
+            packet.unmatched_outflow = 0
+            packet.ledger_until = None
+            packet.last_operation = None
+            continue
+        packet.count = float(count[entry])
+        packet.totalValue = float(total_value[entry])
+        packet.itemValue = float(item_value[entry])
+        packet.inflow_quantity = float(inflow_quantity[entry])
+        packet.inflow_value = float(inflow_value[entry])
+        packet.unmatched_outflow = float(unmatched[entry])
+        packet.last_operation = entries[entry]
+        packet.ledger_until = max(operation.timestamp for operation in by_packet[packet.pk])
+
+    PacketLayer.objects.filter(packet__in=packets).delete()
+    PacketLayer.objects.bulk_create(layers, batch_size=1000)
+    if operations:
+        # Spodní mez na timestamp omezí UPDATE na oddíly s přepočítanými operacemi
+        oldest = min(operation.timestamp for operation in operations)
+        StockOperation.objects.filter(timestamp__gte=oldest).bulk_update(
+            operations, ['balance_after', 'value_after'], batch_size=1000,
+        )
+    Packet.objects.bulk_update(packets, Packet.LEDGER_FIELDS + ['last_operation'], batch_size=1000)
+    for packet_id, quantity in released.items():
+        if quantity:
+            Packet.objects.filter(pk=packet_id).update(pending_quantity=models.F('pending_quantity') - quantity)
+
+    # bulk_update neposílá signály: souhrny součástek, verze a událost doplníme jednou za chunk
+    component_ids = {packet.component_id for packet in packets}
+    Component.objects.filter(id__in=component_ids).refresh_stock_totals()
+    bump_component_versions(component_ids, list(positions))
+    emit_bulk_model_change(Packet, list(positions), 'updated')
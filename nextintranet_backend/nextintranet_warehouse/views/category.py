@@ -6,6 +6,7 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework import generics
 from rest_framework.pagination import PageNumberPagination
 from nextintranet_backend.routers import NoFormatSuffixRouter as DefaultRouter
+from nextintranet_backend.conditional import conditional_response, version_key
 
 from nextintranet_warehouse.models import Warehouse
 from nextintranet_warehouse.models import Warehouse
@@ -71,20 +72,24 @@ class CategoryAPIView(viewsets.ModelViewSet):
 
     @action(detail=False, methods=['get'], url_path='tree')
     def tree_all(self, request):
-        categories = Category.objects.all()
-        tree = self.build_tree(categories)
-        return Response(tree)
+        def build():
+            categories = Category.objects.all()
+            tree = self.build_tree(categories)
+            return Response(tree)
+        return conditional_response(request, [version_key(Category)], build)
 
     @action(detail=True, methods=['get'], url_path='tree')
     def tree(self, request, pk=None):
-        print("get_descendant_tree", pk)
-        category = Category.objects.get(id=pk)
-        print(category) 
-        objects = category.get_descendants(include_self=True)
-        print(objects)
-
-        tree = self.build_tree(objects)
-        return Response(tree)
+        def build():
+            print("get_descendant_tree", pk)
+            category = Category.objects.get(id=pk)
+            print(category) 
+            objects = category.get_descendants(include_self=True)
+            print(objects)
+
+            tree = self.build_tree(objects)
+            return Response(tree)
+        return conditional_response(request, [version_key(Category)], build)
 
 CategoryRouter = DefaultRouter(trailing_slash=True)
 CategoryRouter.register(r'', CategoryAPIView)
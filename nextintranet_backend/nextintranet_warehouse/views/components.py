@@ -1,8 +1,14 @@
+from functools import partial
+import uuid
 from rest_framework import serializers
 
 from rest_framework.permissions import IsAuthenticated
 from rest_framework import generics
+from rest_framework import status
 from rest_framework.pagination import PageNumberPagination
+from nextintranet_backend.pagination import KeysetPageNumberPagination
+from nextintranet_backend.conditional import cached_representation, conditional_response, version_key
+from nextintranet_backend.search import fuzzy, parse_threshold, trigram_threshold
 
 from django.forms import ModelForm
 from django.views.generic.edit import FormView
@@ -32,8 +38,9 @@ from ..models.purchase import PurchaseRequest
 from ..models.component import Tag
 from ..models.category import Category
 from .category import CategorySerializer
-from .document import DocumentSerializer
+from .document import DocumentSerializer, sign_documents
 from django.conf import settings
+from django.utils.cache import patch_cache_control
 from urllib.parse import urlparse
 from .warehouse import WarehouseSerializer
 from .tags import TagSerializer
@@ -95,12 +102,12 @@ class PacketSerializer(serializers.ModelSerializer):
     location = WarehouseSerializer()
     class Meta:
         model = Packet
-        fields = '__all__'
+        exclude = ['search_vector']
 
     def to_representation(self, instance):
-        if instance.count == 0 and instance.operations.exists():
-            instance.calculate()
-        return super().to_representation(instance)
+        response = super().to_representation(instance)
+        response['count'] = self.fields['count'].to_representation(instance.current_count)
+        return response
 
 class SupplierSerializer(serializers.ModelSerializer):
     class Meta:
@@ -117,27 +124,28 @@ class SupplierRelationSerializer(serializers.ModelSerializer):
     def get_url(self, obj):
         return obj.url
 
-class StandardResultsSetPagination(PageNumberPagination):
+class StandardResultsSetPagination(KeysetPageNumberPagination):
     page_size = 25
     page_size_query_param = 'page_size'
     max_page_size = 100
 
     def get_paginated_response(self, data):
-        return Response({
+        if self.cursor_mode:
+            return super().get_paginated_response(data)
+        return self.mark_estimate(Response({
             'total_count': self.page.paginator.count,
             'total_pages': self.page.paginator.num_pages,
             'current_page': self.page.number,
             'next': self.get_next_link(),
             'previous': self.get_previous_link(),
             'results': data
-        })
+        }))
 
 def get_url(self, obj):
     return obj.url
 
 class ComponentSerializer(serializers.ModelSerializer):
     documents = DocumentSerializer(many=True, read_only=True)
-    primary_image_url = serializers.SerializerMethodField()
     inventory_summary = serializers.SerializerMethodField()
 
     category = serializers.PrimaryKeyRelatedField(
@@ -152,52 +160,11 @@ class ComponentSerializer(serializers.ModelSerializer):
     packets = PacketSerializer(many=True, read_only=True)
     suppliers = SupplierRelationSerializer(many=True, read_only=True)
     
-    def get_primary_image_url(self, instance):
-        primary_document = instance.documents.filter(is_primary=True).order_by('id').first()
-        if primary_document:
-            url = primary_document.get_url
-        else:
-            url = instance.primary_image
-        if not url:
-            return None
-
-        public_endpoint = getattr(settings, 'S3_PUBLIC_ENDPOINT_URL', None)
-        internal_endpoint = getattr(settings, 'S3_ENDPOINT_URL', None)
-        bucket = getattr(settings, 'S3_STORAGE_BUCKET_NAME', None)
-        if not public_endpoint:
-            public_endpoint = getattr(settings, 'AWS_S3_PUBLIC_ENDPOINT_URL', None)
-        if not internal_endpoint:
-            internal_endpoint = getattr(settings, 'AWS_S3_ENDPOINT_URL', None)
-        if not bucket:
-            bucket = getattr(settings, 'AWS_STORAGE_BUCKET_NAME', None)
-
-        if public_endpoint and internal_endpoint and url.startswith(internal_endpoint):
-            return public_endpoint.rstrip('/') + url[len(internal_endpoint):]
-
-        parsed = urlparse(url)
-        path = parsed.path or ''
-        if public_endpoint and bucket and path.startswith('/documents/'):
-            return f"{public_endpoint.rstrip('/')}/{bucket}{path}"
-
-        return url
-
     def get_inventory_summary(self, instance):
-        total_quantity = 0
-        reserved_quantity = instance.reservations.aggregate(
-            total_reserved=models.Sum('quantity')
-        )['total_reserved'] or 0
-        for packet in instance.packets.all():
-            if packet.count == 0 and packet.operations.exists():
-                packet.calculate()
-            total_quantity += packet.count or 0
-        purchase_quantity = PurchaseRequest.objects.filter(
-            component=instance,
-            purchase__isnull=True,
-        ).aggregate(total_requested=models.Sum('quantity'))['total_requested'] or 0
         return {
-            'total_quantity': float(total_quantity),
-            'reserved_quantity': float(reserved_quantity),
-            'purchase_quantity': float(purchase_quantity),
+            'total_quantity': float(instance.stock_total),
+            'reserved_quantity': float(instance.reserved_total),
+            'purchase_quantity': float(instance.on_order_total),
         }
 
 
@@ -210,15 +177,141 @@ class ComponentSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Component
-        fields = '__all__'
+        exclude = ['search_vector']
+        read_only_fields = Component.STOCK_TOTAL_FIELDS
+
+
+
+class ComponentListPacketSerializer(serializers.ModelSerializer):
+    location_name = serializers.CharField(source='location.name', read_only=True)
+
+    class Meta:
+        model = Packet
+        fields = ['id', 'location', 'location_name', 'is_trackable', 'description', 'count', 'totalValue', 'itemValue']
+
+    def to_representation(self, instance):
+        response = super().to_representation(instance)
+        response['count'] = self.fields['count'].to_representation(instance.current_count)
+        return response
+
+
+class ComponentListSerializer(serializers.ModelSerializer):
+    """
+    Lightweight representation for component lists.
+
+    `fields` limits the plain fields, `expand` adds the nested relations
+    listed in EXPANDABLE. Both are set by ComponentListAPIView from the query.
+    """
+    category = CategorySerializer(read_only=True)
+    inventory_summary = serializers.SerializerMethodField()
+
+    packets = ComponentListPacketSerializer(many=True, read_only=True)
+    suppliers = SupplierRelationSerializer(many=True, read_only=True)
+    documents = DocumentSerializer(many=True, read_only=True)
+    tags = TagSerializer(many=True, read_only=True)
+
+    EXPANDABLE = ('packets', 'suppliers', 'documents', 'tags')
+
+    # Výstupní pole -> sloupce Component, které k nim potřebujeme
+    COLUMNS = {
+        'name': ('name',),
+        'description': ('description',),
+        'category': ('category',),
+        'unit_type': ('unit_type',),
+        'selling_price': ('selling_price',),
+        'internal_price': ('internal_price',),
+        'primary_image_url': ('primary_image_url',),
+        'inventory_summary': ('stock_total', 'reserved_total', 'on_order_total'),
+        'stock_total': ('stock_total',),
+        'stock_value': ('stock_value',),
+        'created_at': ('created_at',),
+    }
+
+    class Meta:
+        model = Component
+        fields = [
+            'id', 'name', 'description', 'category', 'unit_type', 'selling_price', 'internal_price',
+            'primary_image_url', 'inventory_summary', 'stock_total', 'stock_value', 'created_at',
+            'packets', 'suppliers', 'documents', 'tags',
+        ]
+
+    def __init__(self, *args, fields=None, expand=(), **kwargs):
+        super().__init__(*args, **kwargs)
+        for name in list(self.fields):
+            if name in self.EXPANDABLE:
+                if name not in expand:
+                    self.fields.pop(name)
+            elif fields is not None and name != 'id' and name not in fields:
+                self.fields.pop(name)
+
+    def get_inventory_summary(self, instance):
+        return {
+            'total_quantity': float(instance.stock_total),
+            'reserved_quantity': float(instance.reserved_total),
+            'purchase_quantity': float(instance.on_order_total),
+        }
+
+
+def _requested_names(value):
+    if isinstance(value, str):
+        value = value.split(',')
+    return {name.strip() for name in value or [] if isinstance(name, str)}
+
+
+def component_list_fields(value):
+    """Plain fields of ComponentListSerializer requested by `value` (comma string or list); None means all."""
+    if not value:
+        return None
+    return _requested_names(value) & set(ComponentListSerializer.COLUMNS)
+
+
+def component_list_expand(value):
+    return _requested_names(value) & set(ComponentListSerializer.EXPANDABLE)
+
+
+def component_list_queryset(queryset, fields, expand):
+    """Load only the columns and relations the requested ComponentListSerializer fields need."""
+    selected = ComponentListSerializer.COLUMNS if fields is None else fields
+    columns = {'id'}
+    for field in selected:
+        columns.update(ComponentListSerializer.COLUMNS[field])
+    queryset = queryset.only(*columns)
+
+    if 'category' in selected:
+        queryset = queryset.select_related('category')
 
+    if 'packets' in expand:
+        queryset = queryset.prefetch_related(models.Prefetch('packets', queryset=Packet.objects.select_related('location')))
+    if 'suppliers' in expand:
+        queryset = queryset.prefetch_related('suppliers__supplier')
+    if 'documents' in expand:
+        queryset = queryset.prefetch_related('documents')
+    if 'tags' in expand:
+        queryset = queryset.prefetch_related('tags')
+    return queryset
 
 
 class ComponentListAPIView(generics.ListAPIView):
-    serializer_class = ComponentSerializer
+    """
+    `?fields=name,category` limits the output, `?expand=packets,tags` adds
+    nested relations. The queryset loads only the columns and relations
+    needed for them, so a page costs the same number of queries at any size.
+
+    `?search_mode=fuzzy` matches `search` against names and supplier symbols
+    by trigram similarity (`?threshold=`, 0.1-1) and orders by it unless
+    `ordering` is given.
+    """
+    serializer_class = ComponentListSerializer
     pagination_class = StandardResultsSetPagination
     permission_classes = [IsAuthenticated]
 
+    ORDERING_FIELDS = {
+        'name', '-name',
+        'created_at', '-created_at',
+        'stock_total', '-stock_total',
+        'stock_value', '-stock_value',
+    }
+
     def get_queryset(self):
         queryset = Component.objects.all()
         name = self.request.query_params.get('name', None)
@@ -234,7 +327,7 @@ class ComponentListAPIView(generics.ListAPIView):
         if categories:
             filters.append(Q(category__in=categories))
 
-        if search:
+        if search and not self.fuzzy_search():
             filters.append(
             Q(name__icontains=search) |
             Q(description__icontains=search) |
@@ -252,17 +345,192 @@ class ComponentListAPIView(generics.ListAPIView):
             locations = Warehouse.objects.filter(id__in=locations).get_descendants(include_self=True).distinct() 
             filters.append(Q(packets__location__in=locations))
 
+        in_stock = self.request.query_params.get('in_stock', None)
+        if in_stock is not None:
+            if in_stock.lower() in ('1', 'true', 'yes'):
+                filters.append(Q(stock_total__gt=0))
+            else:
+                filters.append(Q(stock_total__lte=0))
+
         if filters:
             queryset = queryset.filter(*filters)
+
+        if search and self.fuzzy_search():
+            queryset = fuzzy(queryset, search, ['name'], 'id', related=[(SupplierRelation, 'symbol', 'component')])
+
+        queryset = self.restrict_queryset(queryset)
+
+        ordering = self.request.query_params.get('ordering', None)
+        if ordering in self.ORDERING_FIELDS:
+            return queryset.order_by(ordering, 'id')
+        if search and self.fuzzy_search():
+            return queryset
         return queryset.order_by('id')
 
+    def fuzzy_search(self):
+        return self.request.query_params.get('search_mode') == 'fuzzy'
+
+    def list(self, request, *args, **kwargs):
+        if not (self.fuzzy_search() and request.query_params.get('search')):
+            return super().list(request, *args, **kwargs)
+        # Práh platí jen uvnitř transakce, stránka se musí vyhodnotit v ní
+        with trigram_threshold(parse_threshold(request.query_params.get('threshold'))):
+            return super().list(request, *args, **kwargs)
+
+    def requested_fields(self):
+        return component_list_fields(self.request.query_params.get('fields', None))
+
+    def requested_expand(self):
+        return component_list_expand(self.request.query_params.get('expand', None))
+
+    def restrict_queryset(self, queryset):
+        return component_list_queryset(queryset, self.requested_fields(), self.requested_expand())
+
+    def get_serializer(self, *args, **kwargs):
+        kwargs.setdefault('fields', self.requested_fields())
+        kwargs.setdefault('expand', self.requested_expand())
+        return super().get_serializer(*args, **kwargs)
+
+
+class ComponentBatchAPIView(generics.GenericAPIView):
+    """
+    Fetch many components by id in one request.
+
+    POST {"ids": [...], "fields": [...], "expand": [...]}; `fields` and
+    `expand` work as on the component list. Results keep the order of `ids`
+    and unknown ids are listed in `missing`. The number of queries does not
+    depend on the number of ids.
+    """
+    serializer_class = ComponentListSerializer
+    permission_classes = [IsAuthenticated]
+    MAX_IDS = 1000
+
+    def post(self, request, *args, **kwargs):
+        ids = request.data.get('ids') if isinstance(request.data, dict) else None
+        if not isinstance(ids, list) or not ids:
+            return Response({'detail': 'Expected a non-empty list of ids.'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(ids) > self.MAX_IDS:
+            return Response({'detail': f'At most {self.MAX_IDS} ids per request.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        valid = []
+        invalid = []
+        for value in ids:
+            try:
+                valid.append(uuid.UUID(str(value)))
+            except ValueError:
+                invalid.append(value)
+
+        fields = component_list_fields(request.data.get('fields'))
+        expand = component_list_expand(request.data.get('expand'))
+        components = component_list_queryset(Component.objects.all(), fields, expand).in_bulk(valid)
+
+        found = [components[pk] for pk in dict.fromkeys(valid) if pk in components]
+        missing = [str(pk) for pk in dict.fromkeys(valid) if pk not in components]
+        return Response({
+            'results': self.get_serializer(found, many=True, fields=fields, expand=expand).data,
+            'missing': missing,
+            'invalid': invalid,
+        })
+
+
+
+class ComponentInventorySummaryAPIView(generics.GenericAPIView):
+    """
+    Stock, reserved and on-order quantities of many components in one query.
+
+    Select components by `ids` (comma separated, or a list in a POST body),
+    `category` (whole subtree) and/or `location` (whole subtree; quantities
+    then count only packets stored there).
+    """
+    permission_classes = [IsAuthenticated]
+    MAX_IDS = 5000
+
+    def get(self, request, *args, **kwargs):
+        ids = request.query_params.get('ids')
+        return self.summary(ids.split(',') if ids else None, request.query_params.get('category'), request.query_params.get('location'))
+
+    def post(self, request, *args, **kwargs):
+        data = request.data if isinstance(request.data, dict) else {}
+        return self.summary(data.get('ids'), data.get('category'), data.get('location'))
+
+    def summary(self, ids, category_id, location_id):
+        if not (ids or category_id or location_id):
+            return Response({'detail': 'Provide ids, category or location.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        queryset = Component.objects.all()
+        if ids:
+            if not isinstance(ids, list) or len(ids) > self.MAX_IDS:
+                return Response({'detail': f'Expected a list of at most {self.MAX_IDS} ids.'}, status=status.HTTP_400_BAD_REQUEST)
+            try:
+                ids = [uuid.UUID(str(value)) for value in ids]
+            except ValueError:
+                return Response({'detail': 'Invalid component id.'}, status=status.HTTP_400_BAD_REQUEST)
+            queryset = queryset.filter(id__in=ids)
+        if category_id:
+            category = get_object_or_404(Category, id=category_id)
+            queryset = queryset.filter(category__in=category.get_descendants(include_self=True))
+
+        locations = None
+        if location_id:
+            location = get_object_or_404(Warehouse, id=location_id)
+            locations = location.get_descendants(include_self=True)
+            queryset = queryset.filter(id__in=Packet.objects.filter(location__in=locations).values('component_id'))
+
+        rows = queryset.inventory_summary(locations=locations)
+        return Response({
+            'results': [
+                {
+                    'id': row['id'],
+                    'total_quantity': float(row['total_quantity']),
+                    'reserved_quantity': float(row['reserved_quantity']),
+                    'purchase_quantity': float(row['purchase_quantity']),
+                }
+                for row in rows
+            ],
+        })
+
+
+def component_version_keys(component_id):
+    # Detail vnořuje packety s cestou umístění, kategorii, tagy a dodavatele
+    return [
+        version_key(Component, component_id),
+        version_key(Warehouse),
+        version_key(Category),
+        version_key(Tag),
+        version_key(Supplier),
+    ]
 
 
 class ComponentDetailAPIView(generics.RetrieveUpdateDestroyAPIView):
-    queryset = Component.objects.all()
+    # Vnořené vztahy jedním dotazem na vztah, ne jedním na každý řádek
+    queryset = Component.objects.select_related('category').prefetch_related(
+        models.Prefetch('packets', queryset=Packet.objects.select_related('location')),
+        'suppliers__supplier',
+        'documents',
+        'tags',
+    )
     serializer_class = ComponentSerializer
     permission_classes = [IsAuthenticated]
 
+    def retrieve(self, request, *args, **kwargs):
+        keys = component_version_keys(kwargs['pk'])
+        return conditional_response(request, keys, partial(self.retrieve_cached, keys))
+
+    def retrieve_cached(self, keys):
+        # Serializovaný detail v Redisu pod aktuální verzí; změna verze starý záznam jen osiří.
+        # Podepsané URL expirují, proto se do cache neukládají a doplňují se při každé odpovědi.
+        context = {**self.get_serializer_context(), 'defer_signing': True}
+        data = cached_representation(
+            'component-detail', keys,
+            lambda: dict(self.get_serializer_class()(self.get_object(), context=context).data),
+            timeout=settings.COMPONENT_DETAIL_CACHE_TIMEOUT,
+        )
+        data = {**data, 'documents': [dict(document) for document in data.get('documents', [])]}
+        response = Response(data)
+        if sign_documents(data['documents']):
+            patch_cache_control(response, no_store=True)
+        return response
+
 
 class PacketForm(forms.ModelForm):
     """Form for creating and updating Packet instances."""
@@ -1,6 +1,7 @@
 from rest_framework import serializers
 from django.conf import settings
 from urllib.parse import urlparse
+from nextintranet_backend.storage_backends import public_url, signed_url, signed_urls
 
 from rest_framework.permissions import IsAuthenticated
 from rest_framework import generics
@@ -30,6 +31,32 @@ from crispy_forms.layout import Layout, Row, Column, Field, Div
 
 
 
+SIGNED_NAME = '_signed_name'
+
+
+def sign_documents(documents):
+    """
+    Fill in the URLs of documents serialised with the `defer_signing` context
+    flag. Returns True when any document was signed, i.e. the response holds
+    expiring URLs and must not be cached by the client.
+    """
+    pending = [document for document in documents if SIGNED_NAME in document]
+    urls = signed_urls(document[SIGNED_NAME] for document in pending)
+    for document in pending:
+        url = urls.get(document.pop(SIGNED_NAME))
+        document['get_url'] = document['file_url'] = url
+    return bool(pending)
+
+
+class DocumentListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        # Podepsané URL celého seznamu získáme jedním get_many/set_many
+        documents = list(data.all() if hasattr(data, 'all') else data)
+        if not self.context.get('defer_signing'):
+            self.child.signed = signed_urls(document.file.name for document in documents if document.is_signed)
+        return super().to_representation(documents)
+
+
 class DocumentSerializer(serializers.ModelSerializer):
     file_url = serializers.SerializerMethodField()
     get_url = serializers.SerializerMethodField()
@@ -37,36 +64,36 @@ class DocumentSerializer(serializers.ModelSerializer):
     class Meta:
         model = Document
         fields = '__all__'
+        list_serializer_class = DocumentListSerializer
 
-    def _with_public_endpoint(self, url):
-        if not url:
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        if self.context.get('defer_signing') and instance.is_signed:
+            # URL doplní sign_documents() až po načtení z cache
+            data[SIGNED_NAME] = instance.file.name
+        return data
+
+    def _signed_url(self, obj):
+        if self.context.get('defer_signing'):
             return None
-        public_endpoint = getattr(settings, 'S3_PUBLIC_ENDPOINT_URL', None)
-        internal_endpoint = getattr(settings, 'S3_ENDPOINT_URL', None)
-        bucket = getattr(settings, 'S3_STORAGE_BUCKET_NAME', None)
-        if not public_endpoint:
-            public_endpoint = getattr(settings, 'AWS_S3_PUBLIC_ENDPOINT_URL', None)
-        if not internal_endpoint:
-            internal_endpoint = getattr(settings, 'AWS_S3_ENDPOINT_URL', None)
-        if not bucket:
-            bucket = getattr(settings, 'AWS_STORAGE_BUCKET_NAME', None)
-
-        if public_endpoint and internal_endpoint and url.startswith(internal_endpoint):
-            return public_endpoint.rstrip('/') + url[len(internal_endpoint):]
-
-        parsed = urlparse(url)
-        path = parsed.path or ''
-        if public_endpoint and bucket and path.startswith('/documents/'):
-            return f"{public_endpoint.rstrip('/')}/{bucket}{path}"
-
-        return url
+        signed = getattr(self, 'signed', None)
+        if signed is not None and obj.file.name in signed:
+            return signed[obj.file.name]
+        return signed_url(obj.file.name)
+
+    def _with_public_endpoint(self, url):
+        return public_url(url)
 
     def get_get_url(self, obj):
+        if obj.is_signed:
+            return self._signed_url(obj)
         return self._with_public_endpoint(obj.get_url)
 
     def get_file_url(self, obj):
         if not obj.file:
             return None
+        if obj.is_signed:
+            return self._signed_url(obj)
         return self._with_public_endpoint(obj.file.url)
 
 
@@ -0,0 +1,123 @@
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+
+from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from nextintranet_warehouse.models.component import Packet
+from nextintranet_warehouse.models.warehouse import Warehouse
+
+from nextintranet_warehouse.export import ENTITIES, Echo, location_paths, stream_csv, stream_ndjson
+
+from .packets import parse_timestamp
+
+
+class InventoryHistoryAPIView(APIView):
+    """
+    Stock of every packet at a past moment, streamed as CSV or JSON.
+
+    Counts start from the nearest InventorySnapshot and add the operations
+    recorded since. Query params: `timestamp` (ISO datetime or date),
+    optional `location` (whole subtree) or `component`, `output=csv|json`.
+    """
+    permission_classes = [IsAuthenticated]
+
+    FIELDS = ['packet', 'component', 'component_name', 'location', 'location_path', 'snapshot_date', 'count', 'value']
+    CHUNK_SIZE = 2000
+
+    def get(self, request, *args, **kwargs):
+        timestamp = parse_timestamp(request.query_params.get('timestamp'))
+        if timestamp is None:
+            return Response({'detail': 'Missing or invalid timestamp.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        output = request.query_params.get('output', 'json')
+        if output not in ('csv', 'json'):
+            return Response({'detail': 'output must be csv or json.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        queryset = Packet.objects.all()
+        location_id = request.query_params.get('location')
+        component_id = request.query_params.get('component')
+        if location_id:
+            location = get_object_or_404(Warehouse, id=location_id)
+            queryset = queryset.filter(location__in=location.get_descendants(include_self=True))
+        if component_id:
+            queryset = queryset.filter(component_id=component_id)
+
+        rows = self.rows(queryset.from_snapshots(timestamp).order_by('location_id', 'component__name'))
+        filename = f"inventory-{timestamp.date().isoformat()}"
+
+        if output == 'csv':
+            response = StreamingHttpResponse(self.stream_csv(rows), content_type='text/csv')
+            response['Content-Disposition'] = f'attachment; filename="{filename}.csv"'
+        else:
+            response = StreamingHttpResponse(self.stream_json(rows, timestamp), content_type='application/json')
+        return response
+
+    def rows(self, queryset):
+        paths = location_paths()
+        values = queryset.values_list(
+            'id', 'component_id', 'component__name', 'location_id', 'snapshot_date', 'count_at', 'value_at',
+        )
+        for packet_id, component_id, component_name, location_id, snapshot_date, count, value in values.iterator(chunk_size=self.CHUNK_SIZE):
+            yield {
+                'packet': packet_id,
+                'component': component_id,
+                'component_name': component_name,
+                'location': location_id,
+                'location_path': paths.get(location_id),
+                'snapshot_date': snapshot_date,
+                'count': round(count, 2),
+                'value': float(value),
+            }
+
+    def stream_csv(self, rows):
+        writer = csv.DictWriter(Echo(), fieldnames=self.FIELDS)
+        yield writer.writerow(dict(zip(self.FIELDS, self.FIELDS)))
+        for row in rows:
+            yield writer.writerow(row)
+
+    def stream_json(self, rows, timestamp):
+        yield '{"timestamp": %s, "packets": [' % json.dumps(timestamp, cls=DjangoJSONEncoder)
+        separator = ''
+        for row in rows:
+            yield separator + json.dumps(row, cls=DjangoJSONEncoder)
+            separator = ','
+        yield ']}'
+
+
+class CatalogueExportAPIView(APIView):
+    """
+    The whole catalogue streamed over server-side cursors.
+
+    `output=ndjson` (default) streams the entities listed in `entity`
+    (comma separated, default all), one JSON object per line with a `type`.
+    `output=csv` streams a single entity.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        output = request.query_params.get('output', 'ndjson')
+        if output not in ('csv', 'ndjson'):
+            return Response({'detail': 'output must be csv or ndjson.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        entity = request.query_params.get('entity')
+        entities = entity.split(',') if entity else list(ENTITIES)
+        unknown = [name for name in entities if name not in ENTITIES]
+        if unknown:
+            return Response({'detail': f'Unknown entity: {", ".join(unknown)}.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        if output == 'csv':
+            if len(entities) != 1:
+                return Response({'detail': 'CSV export needs exactly one entity.'}, status=status.HTTP_400_BAD_REQUEST)
+            response = StreamingHttpResponse(stream_csv(entities[0]), content_type='text/csv')
+            response['Content-Disposition'] = f'attachment; filename="{entities[0]}.csv"'
+        else:
+            response = StreamingHttpResponse(stream_ndjson(entities), content_type='application/x-ndjson')
+            response['Content-Disposition'] = 'attachment; filename="catalogue.ndjson"'
+        return response
@@ -26,6 +26,7 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.pagination import PageNumberPagination
 from nextintranet_backend.routers import NoFormatSuffixRouter as DefaultRouter
+from nextintranet_backend.conditional import conditional_response, version_key
 
 from rest_framework import serializers
 
@@ -59,7 +60,7 @@ class WarehouseSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Warehouse
-        fields = '__all__'
+        exclude = ['search_vector']
 
     def to_representation(self, instance):
         data = super().to_representation(instance)
@@ -98,16 +99,20 @@ class LocationAPIView(viewsets.ModelViewSet):
 
     @action(detail=False, methods=['get'], url_path='tree')
     def tree_all(self, request):
-        locations = Warehouse.objects.all()
-        tree = self.build_tree(locations)
-        return Response(tree)
+        def build():
+            locations = Warehouse.objects.all()
+            tree = self.build_tree(locations)
+            return Response(tree)
+        return conditional_response(request, [version_key(Warehouse)], build)
 
     @action(detail=True, methods=['get'], url_path='tree')
     def tree(self, request, pk=None):
-        location = Warehouse.objects.get(id=pk)
-        objects = location.get_descendants(include_self=True)
-        tree = self.build_tree(objects)
-        return Response(tree)
+        def build():
+            location = Warehouse.objects.get(id=pk)
+            objects = location.get_descendants(include_self=True)
+            tree = self.build_tree(objects)
+            return Response(tree)
+        return conditional_response(request, [version_key(Warehouse)], build)
 
 LocationRouter = DefaultRouter(trailing_slash=True)
 LocationRouter.register(r'', LocationAPIView)
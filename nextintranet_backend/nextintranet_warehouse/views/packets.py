@@ -1,10 +1,16 @@
 import io
+from functools import partial
 import datetime
+import uuid
 from django.http import FileResponse
 from django.views import View, generic
 from django.shortcuts import get_object_or_404
 from django.http import JsonResponse
 from django.http import HttpResponse
+from django.db import transaction
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.utils.dateparse import parse_date, parse_datetime
 
 
 
@@ -25,15 +31,18 @@ from rest_framework import generics
 from rest_framework import viewsets
 from nextintranet_backend.routers import NoFormatSuffixRouter as DefaultRouter
 from rest_framework.pagination import PageNumberPagination
+from nextintranet_backend.pagination import KeysetPageNumberPagination
+from nextintranet_backend.conditional import conditional_response, version_key
 from rest_framework import status
 
 from rest_framework.response import Response
 from rest_framework import serializers
 
-from nextintranet_warehouse.models.component import Packet, StockOperation, Component
+from nextintranet_warehouse.models.component import Packet, StockOperation, Component, PacketRecalculation
 from nextintranet_warehouse.models.warehouse import Warehouse
 
-from .components import ComponentSerializer
+from .components import ComponentSerializer, component_version_keys
+from .document import sign_documents
 from .locations import WarehouseSerializer
 
 
@@ -47,13 +56,13 @@ class PacketSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Packet
-        fields = '__all__'
+        exclude = ['search_vector']
 
     def to_representation(self, instance):
-        if instance.count == 0 and instance.operations.exists():
-            instance.calculate()
         response = super().to_representation(instance)
-        response['component'] = ComponentSerializer(instance.component).data
+        response['count'] = self.fields['count'].to_representation(instance.current_count)
+        # Kontext nese i defer_signing, podepsané URL dokumentů pak doplní až odpověď
+        response['component'] = ComponentSerializer(instance.component, context=self.context).data
         response['location'] = WarehouseSerializer(instance.location).data
         return response
 
@@ -72,7 +81,13 @@ class PacketOperationsAPIView(mixins.RetrieveModelMixin, generics.GenericAPIView
         pocket_id = kwargs.get('pk')
         packet = Packet.objects.get(pk=pocket_id)
         operations = StockOperation.objects.filter(packet=packet).order_by('-created_at')
-        
+        since = parse_timestamp(request.query_params.get('since'))
+        until = parse_timestamp(request.query_params.get('until'))
+        if since:
+            operations = operations.filter(timestamp__gte=since)
+        if until:
+            operations = operations.filter(timestamp__lte=until)
+
         serializer = StockOperationSerializer(operations, many=True)
         return Response(serializer.data)
 
@@ -82,23 +97,121 @@ class PacketOperationsAPIView(mixins.RetrieveModelMixin, generics.GenericAPIView
 
 
 
-class CustomPagination(PageNumberPagination):
+class CustomPagination(KeysetPageNumberPagination):
     page_size = 25
     page_size_query_param = 'page_size'
     max_page_size = 1000
 
+def parse_timestamp(value):
+    if not value:
+        return None
+    timestamp = parse_datetime(value)
+    if timestamp is None:
+        date = parse_date(value)
+        if date is None:
+            return None
+        # Samotné datum znamená stav na konci dne
+        timestamp = datetime.datetime.combine(date, datetime.time.max)
+    if timezone.is_naive(timestamp):
+        timestamp = timezone.make_aware(timestamp)
+    return timestamp
+
+
+def sign_packet_documents(response, packets):
+    """
+    Sign the document URLs of the packets' components, serialised with the
+    `defer_signing` context flag. Expiring URLs make the response no-store,
+    so conditional_response() gives it no validators.
+    """
+    if sign_documents([document for packet in packets for document in packet['component']['documents']]):
+        patch_cache_control(response, no_store=True)
+    return response
+
+
 class PacketAPIView(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
     queryset = Packet.objects.all()
     serializer_class = PacketSerializer
     pagination_class = CustomPagination
 
+    def retrieve(self, request, *args, **kwargs):
+        # get_object() vrátí 404 i pro pk, které není UUID
+        packet = self.get_object()
+        # Packet vnořuje celou součástku, její verze se mění s každou změnou packetu
+        return conditional_response(
+            request,
+            [version_key(Packet, packet.pk)] + component_version_keys(packet.component_id),
+            partial(self.render_packet, packet),
+        )
+
+    def render_packet(self, packet):
+        context = {**self.get_serializer_context(), 'defer_signing': True}
+        data = self.get_serializer_class()(packet, context=context).data
+        return sign_packet_documents(Response(data), [data])
+
+    @action(detail=False, methods=['get'], url_path='stock-as-of')
+    def stock_as_of(self, request):
+        """
+        Packet counts and values at a point in time.
+
+        Filter by `packet`, `component` or `location` (whole subtree);
+        `timestamp` accepts an ISO datetime or a date (end of that day).
+        """
+        timestamp = parse_timestamp(request.query_params.get('timestamp'))
+        if timestamp is None:
+            return Response({'detail': 'Missing or invalid timestamp.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        ids = {}
+        for name in ('packet', 'component', 'location'):
+            value = request.query_params.get(name)
+            if value:
+                try:
+                    ids[name] = uuid.UUID(value)
+                except ValueError:
+                    return Response({'detail': f'Invalid {name} id.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        queryset = Packet.objects.all()
+        packet_id = ids.get('packet')
+        component_id = ids.get('component')
+        location_id = ids.get('location')
+        if packet_id:
+            queryset = queryset.filter(id=packet_id)
+        if component_id:
+            queryset = queryset.filter(component_id=component_id)
+        if location_id:
+            location = get_object_or_404(Warehouse, id=location_id)
+            queryset = queryset.filter(location__in=location.get_descendants(include_self=True))
+        if not (packet_id or component_id or location_id):
+            return Response({'detail': 'Provide packet, component or location.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        queryset = queryset.as_of(timestamp)
+        packets = list(queryset.values('id', 'component_id', 'location_id', 'count_as_of', 'value_as_of'))
+
+        return Response({
+            'timestamp': timestamp,
+            'total_count': float(sum(packet['count_as_of'] for packet in packets)),
+            'total_value': float(sum(packet['value_as_of'] for packet in packets)),
+            'packets': [
+                {
+                    'id': packet['id'],
+                    'component': packet['component_id'],
+                    'location': packet['location_id'],
+                    'count': float(packet['count_as_of']),
+                    'value': float(packet['value_as_of']),
+                }
+                for packet in packets
+            ],
+        })
+
+    @action(detail=False, methods=['get'], url_path='recalculation-lag')
+    def recalculation_lag(self, request):
+        """Size and age of the packet recalculation queue (see process_packet_queue)."""
+        return Response(PacketRecalculation.lag())
+
     @action(detail=True, methods=['post'])
     def calculate(self, request, *args, **kwargs):
-        print("CALCULATE PACKET")
-        id = kwargs.get('pk')
-        print("packet id for calculation:", id)
-        Packet.objects.get(id=id).calculate()
+        with transaction.atomic():
+            Packet.objects.select_for_update().get(id=kwargs.get('pk')).calculate()
         return Response({'status': 'ok'})
 
 class PacketListCreateAPIView(generics.ListCreateAPIView):
@@ -109,6 +222,23 @@ class PacketListCreateAPIView(generics.ListCreateAPIView):
     def get_queryset(self):
         component = get_object_or_404(Component, pk=self.kwargs.get('pk'))
         return Packet.objects.filter(component=component)
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.request.method == 'GET':
+            context['defer_signing'] = True
+        return context
+
+    def get(self, request, pk, *args, **kwargs):
+        return conditional_response(
+            request,
+            component_version_keys(pk),
+            partial(self.render_packets, request, pk, *args, **kwargs),
+        )
+
+    def render_packets(self, request, *args, **kwargs):
+        response = super().get(request, *args, **kwargs)
+        return sign_packet_documents(response, response.data)
     
     def post(self, request, pk, *args, **kwargs):
         component = get_object_or_404(Component, pk=pk)
@@ -1,6 +1,7 @@
 from django.db.models import Q
 from rest_framework import generics, serializers
 from rest_framework.pagination import PageNumberPagination
+from nextintranet_backend.pagination import KeysetPageNumberPagination
 from rest_framework.permissions import IsAuthenticated
 
 from nextintranet_backend.permissions import AreaAccessPermission
@@ -104,7 +105,7 @@ class PurchaseRequestSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
 
-class PurchaseRequestPagination(PageNumberPagination):
+class PurchaseRequestPagination(KeysetPageNumberPagination):
     page_size = 25
     page_size_query_param = 'page_size'
     max_page_size = 100
@@ -3,6 +3,7 @@ from django.db.models import Count, Q
 from rest_framework import generics, serializers
 from rest_framework.parsers import FormParser, JSONParser, MultiPartParser
 from rest_framework.pagination import PageNumberPagination
+from nextintranet_backend.pagination import KeysetPageNumberPagination
 from rest_framework.permissions import IsAuthenticated
 
 from nextintranet_backend.permissions import AreaAccessPermission
@@ -81,7 +82,7 @@ class PurchaseDetailSerializer(PurchaseListSerializer):
         fields = PurchaseListSerializer.Meta.fields + ['items']
 
 
-class PurchasePagination(PageNumberPagination):
+class PurchasePagination(KeysetPageNumberPagination):
     page_size = 25
     page_size_query_param = 'page_size'
     max_page_size = 100
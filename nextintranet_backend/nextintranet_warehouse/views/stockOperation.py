@@ -5,16 +5,25 @@ from django.views.generic.edit import CreateView
 #from .models import StockOperation
 from nextintranet_warehouse.models.component import StockOperation
 from nextintranet_warehouse.models.component import Packet
+from nextintranet_warehouse.models.inventory import ArchivedStockOperation
+from .packets import parse_timestamp
 from django.forms import ModelForm
 from django.core.exceptions import ValidationError
 from django.utils.translation import gettext_lazy as _
+from nextintranet_warehouse.signals import muted_model_events, emit_bulk_model_change
+
+from django.db import transaction
 
 from rest_framework import serializers
+from rest_framework import status
 from rest_framework import viewsets
+from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
 from nextintranet_backend.routers import NoFormatSuffixRouter as DefaultRouter
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.pagination import PageNumberPagination
+from nextintranet_backend.pagination import KeysetPageNumberPagination
 
 
 
@@ -62,7 +71,6 @@ class StockOperationCreateView(FormView):
 
 
     def form_valid(self, form):
-        print("VALIDACE FORMULÁŘE...")
         form.save()
         return redirect('component-detail', uuid=form.instance.packet.component.id)
 
@@ -76,6 +84,7 @@ class StockOperationSerializer(serializers.ModelSerializer):
     class Meta:
         model = StockOperation
         fields = '__all__'
+        read_only_fields = ['balance_after', 'value_after', 'opening_balance']
 
     # def to_representation(self, instance):
     #     data = super().to_representation(instance)
@@ -101,13 +110,121 @@ class StockOperationSerializer(serializers.ModelSerializer):
     #     return instance
 
 
+class ArchivedStockOperationSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ArchivedStockOperation
+        fields = '__all__'
+
+
+class PacketStateSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Packet
+        fields = ['id', 'component', 'location', 'count', 'totalValue', 'itemValue', 'last_operation']
+
+
+class StockOperationPagination(KeysetPageNumberPagination):
+    # Bez parametrů zůstává seznam nestránkovaný jako dřív; stránkuje se jen na ?page_size= nebo ?pagination=cursor
+    page_size = None
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+
+
 class StockOperationViewSet(viewsets.ModelViewSet):
     queryset = StockOperation.objects.all()
     serializer_class = StockOperationSerializer
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend]
-    filterset_fields = ['packet', 'operation_type', 'created_at']
+    # Rozsah podle timestamp umožní PostgreSQL vynechat nepotřebné oddíly tabulky
+    filterset_fields = {
+        'packet': ['exact'],
+        'operation_type': ['exact'],
+        'created_at': ['exact'],
+        'timestamp': ['gte', 'lte'],
+    }
     # pagination_class = PageNumberPagination
+    pagination_class = StockOperationPagination
+
+    @action(detail=False, methods=['post'], url_path='bulk')
+    def bulk(self, request):
+        """
+        Create many operations across packets in one transaction.
+
+        Accepts a list of operations (or {"operations": [...]}), recalculates
+        every touched packet once and returns the new packet states.
+        """
+        payload = request.data
+        if isinstance(payload, dict):
+            payload = payload.get('operations')
+        if not isinstance(payload, list) or not payload:
+            return Response({'detail': 'Expected a non-empty list of operations.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        serializer = self.get_serializer(data=payload, many=True)
+        serializer.is_valid(raise_exception=True)
+
+        author = request.user if request.user.is_authenticated else None
+        operations_by_packet = {}
+        for item in serializer.validated_data:
+            item.setdefault('author', author)
+            operation = StockOperation(**item)
+            operations_by_packet.setdefault(operation.packet_id, []).append(operation)
+
+        with transaction.atomic(), muted_model_events():
+            # Zamykáme v pevném pořadí, aby souběžné dávky nemohly skončit deadlockem
+            packets = {
+                packet.pk: packet
+                for packet in Packet.objects.select_for_update().filter(pk__in=list(operations_by_packet.keys())).order_by('pk')
+            }
+
+            created = []
+            for packet_id, operations in operations_by_packet.items():
+                previous_operation_id = packets[packet_id].last_operation_id
+                for operation in operations:
+                    if operation.previous_operation_id is None:
+                        operation.previous_operation_id = previous_operation_id
+                    previous_operation_id = operation.id
+                created.extend(operations)
+            StockOperation.objects.bulk_create(created)
+
+            for packet_id, operations in operations_by_packet.items():
+                packets[packet_id].apply_operations(operations)
+
+        emit_bulk_model_change(
+            StockOperation,
+            [operation.id for operation in created],
+            'bulk_created',
+            extra={'packetIds': [str(packet_id) for packet_id in packets]},
+        )
+
+        return Response({
+            'created': len(created),
+            'operations': [str(operation.id) for operation in created],
+            'packets': PacketStateSerializer(packets.values(), many=True).data,
+        }, status=status.HTTP_201_CREATED)
+
+
+    @action(detail=False, methods=['get'], url_path='archived')
+    def archived(self, request):
+        """
+        Operations moved to the archive by compact_stock_history.
+
+        Requires `packet`; `timestamp__gte` / `timestamp__lte` narrow the range.
+        """
+        packet_id = request.query_params.get('packet')
+        if not packet_id:
+            return Response({'detail': 'Provide packet.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        queryset = ArchivedStockOperation.objects.filter(packet_id=packet_id).order_by('-timestamp', '-id')
+        since = parse_timestamp(request.query_params.get('timestamp__gte'))
+        until = parse_timestamp(request.query_params.get('timestamp__lte'))
+        if since:
+            queryset = queryset.filter(timestamp__gte=since)
+        if until:
+            queryset = queryset.filter(timestamp__lte=until)
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(ArchivedStockOperationSerializer(page, many=True).data)
+        return Response(ArchivedStockOperationSerializer(queryset, many=True).data)
 
 
 StockOperationRouter = DefaultRouter(trailing_slash=True)
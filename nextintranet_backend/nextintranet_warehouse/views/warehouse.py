@@ -74,7 +74,7 @@ class WarehouseSerializer(serializers.ModelSerializer):
     class Meta:
         model = Warehouse
         # fields = '__all__'  # zachováme všechna pole modelu
-        exclude = ['lft', 'rght', 'tree_id', 'level']
+        exclude = ['lft', 'rght', 'tree_id', 'level', 'search_vector']
     
     def get_full_path(self, obj):
         return obj.full_path